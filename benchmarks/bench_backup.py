@@ -0,0 +1,104 @@
+"""
+Tool call latency while create_backup snapshots the database.
+
+Against a generated database (five years + 100k foods by default), --clients
+concurrent callers run a mix of reads and writes through the tools'
+registered coroutines, with the read cache off, for --seconds per phase:
+
+    idle        no backup running
+    stepped     a backup every --gap seconds, BACKUP_PAGES_PER_STEP pages per step
+    one step    a backup every --gap seconds, the whole file in a single step
+
+Backup phases only count calls that overlapped a backup. Each row shows
+p50/p99/max latency and the backups' throughput (copy + integrity check).
+
+Usage: python benchmarks/bench_backup.py [--seconds 5] [--clients 4] [--gap 0.5] [--days 1825] [--foods 100000]
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+os.environ["HEALTH_MCP_CACHE_ENTRIES"] = "0"  # every read goes to the database
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_data  # noqa: E402
+import main  # noqa: E402
+
+
+async def client(deadline, calls):
+    today = date.today().isoformat()
+    mix = itertools.cycle([
+        lambda: main.get_daily_summary.run_async(today),
+        lambda: main.log_meal.run_async("roti:60, dal:100", today),
+        lambda: main.search_foods.run_async("paneer"),
+        lambda: main.get_nutrition_stats.run_async(days=30),
+        lambda: main.log_exercise.run_async("walking", 10, "light", today),
+        lambda: main.get_weight_trend.run_async(days=90),
+    ])
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await next(mix)()
+        calls.append((start, time.perf_counter()))
+
+
+def backups(stop, gap, done, windows):
+    while not stop.wait(gap):
+        start = time.perf_counter()
+        done.append(main.backup_database(main.DB_PATH, keep=1))
+        windows.append((start, time.perf_counter()))
+
+
+def phase(seconds, clients, gap, pages_per_step):
+    calls, done, windows = [], [], []
+    stop = threading.Event()
+    worker = None
+    if pages_per_step is not None:
+        main.BACKUP_PAGES_PER_STEP = pages_per_step
+        worker = threading.Thread(target=backups, args=(stop, gap, done, windows))
+        worker.start()
+
+    async def run():
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(client(deadline, calls) for _ in range(clients)))
+
+    asyncio.run(run())
+    stop.set()
+    if worker is not None:
+        worker.join()
+        calls = [(start, end) for start, end in calls
+                 if any(start < b_end and end > b_start for b_start, b_end in windows)]
+    return sorted((end - start) * 1000 for start, end in calls), done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--gap", type=float, default=0.5, help="seconds between backups")
+    parser.add_argument("--days", type=int, default=5 * 365)
+    parser.add_argument("--foods", type=int, default=100_000)
+    args = parser.parse_args()
+
+    generate_data.generate(main.DB_PATH, args.days, seed=12, foods=args.foods)
+    main.get_food_catalog().foods()  # load the catalog before timing
+    size = main.DB_PATH.stat().st_size / 2**20
+    print(f"database {size:.0f} MB, {args.clients} clients, {args.seconds:g}s per phase\n")
+    print(f"{'phase':<10}{'calls':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'backups':>9}{'MB/s':>8}")
+    for name, pages in (("idle", None), ("stepped", main.BACKUP_PAGES_PER_STEP), ("one step", -1)):
+        latencies, done = phase(args.seconds, args.clients, args.gap, pages)
+        p99 = latencies[int(len(latencies) * 0.99)]
+        rate = f"{sum(b[1] for b in done) / 2**20 / sum(b[3] for b in done):>8.0f}" if done else f"{'-':>8}"
+        print(f"{name:<10}{len(latencies):>8}{statistics.median(latencies):>9.2f}{p99:>9.2f}"
+              f"{latencies[-1]:>9.1f}{len(done):>9}{rate}")
+    main.close_all_connections()
@@ -0,0 +1,69 @@
+"""
+Morning check-in as separate MCP calls vs one batch() call.
+
+Both variants go through an in-memory fastmcp Client (full MCP request
+handling, no transport), against a one-year generated database:
+
+    separate   log_sleep, log_weight, log_meal, get_daily_summary: 4 calls, 3 commits
+    batch      the same four operations in one batch() call and one transaction
+
+Usage: python benchmarks/bench_batch.py [--repeat 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_data  # noqa: E402
+import main  # noqa: E402
+from fastmcp import Client  # noqa: E402
+
+CHECK_IN = [
+    ("log_sleep", {"sleep_time": "23:15", "wake_time": "06:45"}),
+    ("log_weight", {"weight_kg": 72.4}),
+    ("log_meal", {"food_items": "poha:200, curd:100"}),
+    ("get_daily_summary", {}),
+]
+
+
+async def run(repeat):
+    timings = {"separate": [], "batch": []}
+    operations = [{"tool": name, "args": args} for name, args in CHECK_IN]
+    async with Client(main.mcp) as client:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for name, args in CHECK_IN:
+                await client.call_tool(name, args)
+            timings["separate"].append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await client.call_tool("batch", {"operations": operations})
+            timings["batch"].append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    generate_data.generate(main.DB_PATH, days=365, seed=9)
+    timings = asyncio.run(run(args.repeat))
+    main.close_all_connections()
+
+    separate = statistics.median(timings["separate"])
+    print(f"{'variant':<10}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}")
+    for variant, calls in (("separate", len(CHECK_IN)), ("batch", 1)):
+        samples = sorted(timings[variant])
+        p50, p95 = statistics.median(samples), samples[int(len(samples) * 0.95)]
+        print(f"{variant:<10}{calls:>7}{p50:>10.2f}{p95:>10.2f}"
+              f"{'' if variant == 'separate' else f'  ({separate / p50:.1f}x faster)'}")
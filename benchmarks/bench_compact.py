@@ -0,0 +1,141 @@
+"""
+Meal rollup + incremental vacuum on a heavy user's history, under live tool calls.
+
+Loads --years of meals (--meals-per-day items a day, ending today) plus one
+sleep/weight/exercise entry per day, then rolls up everything older than
+--months the way RollupScheduler does (roll_up_meals, then
+reclaim_free_pages) on a background thread, while --clients callers run a
+read/write mix through the tools' coroutines with the read cache off.
+Reports the rollup's rows/s, the file size before and after, and call
+latency while idle vs while the compaction runs.
+
+Usage: python benchmarks/bench_compact.py [--years 5] [--meals-per-day 100] [--months 12] [--clients 4]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+os.environ["HEALTH_MCP_EXPORT_DIR"] = _tmp  # history files are written there
+os.environ["HEALTH_MCP_CACHE_ENTRIES"] = "0"  # every read goes to the database
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+
+def history(years, meals_per_day, seed=13):
+    rng = random.Random(seed)
+    foods = sorted(main.get_food_catalog().foods())
+    day = date.today() - timedelta(days=int(years * 365))
+    while day <= date.today():
+        iso = day.isoformat()
+        yield {"type": "sleep", "date": iso, "sleep_time": "23:15", "wake_time": "06:45"}
+        yield {"type": "weight", "date": iso, "weight_kg": round(rng.gauss(74, 1), 1)}
+        yield {"type": "exercise", "date": iso, "exercise": "walking", "duration_minutes": 30}
+        for _ in range(meals_per_day):
+            yield {"type": "meal", "date": iso, "food": rng.choice(foods),
+                   "grams": rng.randint(30, 300), "time": f"{rng.randint(7, 22):02d}:00"}
+        day += timedelta(days=1)
+
+
+def file_mb():
+    conn = main.get_connection()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    conn.close()
+    return main.DB_PATH.stat().st_size / 2**20
+
+
+async def client(done, calls):
+    today = date.today().isoformat()
+    mix = itertools.cycle([
+        lambda: main.get_daily_summary.run_async(today),
+        lambda: main.log_meal.run_async("roti:60, dal:100", today),
+        lambda: main.get_daily_nutrition.run_async(today),
+        lambda: main.get_nutrition_stats.run_async(days=30),
+        lambda: main.log_exercise.run_async("walking", 10, "light", today),
+    ])
+    while not done():
+        start = time.perf_counter()
+        await next(mix)()
+        calls.append((time.perf_counter() - start) * 1000)
+
+
+def run_clients(clients, done):
+    """Sorted call latencies (ms) of `clients` concurrent callers until done() is true."""
+    calls = []
+
+    async def run():
+        await asyncio.gather(*(client(done, calls) for _ in range(clients)))
+
+    asyncio.run(run())
+    return sorted(calls)
+
+
+def report(name, latencies):
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f"{name:<12}{len(latencies):>8}{statistics.median(latencies):>9.2f}{p99:>9.2f}{latencies[-1]:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--meals-per-day", type=int, default=100)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--clients", type=int, default=4)
+    args = parser.parse_args()
+
+    source = Path(_tmp) / "history.ndjson"
+    with open(source, "w") as f:
+        for row in history(args.years, args.meals_per_day):
+            f.write(json.dumps(row) + "\n")
+    report_text = main.import_history(str(source))
+    assert "skipped" not in report_text, report_text
+    conn = main.get_connection()
+    meals = conn.execute("SELECT COUNT(*) FROM meals").fetchone()[0]
+    old_items = conn.execute("SELECT SUM(meal_items) FROM daily_totals WHERE date < ?",
+                             (main.rollup_cutoff(args.months),)).fetchone()[0]
+    conn.close()
+    before = file_mb()
+
+    print(f"{'phase':<12}{'calls':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    started = time.perf_counter()
+    report("idle", run_clients(args.clients, lambda: time.perf_counter() - started > 5))
+
+    result = {}
+
+    def compact():
+        start = time.perf_counter()
+        rows, days, _, _ = main.roll_up_meals(main.DB_PATH, main.rollup_cutoff(args.months))
+        result["rollup"] = (rows, days, time.perf_counter() - start)
+        start = time.perf_counter()
+        result["vacuum"] = (main.reclaim_free_pages(main.DB_PATH), time.perf_counter() - start)
+
+    worker = threading.Thread(target=compact)
+    worker.start()
+    report("compacting", run_clients(args.clients, lambda: not worker.is_alive()))
+    worker.join()
+
+    rows, days, rollup_seconds = result["rollup"]
+    pages, vacuum_seconds = result["vacuum"]
+    conn = main.get_connection()
+    # Rolling up never changes the day totals (the clients' own log_meal calls only add to today)
+    assert conn.execute("SELECT SUM(meal_items) FROM daily_totals WHERE date < ?",
+                        (main.rollup_cutoff(args.months),)).fetchone()[0] == old_items
+    conn.close()
+    after = file_mb()
+    print(f"\n{meals:,} meal rows; rolled up {rows:,} from {days} days in {rollup_seconds:.1f}s "
+          f"({rows / rollup_seconds:,.0f} rows/s)")
+    print(f"released {pages:,} pages in {vacuum_seconds:.1f}s; file {before:.0f} MB -> {after:.0f} MB")
+    main.close_all_connections()
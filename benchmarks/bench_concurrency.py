@@ -0,0 +1,84 @@
+"""
+Throughput of database-backed tools as the number of simultaneous MCP clients grows.
+
+Each client is a separate in-memory fastmcp Client session against main.mcp,
+issuing a mix of heavy (get_nutrition_stats over ten years) and light
+(get_daily_summary) calls. Because db tools run on the bounded DB executor
+instead of the event loop, throughput should scale up to HEALTH_MCP_DB_WORKERS.
+
+Usage: python benchmarks/bench_concurrency.py [--calls 40] [--clients 1,2,4,8,16]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastmcp import Client  # noqa: E402
+
+import main  # noqa: E402
+
+
+def seed(years=10, items_per_day=6):
+    """Raw rows straight into the schema, then rebuild the day totals."""
+    rng = random.Random(5)
+    foods = list(main.get_food_catalog().foods().items())
+    today = time.time()
+    meals = []
+    for day in range(365 * years):
+        date = time.strftime("%Y-%m-%d", time.localtime(today - day * 86400))
+        for _ in range(items_per_day):
+            name, (cal, protein, carbs, fats, fiber) = rng.choice(foods)
+            m = rng.uniform(50, 250) / 100
+            meals.append((date, name, m * 100, cal * m, protein * m, carbs * m, fats * m, fiber * m))
+    conn = main.get_connection()
+    conn.executemany("""
+        INSERT INTO meals (date, food_name, quantity_grams, calories, protein, carbs, fats, fiber)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, meals)
+    main.rebuild_daily_totals_table(conn.cursor())
+    conn.commit()
+    conn.close()
+    return len(meals)
+
+
+async def client_session(calls):
+    async with Client(main.mcp) as client:
+        for i in range(calls):
+            if i % 2:
+                await client.call_tool("get_nutrition_stats", {"days": 3650})
+            else:
+                await client.call_tool("get_daily_summary", {})
+
+
+async def run(clients, calls):
+    start = time.perf_counter()
+    await asyncio.gather(*(client_session(calls) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    return clients * calls / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=40, help="calls per client")
+    parser.add_argument("--clients", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    rows = seed()
+    print(f"seeded {rows} meal rows; DB workers = {main.DB_WORKERS}")
+    asyncio.run(run(1, 4))  # warm up
+    baseline = None
+    print(f"{'clients':>8}{'calls/s':>12}{'scaling':>10}")
+    for clients in (int(c) for c in args.clients.split(",")):
+        throughput = asyncio.run(run(clients, args.calls))
+        baseline = baseline or throughput
+        print(f"{clients:>8}{throughput:>12.0f}{throughput / baseline:>9.1f}x")
+    main.close_all_connections()
@@ -0,0 +1,82 @@
+"""
+Per-call latency of MCP tools: connect-per-call vs pooled connections.
+
+"before" swaps get_connection() for a bare sqlite3.connect(DB_PATH), which is
+exactly what every tool did before the connection pool existed.
+
+Usage: python benchmarks/bench_connections.py [--calls 2000]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Point the server at a scratch database before importing it
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+
+def timed_calls(fn, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def seed():
+    main.set_user_profile(daily_calorie_goal=2200, region="India")
+    for day in range(1, 29):
+        date = f"2026-01-{day:02d}"
+        main.log_meal("roti:120, dal:100, curd:80", date)
+        main.log_sleep("23:00", "07:00", date)
+        main.log_exercise("walking", 30, "light", date)
+        main.log_weight(75 - day * 0.05, date)
+
+
+WORKLOAD = {
+    "get_daily_summary": lambda: main.get_daily_summary("2026-01-15"),
+    "get_nutrition_stats": lambda: main.get_nutrition_stats(30),
+    "recommend_from_routines": lambda: main.recommend_from_routines("afternoon"),
+    "log_meal": lambda: main.log_meal("roti:60", "2026-02-01"),
+}
+
+
+def run(calls):
+    pooled_get_connection = main.get_connection
+    results = {}
+    for mode in ("before", "after"):
+        if mode == "before":
+            main.get_connection = lambda path=None: sqlite3.connect(path or main.DB_PATH)
+        else:
+            main.get_connection = pooled_get_connection
+        for name, fn in WORKLOAD.items():
+            fn()  # warm up
+            results[(mode, name)] = timed_calls(fn, calls)
+    main.get_connection = pooled_get_connection
+
+    print(f"{'tool':<26}{'before mean/p50/p99 (us)':>30}{'after mean/p50/p99 (us)':>30}{'speedup':>10}")
+    for name in WORKLOAD:
+        before = results[("before", name)]
+        after = results[("after", name)]
+        fmt = lambda r: f"{r[0]:.0f}/{r[1]:.0f}/{r[2]:.0f}"
+        print(f"{name:<26}{fmt(before):>30}{fmt(after):>30}{before[0] / after[0]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    seed()
+    run(args.calls)
+    main.close_all_connections()
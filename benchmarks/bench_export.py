@@ -0,0 +1,87 @@
+"""
+Rows per second and peak memory for export_history and import_history.
+
+A diary of --rows rows (mostly meals, one sleep/weight/exercise entry per day)
+is loaded first. Each format is then exported to a file and imported back
+into the emptied history tables. Every step runs twice: once timed, and once
+under tracemalloc for the peak Python allocation. Passing several sizes shows
+that the peak stays flat as the history grows.
+
+Usage: python benchmarks/bench_export.py [--rows 100000,400000]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+os.environ["HEALTH_MCP_EXPORT_DIR"] = _tmp  # history files are written there
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+from bench_import import diary  # noqa: E402
+
+HISTORY_TABLES = ("meals", "sleep_log", "weight_log", "exercise_log", "daily_totals")
+
+
+def clear_history():
+    conn = main.get_connection()
+    for table in HISTORY_TABLES:
+        conn.execute(f"DELETE FROM {table}")
+    main.bump_table_versions(conn.cursor(), *HISTORY_TABLES)
+    conn.commit()
+    conn.close()
+
+
+def load(rows):
+    clear_history()
+    source = Path(_tmp) / "diary.ndjson"
+    with open(source, "w") as f:
+        for row in diary(rows):
+            f.write(json.dumps(row) + "\n")
+    report = main.import_history(str(source))
+    assert "skipped" not in report, report
+
+
+def measure(step):
+    """(seconds, peak MiB) for step(), which must leave the database as it found it."""
+    start = time.perf_counter()
+    step()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    step()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", default="100000,400000", help="comma-separated history sizes")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'step':<14}{'seconds':>9}{'rows/s':>12}{'peak MiB':>10}")
+    for rows in map(int, args.rows.split(",")):
+        load(rows)
+        for fmt in ("ndjson", "csv"):
+            path = Path(_tmp) / f"history.{fmt}"
+
+            def export():
+                report = main.export_history(str(path), overwrite=True)
+                assert report.startswith("✓"), report
+
+            def reimport():
+                clear_history()
+                report = main.import_history(str(path))
+                assert "skipped" not in report, report
+
+            for step, run in (("export", export), ("import", reimport)):
+                elapsed, peak = measure(run)
+                print(f"{rows:>8} {fmt + ' ' + step:<14}{elapsed:>9.2f}{rows / elapsed:>12,.0f}{peak:>10.1f}")
+    main.close_all_connections()
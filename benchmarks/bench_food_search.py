@@ -0,0 +1,112 @@
+"""
+Large-catalog import, search_foods, fuzzy-match and recommendation latency.
+
+Writes a synthetic catalog CSV (default 300k foods), loads it with
+import_food_catalog, then reports p50/p99 latency for a set of searches,
+for the misspelling fallback log_meal uses (FoodCatalog.match), and for
+recommend_foods / recommend_from_pantry with pantries of growing size.
+
+Usage: python benchmarks/bench_food_search.py [--foods 300000] [--repeat 200]
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+os.environ["HEALTH_MCP_EXPORT_DIR"] = _tmp  # import_food_catalog reads its CSV from there
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+BASES = ["rice", "chicken", "beef", "lentils", "paneer", "bread", "yogurt", "apple", "potato",
+         "noodles", "oats", "salmon", "tofu", "beans", "spinach", "cheese", "milk", "corn",
+         "pasta", "egg", "chickpeas", "mango", "cabbage", "pork", "millet", "quinoa"]
+STYLES = ["raw", "boiled", "fried", "baked", "roasted", "steamed", "grilled", "canned",
+          "frozen", "dried", "cooked", "smoked", "instant", "homemade", "restaurant"]
+EXTRAS = ["with salt", "no salt", "low fat", "whole", "skinless", "brown", "white", "red",
+          "green", "sweetened", "unsweetened", "enriched", "organic", "spicy", "plain"]
+
+QUERIES = ["rice", "chicken grilled", "bro ric", "paneer", "low fat milk", "chick",
+           "quinoa cooked organic", "mango dried sweetened", "grilled", "zzz"]
+
+# Aliases, misspellings of seeded foods, a suggestion-only miss and a plain miss
+FUZZY_QUERIES = ["chapatti", "bananna", "paner", "chiken breast", "spinnach",
+                 "brocoli", "grilld chicken", "paneer tikka", "zzzzzz"]
+
+
+def write_catalog(path, count, seed=9):
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "calories", "protein", "carbs", "fats", "fiber"])
+        for i in range(count):
+            name = f"{rng.choice(BASES)}, {rng.choice(STYLES)}, {rng.choice(EXTRAS)} #{i}"
+            writer.writerow([name, rng.randint(20, 600), rng.randint(0, 30),
+                             rng.randint(0, 80), rng.randint(0, 50), rng.randint(0, 12)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--foods", type=int, default=300_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    catalog = Path(_tmp) / "catalog.csv"
+    write_catalog(catalog, args.foods)
+    start = time.perf_counter()
+    print(main.import_food_catalog(str(catalog)))
+    print(f"import: {args.foods / (time.perf_counter() - start):,.0f} foods/s")
+
+    print(f"{'query':<26}{'p50 ms':>9}{'p99 ms':>9}")
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            main.search_foods(query)
+            samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        print(f"{query:<26}{samples[len(samples) // 2]:>9.2f}{samples[int(len(samples) * 0.99)]:>9.2f}")
+
+    food_catalog = main.get_food_catalog()
+    start = time.perf_counter()
+    while food_catalog.match("chiken breast")[0] is None:  # first miss starts the build
+        time.sleep(0.05)
+    print(f"\nfuzzy index build: {(time.perf_counter() - start) * 1000:,.0f} ms")
+    print(f"{'fuzzy query':<26}{'p50 ms':>9}{'p99 ms':>9}  match")
+    for query in FUZZY_QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            t = time.perf_counter()
+            match, score = food_catalog.match(query)
+            samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        print(f"{query:<26}{samples[len(samples) // 2]:>9.2f}{samples[int(len(samples) * 0.99)]:>9.2f}"
+              f"  {match} ({score:.2f})")
+
+    main.set_user_profile(daily_calorie_goal=2000, region="India")
+    start = time.perf_counter()
+    food_catalog.nutrient_matrix()
+    print(f"\nrecommender shortlists: {(time.perf_counter() - start) * 1000:,.0f} ms")
+    print(f"{'recommendation':<26}{'p50 ms':>9}{'p99 ms':>9}")
+    rng = random.Random(5)
+    names = rng.sample(list(food_catalog.foods()), 500)
+    for pantry_size, added in zip((0, 10, 100, 500), (0, 0, 10, 100)):
+        for name in names[added:pantry_size]:
+            main.add_to_pantry(name, rng.choice([None, 50, 200, 500]))
+        label, call = (("recommend_foods", lambda: main.recommend_foods("lunch")) if not pantry_size else
+                       (f"pantry of {pantry_size}", lambda: main.recommend_from_pantry("dinner")))
+        samples = []
+        for _ in range(max(args.repeat // 10, 5)):
+            t = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        print(f"{label:<26}{samples[len(samples) // 2]:>9.2f}{samples[int(len(samples) * 0.99)]:>9.2f}")
+    main.close_all_connections()
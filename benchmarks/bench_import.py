@@ -0,0 +1,72 @@
+"""
+Rows per second for import_diary with NDJSON and CSV input.
+
+Usage: python benchmarks/bench_import.py [--rows 200000]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+COLUMNS = ["type", "date", "food", "grams", "time", "sleep_time", "wake_time",
+           "weight_kg", "exercise", "duration_minutes", "intensity"]
+
+
+def diary(rows, seed=11):
+    """Mostly meals, plus one sleep/weight/exercise entry per day."""
+    rng = random.Random(seed)
+    foods = sorted(main.get_food_catalog().foods())
+    day = date(2015, 1, 1)
+    out = []
+    while len(out) < rows:
+        iso = day.isoformat()
+        out.append({"type": "sleep", "date": iso, "sleep_time": "23:15", "wake_time": "06:45"})
+        out.append({"type": "weight", "date": iso, "weight_kg": round(rng.gauss(74, 1), 1)})
+        out.append({"type": "exercise", "date": iso, "exercise": "walking",
+                    "duration_minutes": 30, "intensity": "light"})
+        for _ in range(rng.randint(20, 40)):
+            out.append({"type": "meal", "date": iso, "food": rng.choice(foods),
+                        "grams": rng.randint(30, 300), "time": f"{rng.randint(7, 22):02d}:00"})
+        day += timedelta(days=1)
+    return out[:rows]
+
+
+def as_ndjson(rows):
+    return "\n".join(json.dumps(row) for row in rows)
+
+
+def as_csv(rows):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rows = diary(args.rows)
+    for fmt, text in (("ndjson", as_ndjson(rows)), ("csv", as_csv(rows))):
+        start = time.perf_counter()
+        report = main.import_diary(text, fmt)
+        elapsed = time.perf_counter() - start
+        assert "skipped" not in report, report
+        print(f"{fmt:<7} {args.rows} rows in {elapsed:.2f}s = {args.rows / elapsed:,.0f} rows/s")
+    main.close_all_connections()
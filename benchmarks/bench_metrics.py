@@ -0,0 +1,82 @@
+"""
+Overhead of per-tool metrics (HEALTH_MCP_METRICS) on a mixed tool workload.
+
+Runs the same workload through the metered tool wrappers in child processes
+with metrics on and off (alternating, best of --rounds) against a one-year
+generated database, and prints per-call time for each tool and the overhead.
+Pass --mode trace to measure HEALTH_MCP_METRICS=trace instead of the default.
+
+Usage: python benchmarks/bench_metrics.py [--calls 300] [--rounds 3]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+
+def workload(calls):
+    """Per-call microseconds of each tool, through main.metered like the MCP path."""
+    _tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+    os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import generate_data
+    import main
+
+    generate_data.generate(main.DB_PATH, days=365, seed=4)
+    today = date.today().isoformat()
+    diary = "\n".join(json.dumps({"type": "meal", "date": today, "food": "dal", "grams": 100})
+                      for _ in range(200))
+    cases = [
+        ("calculate_bmi", lambda: main.calculate_bmi(72, 1.75)),
+        ("list_foods", lambda: main.list_foods()),
+        ("get_daily_summary", lambda: main.get_daily_summary(today)),
+        ("get_nutrition_stats", lambda: main.get_nutrition_stats(days=365)),
+        ("get_sleep_summary", lambda: main.get_sleep_summary(days=90)),
+        ("log_meal", lambda: main.log_meal("roti:120, dal:150", today)),
+        ("import_diary", lambda: main.import_diary(diary)),
+    ]
+    results = {}
+    for name, call in cases:
+        call.__name__ = name
+        metered = main.metered(call)
+        metered()
+        start = time.perf_counter()
+        for _ in range(calls):
+            metered()
+        results[name] = (time.perf_counter() - start) / calls * 1e6
+    main.close_all_connections()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--mode", default="1", help="HEALTH_MCP_METRICS value to compare with 0")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(workload(args.calls)))
+        sys.exit(0)
+
+    best = {args.mode: {}, "0": {}}
+    for _ in range(args.rounds):
+        for mode in (args.mode, "0"):
+            out = subprocess.run([sys.executable, __file__, "--child", "--calls", str(args.calls)],
+                                 env={**os.environ, "HEALTH_MCP_METRICS": mode},
+                                 capture_output=True, text=True, check=True).stdout
+            for name, micros in json.loads(out).items():
+                best[mode][name] = min(best[mode].get(name, float("inf")), micros)
+
+    # For scale: an in-memory MCP round trip (fastmcp Client.call_tool) is ~1.5-2 ms here
+    print(f"{'tool':<22}{'off µs':>10}{'on µs':>10}{'Δ µs':>8}{'overhead':>10}")
+    for name, off in best["0"].items():
+        on = best[args.mode][name]
+        print(f"{name:<22}{off:>10.1f}{on:>10.1f}{on - off:>8.1f}{(on / off - 1) * 100:>9.1f}%")
@@ -0,0 +1,82 @@
+"""
+Read cache: latency of cached read tools on a miss vs a hit, through run_async.
+
+Calls go through each tool's registered coroutine (executor hop, metrics and
+cache, as an MCP call would) against a five-year generated database. A miss
+is timed right after READ_CACHE.clear(), a hit on the immediately repeated
+call. The last line shows a hit rate for a chatty session: a few repeated
+reads between each log_meal.
+
+Usage: python benchmarks/bench_read_cache.py [--days 1825] [--repeat 50]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_data  # noqa: E402
+import main  # noqa: E402
+
+
+async def timed(call):
+    start = time.perf_counter()
+    await call()
+    return (time.perf_counter() - start) * 1000
+
+
+async def run(repeat):
+    today = date.today().isoformat()
+    cases = [
+        ("get_daily_summary", lambda: main.get_daily_summary.run_async(today)),
+        ("get_daily_nutrition", lambda: main.get_daily_nutrition.run_async(today)),
+        ("get_nutrition_stats", lambda: main.get_nutrition_stats.run_async(days=365)),
+        ("get_sleep_summary", lambda: main.get_sleep_summary.run_async(days=30)),
+        ("get_weight_trend", lambda: main.get_weight_trend.run_async(days=90)),
+        ("list_my_pantry", lambda: main.list_my_pantry.run_async()),
+        ("recommend_foods", lambda: main.recommend_foods.run_async("lunch")),
+        ("recommend_from_pantry", lambda: main.recommend_from_pantry.run_async("dinner")),
+    ]
+    print(f"{'tool':<24}{'miss ms':>10}{'hit ms':>10}{'speedup':>10}")
+    for name, call in cases:
+        misses, hits = [], []
+        for _ in range(repeat):
+            main.READ_CACHE.clear()
+            misses.append(await timed(call))
+            hits.append(await timed(call))
+        miss, hit = statistics.median(misses), statistics.median(hits)
+        print(f"{name:<24}{miss:>10.3f}{hit:>10.3f}{miss / hit:>9.1f}x")
+
+    main.READ_CACHE = main.ReadCache()
+    for _ in range(repeat):
+        await main.log_meal.run_async("roti:60", today)
+        for _ in range(3):
+            for _, call in cases[:3]:
+                await call()
+    _, _, _, tools = main.READ_CACHE.stats()
+    hits = sum(h for h, _ in tools.values())
+    total = sum(h + m for h, m in tools.values())
+    print(f"\nSession (3 reads of 3 tools per log_meal): {hits}/{total} hits ({hits / total:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=5 * 365)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    generate_data.generate(main.DB_PATH, args.days, seed=8)
+    main.set_user_profile(daily_calorie_goal=2000, region="India", target_weight_kg=70)
+    for food in ("roti", "dal", "paneer", "rice", "curd", "apple"):
+        main.add_to_pantry(food, 300)
+    asyncio.run(run(args.repeat))
+    main.close_all_connections()
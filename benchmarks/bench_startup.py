@@ -0,0 +1,187 @@
+"""
+Cold-start time of the stdio server: process spawn to first tool response.
+
+Each run spawns a fresh `python main.py`, speaks raw JSON-RPC over its stdin
+and stdout (so no client library is timed) and records when the initialize
+reply and the first tools/call reply (get_daily_summary) arrive, counted from
+the spawn. A second process per run sends its first call --idle seconds after
+initialize, as a real client would, and records that call's own latency
+("idle call"). Scenarios:
+
+    import     python -c "import main" (interpreter + module import only)
+    fresh      new database file, so the first call builds the schema
+    existing   one-year generated database already at the current version
+
+Results can be saved as a baseline and later compared against it:
+
+    python benchmarks/bench_startup.py --save benchmarks/startup_baseline.json
+    python benchmarks/bench_startup.py --compare benchmarks/startup_baseline.json
+
+Compare mode exits with status 1 if any median got slower than the baseline
+by more than --threshold (default 25%, ignoring differences under
+--min-delta-ms). Pass --importtime to print the slowest imports of one start.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--idle 0.5] [--save PATH | --compare PATH]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+INITIALIZE = {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {
+    "protocolVersion": "2025-06-18", "capabilities": {},
+    "clientInfo": {"name": "bench_startup", "version": "1"}}}
+INITIALIZED = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+FIRST_CALL = {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {
+    "name": "get_daily_summary", "arguments": {"date": date.today().isoformat()}}}
+
+
+def _send(proc, message):
+    proc.stdin.write(json.dumps(message) + "\n")
+    proc.stdin.flush()
+
+
+def _reply(proc, request_id):
+    """Read stdout lines until the response to request_id arrives."""
+    for line in proc.stdout:
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            if "error" in message or message.get("result", {}).get("isError"):
+                raise RuntimeError(f"server returned an error: {line.strip()}")
+            return message
+    raise RuntimeError("server exited before replying")
+
+
+def start_once(db_path, idle=0.0):
+    """(ms to initialize reply, ms to first tool reply) for one server process.
+    
+    With `idle`, the first call is sent that many seconds after initialize (as
+    a client would after listing tools) and its own latency is returned instead.
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, str(ROOT / "main.py")], cwd=ROOT, text=True,
+                            env={**os.environ, "HEALTH_MCP_DB": str(db_path)},
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        _send(proc, INITIALIZE)
+        _reply(proc, 1)
+        initialized = time.perf_counter()
+        _send(proc, INITIALIZED)
+        if idle:
+            time.sleep(idle)
+            start = time.perf_counter()
+        _send(proc, FIRST_CALL)
+        _reply(proc, 2)
+        first_call = time.perf_counter()
+    finally:
+        proc.stdin.close()
+        proc.wait(timeout=30)
+    return (initialized - start) * 1000, (first_call - start) * 1000
+
+
+def import_once():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=ROOT, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(runs, workdir, idle):
+    import generate_data
+    import main
+
+    existing = workdir / "existing.db"
+    generate_data.generate(existing, days=365, seed=5)
+    main.close_all_connections()
+
+    samples = {"import": [], "fresh": [], "existing": []}
+    for i in range(runs):
+        samples["import"].append({"import_ms": import_once()})
+        for scenario, db_path in (("fresh", workdir / f"fresh-{i}.db"), ("existing", existing)):
+            init_ms, first_ms = start_once(db_path)
+            idle_call_ms = start_once(workdir / f"idle-{i}.db" if scenario == "fresh" else db_path, idle)[1]
+            samples[scenario].append({"initialize_ms": init_ms, "first_call_ms": first_ms,
+                                      "idle_call_ms": idle_call_ms})
+
+    results = {}
+    for scenario, rows in samples.items():
+        results[scenario] = {key: round(statistics.median(row[key] for row in rows), 1)
+                             for key in rows[0]}
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Lines describing every median regression beyond the threshold."""
+    regressions = []
+    for scenario, stats in results.items():
+        for key, new in stats.items():
+            old = baseline.get("scenarios", {}).get(scenario, {}).get(key)
+            if old is not None and new - old > min_delta_ms and new > old * (1 + threshold):
+                regressions.append(f"{scenario:<9} {key:<14} {old:.1f} -> {new:.1f} ms "
+                                   f"(+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_importtime(top=15):
+    """Slowest cumulative imports of one `import main`, from -X importtime."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    print(f"\n{'module':<40}{'cumulative ms':>15}")
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"{name:<40}{cumulative / 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--idle", type=float, default=0.5, help="seconds between initialize and the idle call")
+    parser.add_argument("--save", metavar="PATH", help="write results as the new baseline")
+    parser.add_argument("--compare", metavar="PATH", help="flag regressions against this baseline")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=50)
+    parser.add_argument("--importtime", action="store_true", help="also show the slowest imports")
+    args = parser.parse_args()
+
+    results = run(args.runs, Path(tempfile.mkdtemp(prefix="health-mcp-bench-")), args.idle)
+    columns = (("import_ms", 11), ("initialize_ms", 15), ("first_call_ms", 15), ("idle_call_ms", 14))
+    print(f"{'scenario':<10}{'import ms':>11}{'initialize ms':>15}{'first call ms':>15}{'idle call ms':>14}")
+    for scenario, stats in results.items():
+        print(f"{scenario:<10}" + "".join(
+            f"{stats[key]:>{width}.1f}" if key in stats else " " * width for key, width in columns))
+
+    if args.importtime:
+        print_importtime()
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "scenarios": results,
+        }, indent=2) + "\n")
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()),
+                              args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regressions beyond {args.threshold:.0%}:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"\n✓ No regressions beyond {args.threshold:.0%} against {args.compare}")
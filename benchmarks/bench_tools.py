@@ -0,0 +1,230 @@
+"""
+Latency (p50/p95/p99) and peak memory of every MCP tool across dataset sizes.
+
+Each dataset is a separate database file filled by generate_data.py with history
+ending today; every tool function in main.py is then called directly
+(read-only tools first, writers last so they don't skew the readers). A run
+stops right away if a registered MCP tool has no case in tool_cases().
+Peak memory is the tracemalloc high-water mark of one extra call, so it
+counts Python allocations, not SQLite's page cache.
+
+Results can be saved as a baseline and later compared against it:
+
+    python benchmarks/bench_tools.py --save benchmarks/baselines.json
+    python benchmarks/bench_tools.py --compare benchmarks/baselines.json
+
+Compare mode exits with status 1 if any tool's p50 or p95 got slower than
+the baseline by more than --threshold (default 25%, ignoring differences
+under --min-delta-ms so sub-millisecond noise doesn't trip it).
+
+Usage: python benchmarks/bench_tools.py [--datasets month,5y,5y-100k] [--repeat 30]
+                                        [--tools REGEX] [--save PATH | --compare PATH]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+os.environ["HEALTH_MCP_EXPORT_DIR"] = _tmp  # import_food_catalog reads its CSV from there
+os.environ["HEALTH_MCP_PROFILE_DIR"] = str(Path(_tmp) / "profiles")  # for the profiling tools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_data  # noqa: E402
+import main  # noqa: E402
+
+# name -> (days of history, extra catalog foods)
+DATASETS = {
+    "month": (30, 0),
+    "5y": (5 * 365, 0),
+    "5y-100k": (5 * 365, 100_000),
+}
+
+def build_dataset(path, days, extra_foods, seed=3):
+    """Synthetic history ending today (see generate_data.py). Returns log rows written."""
+    main._current_db_path.set(str(path))
+    counts = generate_data.generate(path, days, seed, foods=extra_foods)
+    return sum(counts[table] for table in ("meals", "sleep_log", "weight_log", "exercise_log"))
+
+
+def tool_cases(workdir):
+    """(tool name, call(i), max repeats or None). Readers first, then writers."""
+    today = date.today().isoformat()
+    ninety_days_ago = (date.today() - timedelta(days=89)).isoformat()
+    catalog_csv = Path(workdir) / "catalog.csv"
+    catalog_csv.write_text("name,calories,protein,carbs,fats,fiber\n" + "".join(
+        f"bench import food {i},{100 + i % 300},5,20,3,1\n" for i in range(1000)))
+    diary = "\n".join(json.dumps({"type": "meal", "date": today, "food": "dal", "grams": 100, "time": "13:00"})
+                      for _ in range(1000))
+    diary_file = Path(workdir) / "diary.ndjson"
+    diary_file.write_text(diary + "\n")
+    export_file = Path(workdir) / "export.ndjson"
+    check_in = [{"tool": "log_sleep", "args": {"sleep_time": "23:30", "wake_time": "07:00", "date": today}},
+                {"tool": "log_weight", "args": {"weight_kg": 74.2, "date": today}},
+                {"tool": "log_meal", "args": {"food_items": "poha:200, curd:100", "date": today}},
+                {"tool": "get_daily_summary", "args": {"date": today}}]
+    # A few saved profiles for get_profile_summary (only MCP-dispatched calls are profiled)
+    main.profile_tool("list_foods", calls=3)
+    for _ in range(3):
+        asyncio.run(main.list_foods.run_async())
+    pantry_foods = ["roti", "poha", "apple", "potato", "broccoli", "salmon", "pasta", "chana"]
+    return [
+        ("calculate_bmi", lambda i: main.calculate_bmi(72, 1.75), None),
+        ("daily_water_intake", lambda i: main.daily_water_intake(72), None),
+        ("steps_to_calories", lambda i: main.steps_to_calories(9000, 72), None),
+        ("heart_rate_zone", lambda i: main.heart_rate_zone(34, 62), None),
+        ("list_foods", lambda i: main.list_foods(), None),
+        ("search_foods", lambda i: main.search_foods("chicken"), None),
+        ("get_daily_nutrition", lambda i: main.get_daily_nutrition(today), None),
+        ("get_nutrition_stats", lambda i: main.get_nutrition_stats(days=365), None),
+        ("get_sleep_summary", lambda i: main.get_sleep_summary(days=30), None),
+        ("get_weight_trend", lambda i: main.get_weight_trend(days=90), None),
+        ("get_user_profile", lambda i: main.get_user_profile(), None),
+        ("recommend_foods", lambda i: main.recommend_foods("lunch"), None),
+        ("recommend_exercise", lambda i: main.recommend_exercise(), None),
+        ("get_daily_summary", lambda i: main.get_daily_summary(today), None),
+        ("get_range_summary (1d)", lambda i: main.get_range_summary(today, today), None),
+        ("get_range_summary (90d)", lambda i: main.get_range_summary(ninety_days_ago, today), None),
+        ("list_my_pantry", lambda i: main.list_my_pantry(), None),
+        ("recommend_from_pantry", lambda i: main.recommend_from_pantry("dinner"), None),
+        ("view_food_routines", lambda i: main.view_food_routines(), None),
+        ("recommend_from_routines", lambda i: main.recommend_from_routines("afternoon"), None),
+        ("export_history (90d)", lambda i: main.export_history(str(export_file), ninety_days_ago,
+                                                               overwrite=True), 10),
+        ("server_metrics", lambda i: main.server_metrics(), None),
+        ("get_cache_stats", lambda i: main.get_cache_stats(), None),
+        ("get_slow_queries", lambda i: main.get_slow_queries(), None),
+        ("profile_tool", lambda i: main.profile_tool("calculate_bmi"), None),
+        ("get_profile_summary", lambda i: main.get_profile_summary("list_foods"), 10),
+        ("log_meal", lambda i: main.log_meal("roti:120, dal:150, chapatti:60", today), None),
+        ("log_sleep", lambda i: main.log_sleep("23:30", "07:00", today), None),
+        ("log_weight", lambda i: main.log_weight(74.2, today), None),
+        ("log_exercise", lambda i: main.log_exercise("walking", 30, "light", today), None),
+        ("set_user_profile", lambda i: main.set_user_profile(daily_calorie_goal=2100 + i % 2), None),
+        ("add_food_to_database", lambda i: main.add_food_to_database(f"bench food {i}", 100, 5, 10, 2), None),
+        ("add_food_alias", lambda i: main.add_food_alias(f"bench alias {i}", "dal"), None),
+        ("add_to_pantry", lambda i: main.add_to_pantry(pantry_foods[i % len(pantry_foods)], 200), None),
+        ("remove_from_pantry", lambda i: main.remove_from_pantry(pantry_foods[i % len(pantry_foods)]), None),
+        ("add_to_food_routine", lambda i: main.add_to_food_routine("idli", morning=True), None),
+        ("remove_from_food_routine", lambda i: main.remove_from_food_routine("idli"), None),
+        ("bulk_setup_routines", lambda i: main.bulk_setup_routines(evening_foods="maggie, samosa"), None),
+        ("batch", lambda i: main.batch(check_in), None),
+        ("import_diary", lambda i: main.import_diary(diary), 10),
+        ("import_history", lambda i: main.import_history(str(diary_file)), 10),
+        ("import_food_catalog", lambda i: main.import_food_catalog(str(catalog_csv)), 10),
+        ("rebuild_daily_totals", lambda i: main.rebuild_daily_totals(), 10),
+        ("create_backup", lambda i: main.create_backup(keep=2), 5),
+        ("list_backups", lambda i: main.list_backups(), None),
+        ("restore_backup", lambda i: main.restore_backup(
+            main.list_snapshots(main.current_db_path())[-1].name), 5),
+        # The warm-up call rolls up everything older than a year; the samples are the no-op check
+        ("compact_history", lambda i: main.compact_history(older_than_months=12), 10),
+    ]
+
+
+def uncovered_tools(cases):
+    """Registered MCP tools that no case in `cases` calls."""
+    registered = {t.name for t in asyncio.run(main.mcp.list_tools())}
+    return sorted(registered - {name.split(" (")[0] for name, _, _ in cases})
+
+
+def measure(call, repeat):
+    call(-1)  # warm caches and lazily built state
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        call(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    call(repeat)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50_ms": round(q[49], 3), "p95_ms": round(q[94], 3), "p99_ms": round(q[98], 3),
+            "peak_kib": round(peak / 1024, 1)}
+
+
+def run(dataset_names, repeat, tool_filter):
+    results = {}
+    for name in dataset_names:
+        days, extra_foods = DATASETS[name]
+        workdir = Path(tempfile.mkdtemp(prefix=f"{name}-", dir=_tmp))
+        start = time.perf_counter()
+        rows = build_dataset(workdir / "health.db", days, extra_foods)
+        print(f"\n== {name}: {rows:,} log rows, {extra_foods:,} extra foods "
+              f"(built in {time.perf_counter() - start:.1f}s)")
+        print(f"{'tool':<26}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak KiB':>11}")
+        results[name] = {}
+        cases = tool_cases(workdir)
+        missing = uncovered_tools(cases)
+        if missing:
+            sys.exit(f"⚠️ No benchmark case for: {', '.join(missing)} (add them to tool_cases)")
+        for tool, call, cap in cases:
+            if tool_filter and not re.search(tool_filter, tool):
+                continue
+            stats = measure(call, min(repeat, cap or repeat))
+            results[name][tool] = stats
+            print(f"{tool:<26}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+                  f"{stats['p99_ms']:>9.2f}{stats['peak_kib']:>11,.0f}")
+    main.close_all_connections()
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Lines describing every p50/p95 regression beyond the threshold."""
+    regressions = []
+    for dataset, tools in results.items():
+        for tool, stats in tools.items():
+            base = baseline.get("datasets", {}).get(dataset, {}).get(tool)
+            if base is None:
+                continue
+            for key in ("p50_ms", "p95_ms"):
+                old, new = base[key], stats[key]
+                if new - old > min_delta_ms and new > old * (1 + threshold):
+                    regressions.append(f"{dataset:<9} {tool:<26} {key[:3]} {old:.2f} -> {new:.2f} ms "
+                                       f"(+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--datasets", default=",".join(DATASETS))
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--tools", help="only tools whose name matches this regex")
+    parser.add_argument("--save", metavar="PATH", help="write results as the new baseline")
+    parser.add_argument("--compare", metavar="PATH", help="flag regressions against this baseline")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    results = run(args.datasets.split(","), args.repeat, args.tools)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": main.sqlite3.sqlite_version,
+            "repeat": args.repeat,
+            "datasets": results,
+        }, indent=2) + "\n")
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, json.loads(Path(args.compare).read_text()),
+                              args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regressions beyond {args.threshold:.0%}:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"\n✓ No regressions beyond {args.threshold:.0%} against {args.compare}")
@@ -0,0 +1,98 @@
+"""
+Sustained log writes per second with and without the group-commit write buffer.
+
+Each mode runs in its own process (the buffer is configured at import) against
+a fresh one-year generated database. --clients concurrent callers go through
+the registered coroutines of log_meal, log_exercise, log_sleep and log_weight,
+the way MCP calls would, for --seconds; every --read-every writes a client
+also calls get_daily_summary, which forces a flush. The time to commit
+whatever is still queued at the end is included.
+
+Usage: python benchmarks/bench_write_buffer.py [--seconds 5] [--clients 4] [--modes 0,10,100]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+
+async def client(main, deadline, read_every, counter):
+    today = date.today().isoformat()
+    # Mostly activity and meals; log_weight reads the previous entry, so it flushes
+    writes = itertools.cycle([
+        lambda: main.log_exercise.run_async("walking", 10, "light", today),
+        lambda: main.log_meal.run_async("roti:60, dal:100", today),
+        lambda: main.log_exercise.run_async("cycling", 15, "moderate", today),
+        lambda: main.log_meal.run_async("apple:150", today),
+        lambda: main.log_exercise.run_async("running", 5, "intense", today),
+        lambda: main.log_sleep.run_async("23:00", "07:00", today),
+        lambda: main.log_exercise.run_async("walking", 10, "light", today),
+        lambda: main.log_meal.run_async("curd:100", today),
+        lambda: main.log_exercise.run_async("yoga", 20, "light", today),
+        lambda: main.log_weight.run_async(72.5, today),
+    ])
+    done = 0
+    while time.perf_counter() < deadline:
+        await next(writes)()
+        done += 1
+        if read_every and done % read_every == 0:
+            await main.get_daily_summary.run_async(today)
+    counter.append(done)
+
+
+def child(seconds, clients, read_every):
+    _tmp = tempfile.mkdtemp(prefix="health-mcp-bench-")
+    os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "bench.db")
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import generate_data
+    import main
+
+    generate_data.generate(main.DB_PATH, days=365, seed=6)
+    main.get_connection().close()
+
+    async def run():
+        counter = []
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(client(main, deadline, read_every, counter) for _ in range(clients)))
+        return sum(counter)
+
+    start = time.perf_counter()
+    writes = asyncio.run(run())
+    main.close_all_connections()
+    elapsed = time.perf_counter() - start
+    return {"writes": writes, "seconds": elapsed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--read-every", type=int, default=0, help="writes between reads per client (0 = none)")
+    parser.add_argument("--modes", default="0,10,100", help="HEALTH_MCP_WRITE_BUFFER_MS values (0 = per-call commit)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.seconds, args.clients, args.read_every)))
+        sys.exit(0)
+
+    print(f"{'buffer ms':>10}{'writes':>10}{'seconds':>10}{'writes/s':>12}")
+    baseline = None
+    for mode in args.modes.split(","):
+        out = subprocess.run([sys.executable, __file__, "--child", "--seconds", str(args.seconds),
+                              "--clients", str(args.clients), "--read-every", str(args.read_every)],
+                             env={**os.environ, "HEALTH_MCP_WRITE_BUFFER_MS": mode},
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out)
+        rate = result["writes"] / result["seconds"]
+        baseline = baseline or rate
+        print(f"{mode:>10}{result['writes']:>10}{result['seconds']:>10.2f}{rate:>12,.0f}"
+              f"{'' if rate == baseline else f'  ({rate / baseline:.1f}x)'}")
@@ -0,0 +1,111 @@
+"""
+Assert that the hot read queries are answered from indexes, not table scans.
+
+Builds a scratch database through init_database() (so every migration runs),
+then checks EXPLAIN QUERY PLAN for each query below. Exits non-zero on the
+first query that scans a log table.
+
+Usage: python benchmarks/check_query_plans.py
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="health-mcp-plans-")
+os.environ["HEALTH_MCP_DB"] = str(Path(_tmp) / "plans.db")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+# (description, sql, params, index the plan must mention)
+HOT_QUERIES = [
+    ("daily meal totals",
+     "SELECT SUM(calories), SUM(protein), SUM(carbs), SUM(fats) FROM meals WHERE date = ?",
+     ("2026-01-01",), "COVERING INDEX idx_meals_date_nutrients"),
+    ("nutrition stats by day",
+     """SELECT date, SUM(calories), SUM(protein), SUM(carbs), SUM(fats), SUM(fiber)
+        FROM meals WHERE date >= date('now', '-' || ? || ' days')
+        GROUP BY date ORDER BY date DESC""",
+     (7,), "COVERING INDEX idx_meals_date_nutrients"),
+    ("daily totals range",
+     """SELECT date, calories, protein, carbs, fats, fiber FROM daily_totals
+        WHERE date >= date('now', '-' || ? || ' days') AND meal_items > 0 ORDER BY date DESC""",
+     (7,), "PRIMARY KEY"),
+    ("meals for a day",
+     "SELECT food_name, quantity_grams, calories FROM meals WHERE date = ? ORDER BY timestamp",
+     ("2026-01-01",), "idx_meals_date_nutrients"),
+    ("previous weight",
+     "SELECT weight_kg FROM weight_log WHERE date < ? ORDER BY date DESC LIMIT 1",
+     ("2026-01-01",), "COVERING INDEX idx_weight_log_date_id"),
+    ("latest weight",
+     "SELECT weight_kg FROM weight_log ORDER BY date DESC LIMIT 1",
+     (), "COVERING INDEX idx_weight_log_date_id"),
+    ("weight trend page",
+     """SELECT id, date, weight_kg FROM weight_log
+        WHERE date >= date('now', '-' || ? || ' days') AND (date, id) < (?, ?)
+        ORDER BY date DESC, id DESC LIMIT ?""",
+     (30, "9999-12-31", 0, 31), "COVERING INDEX idx_weight_log_date_id"),
+    ("weight trend fit", main.WEIGHT_FIT_QUERY, (30,), "COVERING INDEX idx_weight_log_date_id"),
+    ("weight since trend", main.WEIGHT_SINCE_QUERY, (0,), "INTEGER PRIMARY KEY"),
+    ("sleep history page",
+     """SELECT id, date, sleep_time, wake_time, hours, quality FROM sleep_log
+        WHERE date >= date('now', '-' || ? || ' days') AND (date, id) < (?, ?)
+        ORDER BY date DESC, id DESC LIMIT ?""",
+     (30, "9999-12-31", 0, 31), "idx_sleep_log_date"),
+    ("food catalog page",
+     "SELECT name, calories FROM food_database WHERE name > ? ORDER BY name LIMIT ?",
+     ("", 101), "sqlite_autoindex_food_database_1"),
+    ("sleep for a day",
+     "SELECT sleep_time, wake_time, hours, quality FROM sleep_log WHERE date = ?",
+     ("2026-01-01",), "idx_sleep_log_date"),
+    ("sleep summary",
+     "SELECT date, hours FROM sleep_log WHERE date >= date('now', '-' || ? || ' days') ORDER BY date DESC",
+     (7,), "idx_sleep_log_date"),
+    ("exercise for a day",
+     "SELECT exercise_name, duration_minutes, calories_burned FROM exercise_log WHERE date = ?",
+     ("2026-01-01",), "idx_exercise_log_date"),
+    ("daily summary", main.DAY_SUMMARY_QUERY, ("2026-01-01",), "idx_exercise_log_date"),
+    ("range summary", main.RANGE_SUMMARY_QUERY, ("2026-01-01", "2026-03-31"), "PRIMARY KEY"),
+    ("export meals", main.EXPORT_SOURCES["meals"][1], ("2026-01-01", "2026-03-31"), "idx_meals_date"),
+    ("export sleep", main.EXPORT_SOURCES["sleep"][1], ("2026-01-01", "2026-03-31"), "idx_sleep_log_date"),
+    ("export weight", main.EXPORT_SOURCES["weight"][1], ("2026-01-01", "2026-03-31"), "idx_weight_log_date_id"),
+    ("export exercise", main.EXPORT_SOURCES["exercise"][1], ("2026-01-01", "2026-03-31"), "idx_exercise_log_date"),
+    ("rollup next days", main.ROLLUP_NEXT_DAYS_QUERY, ("2026-01-01", 31), "COVERING INDEX idx_meals_date_nutrients"),
+    ("rollup day sums", main.ROLLUP_DAYS_UPSERT, ("2026-01-01", "2026-01-31"), "idx_meals_date_nutrients"),
+    ("rollup food months", main.ROLLUP_FOOD_MONTHS_UPSERT, ("2026-01-01", "2026-01-31"), "idx_meals_date"),
+    ("rollup delete", "DELETE FROM meals WHERE date BETWEEN ? AND ?", ("2026-01-01", "2026-01-31"), "idx_meals_date"),
+    ("rolled-up day",
+     "SELECT calories, protein, carbs, fats, fiber, meal_items FROM meal_rollups WHERE date = ?",
+     ("2026-01-01",), "PRIMARY KEY"),
+]
+
+TABLE_SCANS = {f"SCAN {table}" for table in ("meals", "weight_log", "sleep_log", "exercise_log", "daily_totals")}
+
+
+def main_check():
+    conn = main.get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    print(f"schema version {version}/{main.SCHEMA_VERSION}")
+    failures = 0
+    for desc, sql, params, expected in HOT_QUERIES:
+        steps = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        plan = " | ".join(steps)
+        # A bare "SCAN <table>" is a full table scan; "SCAN ... USING INDEX" with
+        # a LIMIT is an ordered index walk and is fine
+        ok = expected in plan and not any(step in TABLE_SCANS for step in steps)
+        failures += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {desc:<24} {plan}")
+    conn.close()
+
+    # Re-running migrations must be a no-op
+    main.init_database()
+    conn = main.get_connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == main.SCHEMA_VERSION
+    conn.close()
+    return failures
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main_check() else 0)
@@ -0,0 +1,272 @@
+"""
+Deterministic synthetic health history for load and scale testing.
+
+Writes meals, sleep, weight, exercise, profile, pantry and routine rows
+straight into the main.py schema (plus matching daily_totals), one
+transaction per database and batched executemany inserts. The same seed
+and end date always produce the same rows.
+
+Distributions are meant to look like a real diary: meals cluster around
+breakfast/lunch/snack/dinner times, each user favours a handful of foods,
+bedtimes straddle midnight (later on weekends), and weight follows a slow
+per-user drift with day-to-day noise.
+
+One user writes a single database file; --users N writes N files named
+user-00000.db... into a directory, which the server serves as shards with
+HEALTH_MCP_DATA_DIR=<dir> (and HEALTH_MCP_TRUST_USER_HEADER=1 with an
+X-Health-User: user-00000 header, or a token whose subject is user-00000).
+
+Usage: python benchmarks/generate_data.py OUT [--days 1825] [--users 1] [--foods 0]
+                                              [--seed 1] [--end YYYY-MM-DD] [--jobs N]
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from pathlib import Path
+
+os.environ.setdefault("HEALTH_MCP_DB", str(Path(tempfile.mkdtemp(prefix="health-mcp-gen-")) / "unused.db"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main  # noqa: E402
+
+BATCH_SIZE = 50_000
+
+# (slot, probability the meal happens, mean hour, std dev in hours)
+MEAL_SLOTS = [
+    ("breakfast", 0.85, 8.0, 0.75),
+    ("lunch", 0.95, 13.2, 0.8),
+    ("snack", 0.5, 17.0, 1.0),
+    ("dinner", 0.95, 20.5, 0.9),
+    ("late snack", 0.12, 23.0, 0.4),
+]
+
+# (exercise, intensity, mean minutes)
+EXERCISES = [
+    ("walking", "light", 35), ("yoga", "light", 30), ("running", "moderate", 35),
+    ("cycling", "moderate", 45), ("swimming", "moderate", 40), ("weight training", "intense", 50),
+    ("hiit", "intense", 25),
+]
+
+# Like main's bulk-import statements, but with explicit timestamps so reruns are identical
+SLEEP_INSERT = """
+    INSERT INTO sleep_log (date, sleep_time, wake_time, hours, quality, notes, timestamp)
+    VALUES (?, ?, ?, ?, ?, '', ?)
+"""
+WEIGHT_INSERT = "INSERT INTO weight_log (date, weight_kg, notes, timestamp) VALUES (?, ?, '', ?)"
+EXERCISE_INSERT = """
+    INSERT INTO exercise_log (date, exercise_name, duration_minutes, intensity, calories_burned, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+ROUTINE_PERIODS = ["morning", "midday", "afternoon", "evening", "night", "latenight"]
+REGIONS = ["India", "India", "India", "USA", "Europe"]
+DIETS = ["vegetarian", "no-restrictions", "no-restrictions", "vegan", "eggetarian"]
+
+
+def _hhmm(hours):
+    minutes = int(round(hours * 60)) % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def add_catalog_foods(cursor, count, seed=0):
+    """Bulk-add `count` synthetic foods (synthetic food 0..count-1) to food_database."""
+    rng = random.Random(seed)
+    for start in range(0, count, BATCH_SIZE):
+        cursor.executemany(main.FOOD_INSERT, [
+            (f"synthetic food {i}", rng.randint(20, 600), rng.randint(0, 30), rng.randint(0, 80),
+             rng.randint(0, 50), rng.randint(0, 12))
+            for i in range(start, min(start + BATCH_SIZE, count))])
+
+
+def generate(path, days=365, seed=1, end=None, foods=0):
+    """Fill the database at `path` with `days` of history ending on `end` (default today).
+
+    Returns {table: rows written}.
+    """
+    rng = random.Random(seed)
+    end = end or date.today()
+    path = Path(path)
+    main.init_database(path)
+    conn = main.get_connection(path)
+    cursor = conn.cursor()
+    counts = {"food_database": foods, "meals": 0, "sleep_log": 0, "weight_log": 0,
+              "exercise_log": 0, "daily_totals": 0}
+
+    if foods:
+        add_catalog_foods(cursor, foods, seed)
+    cursor.execute("SELECT name, calories, protein, carbs, fats, fiber FROM food_database ORDER BY id")
+    catalog = cursor.fetchall()
+
+    # Each user eats mostly from a small personal repertoire, Zipf-weighted
+    repertoire = rng.sample(catalog, min(len(catalog), rng.randint(15, 40)))
+    weights = [1 / (rank + 1) for rank in range(len(repertoire))]
+    cum_weights = [sum(weights[:i + 1]) for i in range(len(weights))]
+
+    start_weight = rng.gauss(78, 10)
+    target_weight = start_weight + rng.uniform(-10, 2)
+    drift = rng.uniform(-0.015, 0.005)  # kg per day
+    bedtime_mean = rng.gauss(23.2, 0.6)
+    active = rng.uniform(0.2, 0.8)
+    favourite_exercises = rng.sample(EXERCISES, 3)
+
+    meals, sleeps, weights_log, exercises, totals = [], [], [], [], []
+    weight = start_weight
+    first = end.toordinal() - days + 1
+    for ordinal in range(first, end.toordinal() + 1):
+        day = date.fromordinal(ordinal)
+        iso = day.isoformat()
+        weekend = day.weekday() >= 5
+        day_cal = day_protein = day_carbs = day_fats = day_fiber = 0.0
+        items = 0
+
+        for _, probability, mean_hour, spread in MEAL_SLOTS:
+            if rng.random() >= probability:
+                continue
+            hour = min(max(rng.gauss(mean_hour + (0.7 if weekend else 0), spread), 0), 23.98)
+            timestamp = f"{iso} {_hhmm(hour)}:{rng.randrange(60):02d}"
+            dishes = dict.fromkeys(rng.choices(repertoire, cum_weights=cum_weights, k=rng.randint(1, 3)))
+            for name, cal, protein, carbs, fats, fiber in dishes:
+                grams = max(5, round(rng.lognormvariate(math.log(120), 0.45) / 5) * 5)
+                m = grams / 100
+                cal, protein, carbs, fats, fiber = cal * m, protein * m, carbs * m, fats * m, fiber * m
+                meals.append((iso, name, grams, cal, protein, carbs, fats, fiber, timestamp))
+                day_cal += cal
+                day_protein += protein
+                day_carbs += carbs
+                day_fats += fats
+                day_fiber += fiber
+                items += 1
+
+        # Sleep is logged on the day you wake up; bedtimes often fall after midnight
+        sleep_hours = None
+        if rng.random() < 0.93:
+            bedtime = rng.gauss(bedtime_mean + (0.8 if weekend else 0), 0.7)
+            duration = min(max(rng.gauss(7.3 if weekend else 6.9, 0.9), 3.5), 11)
+            sleep_time, wake_time = _hhmm(bedtime % 24), _hhmm((bedtime + duration) % 24)
+            sleep_hours = main.sleep_duration_hours(sleep_time, wake_time)
+            quality = ("poor" if sleep_hours < 6 else "fair" if sleep_hours < 7
+                       else "excellent" if sleep_hours >= 8.5 and rng.random() < 0.4 else "good")
+            sleeps.append((iso, sleep_time, wake_time, sleep_hours, quality, f"{iso} {wake_time}:00"))
+
+        # Weight drifts toward the user's target, then wanders around it
+        if weight > target_weight or drift > 0:
+            weight += drift
+        weight += rng.gauss(0, 0.03)
+        weight_kg = None
+        if rng.random() < (0.8 if day.weekday() == 0 else 0.45):
+            weight_kg = round(weight + rng.gauss(0, 0.35), 1)
+            weights_log.append((iso, weight_kg, f"{iso} {_hhmm(rng.gauss(7.5, 0.5))}:00"))
+
+        exercise_cal = exercise_min = 0
+        if rng.random() < active * (1.2 if weekend else 1):
+            name, intensity, mean_minutes = rng.choice(favourite_exercises)
+            minutes = max(10, round(rng.gauss(mean_minutes, mean_minutes / 4) / 5) * 5)
+            exercise_cal = minutes * main.EXERCISE_CALORIE_RATES[intensity]
+            exercise_min = minutes
+            exercises.append((iso, name, minutes, intensity, exercise_cal,
+                              f"{iso} {_hhmm(rng.choice((7, 18, 19)) + rng.random())}:00"))
+
+        if items or sleep_hours is not None or weight_kg is not None or exercise_min:
+            totals.append((iso, day_cal, day_protein, day_carbs, day_fats, day_fiber, items,
+                           exercise_cal, exercise_min, sleep_hours, weight_kg))
+
+        if len(meals) >= BATCH_SIZE:
+            _flush(cursor, counts, meals, sleeps, weights_log, exercises, totals)
+    _flush(cursor, counts, meals, sleeps, weights_log, exercises, totals)
+
+    cursor.execute("DELETE FROM user_profile")
+    cursor.execute("""
+        INSERT INTO user_profile (height_m, target_weight_kg, daily_calorie_goal, activity_level,
+                                  region, dietary_preferences, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (round(rng.gauss(1.70, 0.09), 2), round(target_weight, 1), rng.choice((1800, 2000, 2200, 2500)),
+          rng.choice(("sedentary", "light", "moderate", "active")), rng.choice(REGIONS), rng.choice(DIETS),
+          f"{end.isoformat()} 09:00:00"))
+
+    stamp = f"{end.isoformat()} 09:00:00"
+    pantry = rng.sample(catalog, min(len(catalog), rng.randint(8, 20)))
+    cursor.executemany("""
+        INSERT INTO user_pantry (food_name, quantity_grams, notes, last_updated) VALUES (?, ?, '', ?)
+    """, [(row[0], rng.choice((None, 250, 500, 1000)), stamp) for row in pantry])
+
+    routines = []
+    for row in rng.sample(repertoire, min(len(repertoire), rng.randint(10, 25))):
+        flags = [int(rng.random() < 0.3) for _ in ROUTINE_PERIODS]
+        flags[rng.randrange(len(flags))] = 1
+        routines.append((row[0], *flags, rng.choice(("quick", "cook", "ready", "snack")),
+                         rng.choice(("easy", "easy", "medium", "hard")), rng.choice((50, 100, 150, 200)),
+                         rng.randint(3, 10), stamp))
+    cursor.executemany("""
+        INSERT INTO food_routines (food_name, morning, midday, afternoon, evening, night, latenight,
+                                   preparation_type, effort_level, typical_portion_grams,
+                                   preference_score, notes, last_updated)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, '', ?)
+    """, routines)
+    counts["user_pantry"] = len(pantry)
+    counts["food_routines"] = len(routines)
+    main.sync_weight_trend(cursor)  # like every other writer of weight_log
+
+    conn.commit()
+    conn.close()
+    return counts
+
+
+def _flush(cursor, counts, meals, sleeps, weights, exercises, totals):
+    for table, sql, rows in (("meals", main.MEAL_INSERT, meals), ("sleep_log", SLEEP_INSERT, sleeps),
+                             ("weight_log", WEIGHT_INSERT, weights), ("exercise_log", EXERCISE_INSERT, exercises)):
+        cursor.executemany(sql, rows)
+        counts[table] += len(rows)
+        rows.clear()
+    cursor.executemany(main.DAILY_TOTALS_UPSERT, totals)
+    counts["daily_totals"] += len(totals)
+    totals.clear()
+
+
+def _generate_user(args):
+    out_dir, user, days, seed, end, foods = args
+    counts = generate(Path(out_dir) / f"user-{user:05d}.db", days, seed + user, end, foods)
+    main.close_all_connections()
+    return counts
+
+
+def generate_users(out_dir, users, days=365, seed=1, end=None, foods=0, jobs=None):
+    """One database per user in `out_dir`, generated in parallel. Returns summed row counts."""
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    end = end or date.today()
+    totals = {}
+    tasks = [(str(out_dir), user, days, seed, end, foods) for user in range(users)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for counts in pool.map(_generate_user, tasks, chunksize=max(1, users // 64)):
+            for table, rows in counts.items():
+                totals[table] = totals.get(table, 0) + rows
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("out", help="database file (one user) or directory (--users > 1)")
+    parser.add_argument("--days", type=int, default=5 * 365)
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--foods", type=int, default=0, help="extra synthetic catalog foods per database")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--end", type=date.fromisoformat, help="last day of history (default: today)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes for --users (default: CPUs)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.users > 1:
+        counts = generate_users(args.out, args.users, args.days, args.seed, args.end, args.foods, args.jobs)
+    else:
+        counts = generate(args.out, args.days, args.seed, args.end, args.foods)
+        main.close_all_connections()
+    elapsed = time.perf_counter() - start
+    rows = sum(counts.values())
+    print(" | ".join(f"{table}: {n:,}" for table, n in counts.items()))
+    print(f"{rows:,} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
@@ -1,20 +1,48 @@
 """
 Health MCP Server - Comprehensive Health Tracking with AI Recommendations
 
-This MCP server provides 28 tools for complete health management:
+This MCP server provides 46 tools for complete health management:
 - Nutrition tracking with 35+ foods (Indian & International)
 - Sleep quality analysis
 - Weight management with trends
 - Exercise logging with calorie estimates
 - Smart meal recommendations (region-aware, pantry-aware, time-aware)
 - User profile & goals management
+- Food search, aliases and bulk catalog import (CSV, USDA FoodData Central)
+- Diary import and history export/import (NDJSON, CSV)
+- Batches of tool calls in one transaction
+- Backups with verified restore
+- Server metrics, cache stats, slow queries and tool profiling
+- Compaction of old meal history into daily rollups
 
 Perfect for LLM-driven health conversations: "I ate 2 rotis and dal" 
 → Automatically logs nutrition, suggests next meal, tracks progress.
 """
 
 from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.dependencies import get_access_token, get_context, get_http_headers
+import asyncio
+import atexit
+import contextvars
+import csv
+import functools
+import hashlib
+import heapq
+import io
+import json
+import logging
+import math
+import os
+import re
+import signal
 import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -41,11 +69,487 @@ Always provide actionable insights and encourage healthy habits!
 )
 
 # Database setup
-DB_PATH = Path(__file__).parent / "health_data.db"
+DB_PATH = Path(os.environ.get("HEALTH_MCP_DB", Path(__file__).parent / "health_data.db"))
 
-def init_database():
-    """Initialize the SQLite database with necessary tables."""
-    conn = sqlite3.connect(DB_PATH)
+# ==== CONNECTION MANAGEMENT ====
+
+# Applied once per physical connection, not per tool call
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",          # readers don't block the writer
+    "PRAGMA busy_timeout = 5000",         # wait up to 5s on a locked db instead of failing
+    "PRAGMA synchronous = NORMAL",        # safe with WAL, one fsync per checkpoint
+    "PRAGMA cache_size = -16000",         # ~16MB page cache
+    "PRAGMA mmap_size = 268435456",       # 256MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Idle connections kept open per database file
+POOL_SIZE = int(os.environ.get("HEALTH_MCP_POOL_SIZE", "4"))
+
+# Compiled statements cached per connection (sqlite3 default is 128)
+STATEMENT_CACHE_SIZE = 256
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() hands it back to its pool.
+
+    Tools keep the plain connect/close pattern; close() rolls back anything
+    left uncommitted (same as a real close) and parks the connection for reuse.
+    """
+
+    pool = None
+    cursor_factory = sqlite3.Cursor  # MeteredCursor when metrics are on
+    in_batch = False  # inside batch(): commit() and close() wait for the batch's end
+    _after_commit = ()  # callbacks waiting for the current transaction to commit
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or self.cursor_factory)
+
+    def after_commit(self, callback):
+        """Call `callback` once the current transaction commits; a rollback drops it."""
+        if not self._after_commit:
+            self._after_commit = []
+        self._after_commit.append(callback)
+
+    def commit(self):
+        if not self.in_batch:
+            super().commit()
+            callbacks, self._after_commit = self._after_commit, ()
+            for callback in callbacks:
+                callback()
+
+    def rollback(self):
+        super().rollback()
+        self._after_commit = ()
+
+    def close(self):
+        if self.in_batch:
+            return
+        self._after_commit = ()
+        if self.pool is None:
+            super().close()
+            return
+        if self.in_transaction:
+            self.rollback()
+        self.pool.release(self)
+
+    def discard(self):
+        """Really close the underlying sqlite3 handle."""
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived, pre-configured connections to one database file.
+
+    The first acquire() runs `initializer` (schema setup) once, so a shard's
+    schema is only checked when somebody actually uses it.
+    """
+
+    def __init__(self, path, size=POOL_SIZE, initializer=None):
+        self.path = Path(path)
+        self.size = size
+        self.initializer = initializer
+        self.ready = initializer is None
+        self.closed = False
+        self.catalog = None  # FoodCatalog for this file, created on first use
+        self.versions = None  # TableVersions for this file, created by the first cached read
+        self.writes = None  # WriteBuffer for this file when HEALTH_MCP_WRITE_BUFFER_MS is set
+        self._idle = []
+        self._lock = threading.Lock()
+        self._init_lock = threading.Lock()
+
+    def _open(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.path,
+            factory=PooledConnection,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if METRICS_ENABLED:
+            conn.cursor_factory = MeteredCursor
+        if TRACE_STATEMENTS:
+            conn.set_trace_callback(_count_statement)
+        conn.pool = self
+        return conn
+
+    def ensure_ready(self):
+        """Run the initializer if no connection has been opened yet."""
+        if self.ready:
+            return
+        with self._init_lock:
+            if self.ready:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._open()
+            try:
+                self.initializer(conn)
+            finally:
+                conn.close()
+            self.ready = True
+
+    def acquire(self) -> PooledConnection:
+        self.ensure_ready()
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._open()
+
+    def attach(self, name, factory):
+        """Per-file helper (catalog, versions) stored as self.<name>, created on first use.
+
+        None once the pool is closed: an evicted pool never gets a helper that
+        would open a connection nobody closes.
+        """
+        with self._lock:
+            if self.closed:
+                return None
+            if getattr(self, name) is None:
+                setattr(self, name, factory(self.path))
+            return getattr(self, name)
+
+    def release(self, conn: PooledConnection):
+        with self._lock:
+            if not self.closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.discard()
+
+    def close_all(self):
+        """Close idle connections now; checked-out ones close when released."""
+        if self.writes is not None:
+            self.writes.close()
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.discard()
+        if self.catalog is not None:
+            self.catalog.close()
+        if self.versions is not None:
+            self.versions.close()
+
+
+# ==== PER-USER SHARDS ====
+# Multi-tenant hosting: set HEALTH_MCP_DATA_DIR and every user gets their own
+# database file there, picked per tool call from the authenticated user of the
+# MCP request (the access token's subject). Behind a proxy that authenticates
+# users itself, HEALTH_MCP_TRUST_USER_HEADER=1 takes the id from the
+# X-Health-User header the proxy sets instead. Without DATA_DIR, everything
+# uses DB_PATH.
+
+DATA_DIR = os.environ.get("HEALTH_MCP_DATA_DIR")
+DATA_DIR = Path(DATA_DIR) if DATA_DIR else None
+
+TENANT_HEADER = "x-health-user"
+
+# Only honour X-Health-User when a trusted proxy sets it (clients can send anything)
+TRUST_TENANT_HEADER = os.environ.get("HEALTH_MCP_TRUST_USER_HEADER", "0") == "1"
+
+# Database files kept open at once; the least recently used one is closed first
+MAX_OPEN_SHARDS = int(os.environ.get("HEALTH_MCP_MAX_SHARDS", "64"))
+
+_shards = OrderedDict()  # path -> ConnectionPool, least recently used first
+_shards_lock = threading.Lock()
+
+# Database file for the tool call running in this thread/task (None = DB_PATH)
+_current_db_path = contextvars.ContextVar("health_db_path", default=None)
+
+# Connection of the batch() call running in this thread; every tool it runs shares it
+_batch_connection = contextvars.ContextVar("health_batch_connection", default=None)
+
+
+def tenant_db_path(tenant: str) -> Path:
+    """Database file for a tenant id under DATA_DIR."""
+    if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", tenant):
+        return DATA_DIR / f"{tenant}.db"
+    # Arbitrary ids (emails, "auth0|123"...) become a safe file name in their
+    # own folder, so no plain id can name another tenant's hashed file
+    return DATA_DIR / "hashed" / f"{hashlib.sha256(tenant.encode()).hexdigest()[:32]}.db"
+
+
+def resolve_tenant_db_path():
+    """Shard for the current MCP request, or None for single-user mode and direct calls."""
+    if DATA_DIR is None:
+        return None
+    try:
+        get_context()
+    except RuntimeError:
+        return None  # called directly (benchmarks, scripts), not through MCP
+    token = get_access_token()
+    tenant = token and (token.subject or token.claims.get("sub") or token.client_id)
+    if not tenant and TRUST_TENANT_HEADER:
+        tenant = get_http_headers().get(TENANT_HEADER)
+    if not tenant:
+        raise ToolError("This server keeps one database per user and needs an authenticated user")
+    return tenant_db_path(tenant)
+
+
+def _shard(path: Path) -> ConnectionPool:
+    with _shards_lock:
+        pool = _shards.get(path)
+        if pool is not None:
+            _shards.move_to_end(path)
+            return pool
+        pool = _shards[path] = ConnectionPool(path, initializer=create_schema)
+        evicted = []
+        while len(_shards) > MAX_OPEN_SHARDS:
+            evicted.append(_shards.popitem(last=False)[1])
+    for old in evicted:
+        old.close_all()
+    return pool
+
+
+def _shard_helper(path, name, factory):
+    while True:
+        pool = _shard(Path(path) if path else current_db_path())
+        pool.ensure_ready()
+        helper = pool.attach(name, factory)
+        if helper is not None:
+            return helper
+        # Evicted between _shard() and attach(); the next _shard() opens a fresh pool
+
+
+def current_db_path() -> Path:
+    """Database file the current tool call works on."""
+    return Path(_current_db_path.get() or DB_PATH)
+
+
+def get_connection(path=None) -> PooledConnection:
+    """Get a pooled connection to the health database (current shard by default).
+
+    Use exactly like sqlite3.connect(): call close() when done and the
+    connection goes back to the pool instead of being torn down. Inside
+    batch() this is the batch's connection, with its transaction still open.
+    """
+    batch_conn = _batch_connection.get()
+    if batch_conn is not None and (path is None or Path(path) == batch_conn.pool.path):
+        return batch_conn
+    pool = _shard(Path(path) if path else current_db_path())
+    if pool.writes is not None:
+        pool.writes.flush()  # reads and direct writes see queued log entries
+    return pool.acquire()
+
+
+def close_all_connections():
+    """Close every pooled connection (shutdown, tests, benchmarks)."""
+    with _shards_lock:
+        pools = list(_shards.values())
+        _shards.clear()
+    for pool in pools:
+        pool.close_all()
+
+
+# ==== WRITE BUFFER ====
+# Optional group commit for the log_* tools (wearables push many small entries).
+# With HEALTH_MCP_WRITE_BUFFER_MS set, each log call queues its write and
+# returns; a background thread commits the queue in one transaction every that
+# many ms, or the caller does once HEALTH_MCP_WRITE_BUFFER_ROWS rows are queued.
+# get_connection() and the read cache flush first, so nothing in this process
+# reads around a queued write. Other processes see entries after the flush.
+
+WRITE_BUFFER_SECONDS = float(os.environ.get("HEALTH_MCP_WRITE_BUFFER_MS", "0")) / 1000
+WRITE_BUFFER_ROWS = int(os.environ.get("HEALTH_MCP_WRITE_BUFFER_ROWS", "500"))
+
+write_buffer_log = logging.getLogger("health_mcp.write_buffer")
+
+
+class WriteBuffer:
+    """Queued writes for one database file, committed together.
+
+    Each write is a function of a cursor. A flush runs the whole queue in one
+    transaction; if that fails, every write is retried in its own so one bad
+    entry can't take the others with it (failures are logged, since the
+    caller was already answered). Tools validate their arguments before
+    queuing; whatever a write still raises stays inside flush(), which runs
+    in other callers' get_connection().
+    """
+
+    def __init__(self, pool, interval=WRITE_BUFFER_SECONDS, max_rows=WRITE_BUFFER_ROWS):
+        self.pool = pool
+        self.interval = interval
+        self.max_rows = max_rows
+        self._pending = []
+        self._rows = 0
+        self._lock = threading.Lock()  # guards _pending
+        self._flush_lock = threading.Lock()  # one flush at a time; readers wait for it
+        self._closed = threading.Event()
+        self._thread = None
+
+    def add(self, apply, rows=1):
+        """Queue apply(cursor); flushes right away once max_rows rows are waiting."""
+        with self._lock:
+            self._pending.append((apply, rows))
+            self._rows += rows
+            full = self._rows >= self.max_rows or self._closed.is_set()
+            if self._thread is None and not self._closed.is_set():
+                self._thread = threading.Thread(target=self._run, name=f"write-buffer-{self.pool.path.stem}",
+                                                daemon=True)
+                self._thread.start()
+        if full:
+            self.flush()
+
+    def _run(self):
+        while not self._closed.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                write_buffer_log.exception("flush of %s failed", self.pool.path)
+
+    def flush(self, durable=False) -> int:
+        """Commit everything queued so far. Returns the number of writes committed."""
+        if not self._pending and not self._flush_lock.locked():
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._rows = self._pending, [], 0
+            if not batch:
+                return 0
+            try:
+                conn = self.pool.acquire()
+            except Exception:
+                # Nothing ran yet: put the writes back for the next flush
+                with self._lock:
+                    self._pending[:0] = batch
+                    self._rows += sum(rows for _, rows in batch)
+                write_buffer_log.exception("can't open %s to flush queued writes", self.pool.path)
+                return 0
+            try:
+                cursor = conn.cursor()
+                try:
+                    if durable:
+                        conn.execute("PRAGMA synchronous = FULL")  # fsync the WAL on this commit
+                    for apply, _ in batch:
+                        apply(cursor)
+                    conn.commit()
+                    return len(batch)
+                except Exception:
+                    conn.rollback()
+                    write_buffer_log.exception("group commit of %d writes failed, retrying one by one",
+                                               len(batch))
+                committed = 0
+                for apply, _ in batch:
+                    try:
+                        apply(cursor)
+                        conn.commit()
+                        committed += 1
+                    except Exception:
+                        conn.rollback()
+                        write_buffer_log.exception("dropped a queued write to %s", self.pool.path)
+                return committed
+            finally:
+                try:
+                    if durable:
+                        conn.execute("PRAGMA synchronous = NORMAL")
+                finally:
+                    conn.close()
+
+    def close(self):
+        """Stop the timer and commit what's left, fsynced."""
+        self._closed.set()
+        self.flush(durable=True)
+
+
+def run_write(apply, rows=1):
+    """Run apply(cursor) in its own transaction, or queue it when the write buffer is on.
+
+    Inside batch() it always runs right away, in the batch's transaction.
+    """
+    if WRITE_BUFFER_SECONDS <= 0 or _batch_connection.get() is not None:
+        conn = get_connection()
+        try:
+            apply(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+        return
+    pool = _shard(current_db_path())
+    if pool.writes is None:
+        with _shards_lock:
+            if pool.writes is None:
+                pool.writes = WriteBuffer(pool)
+                atexit.register(pool.writes.close)  # scripts that never call close_all_connections()
+    pool.writes.add(apply, rows)
+
+
+def flush_pending_writes(path=None):
+    """Commit queued writes for a database file (current shard by default)."""
+    pool = _shard(Path(path) if path else current_db_path())
+    if pool.writes is not None:
+        pool.writes.flush()
+
+
+# ==== PAGINATION ====
+
+# Rows pulled from sqlite per fetchmany() call when streaming results
+FETCH_BATCH_SIZE = 500
+
+# Upper bound on rows any paged tool returns in one response
+MAX_PAGE_SIZE = 500
+
+
+def iter_rows(cursor, batch_size=FETCH_BATCH_SIZE):
+    """Yield rows of an executed cursor in fetchmany() batches instead of one fetchall()."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def clamp_page_size(limit, default) -> int:
+    """Page size for a tool call: `default` if unset, never above MAX_PAGE_SIZE."""
+    if not limit or limit < 1:
+        return default
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def history_cursor(date, row_id) -> str:
+    """Opaque cursor for (date, id) keyset pagination over a log table."""
+    return f"{date}#{row_id}"
+
+
+def parse_history_cursor(cursor):
+    """(date, id) to continue before; the first page starts after every real row."""
+    if not cursor:
+        return "9999-12-31", 0
+    date, row_id = cursor.split("#")
+    return date, int(row_id)
+
+
+def init_database(path=None):
+    """Initialize the SQLite database with necessary tables.
+    
+    The server doesn't call this: each file's pool runs create_schema() on its
+    first connection, so startup never touches the database. Scripts that want
+    the schema up front (benchmarks, checks) still can.
+    """
+    get_connection(path).close()
+
+
+def create_schema(conn):
+    """Bring the database on `conn` up to SCHEMA_VERSION.
+    
+    An up-to-date file costs one PRAGMA user_version read. Version 0 is a new
+    (or pre-migration) file, which gets the base tables before the migrations.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    if version == 0:
+        if conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone() is None:
+            # A new file: VACUUM applies the mode while it's still empty (it's
+            # already in WAL). compact_history(vacuum=True) converts older files.
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        create_base_tables(conn)
+    migrate_database(conn)
+
+
+def create_base_tables(conn):
+    """The original tables (schema version 0)."""
     cursor = conn.cursor()
     
     # Food nutrition database (per 100g)
@@ -163,157 +667,1849 @@ def init_database():
         )
     """)
     
-    # Insert some common foods if table is empty
-    cursor.execute("SELECT COUNT(*) FROM food_database")
-    if cursor.fetchone()[0] == 0:
-        common_foods = [
-            # International foods
-            ("chicken breast", 165, 31, 0, 3.6, 0),
-            ("brown rice", 112, 2.6, 24, 0.9, 1.8),
-            ("white rice", 130, 2.7, 28, 0.3, 0.4),
-            ("broccoli", 34, 2.8, 7, 0.4, 2.6),
-            ("banana", 89, 1.1, 23, 0.3, 2.6),
-            ("apple", 52, 0.3, 14, 0.2, 2.4),
-            ("salmon", 208, 20, 0, 13, 0),
-            ("eggs", 155, 13, 1.1, 11, 0),
-            ("oatmeal", 389, 17, 66, 7, 11),
-            ("almonds", 579, 21, 22, 50, 12.5),
-            ("sweet potato", 86, 1.6, 20, 0.1, 3),
-            ("spinach", 23, 2.9, 3.6, 0.4, 2.2),
-            ("greek yogurt", 59, 10, 3.6, 0.4, 0),
-            ("avocado", 160, 2, 9, 15, 7),
-            ("pasta", 131, 5, 25, 1.1, 1.8),
-            ("beef", 250, 26, 0, 15, 0),
-            # Indian foods
-            ("roti", 297, 11, 45, 9, 4),
-            ("dal", 116, 9, 20, 0.4, 8),
-            ("paneer", 265, 18, 1.2, 20, 0),
-            ("chapati", 120, 3.1, 18, 3.7, 2),
-            ("idli", 58, 2, 12, 0.1, 0.3),
-            ("dosa", 168, 4, 25, 6, 2),
-            ("curd", 60, 3.5, 4.7, 3.3, 0),
-            ("samosa", 252, 3.5, 23, 17, 2),
-            # Additional Indian/common foods for routines
-            ("bread", 265, 9, 49, 3.2, 2.7),
-            ("jam", 278, 0.4, 69, 0.1, 1),
-            ("poha", 110, 2, 23, 0.4, 2),
-            ("paratha", 320, 6, 40, 15, 3),
-            ("maggie", 400, 8, 60, 14, 2),
-            ("chowmein", 138, 4.5, 20, 4.5, 2),
-            ("fried rice", 130, 3, 20, 4, 1),
-            ("chana", 164, 9, 27, 3, 8),
-            ("ganne ka juice", 50, 0.2, 13, 0, 0),
-            ("pakora", 180, 3.5, 18, 11, 2),
-            ("cashews", 553, 18, 30, 44, 3.3),
-        ]
-        cursor.executemany(
-            "INSERT INTO food_database (name, calories, protein, carbs, fats, fiber) VALUES (?, ?, ?, ?, ?, ?)",
-            common_foods
-        )
-    
     conn.commit()
-    conn.close()
 
-# Initialize database on startup
-init_database()
 
-@mcp.tool()
-def calculate_bmi(weight_kg: float, height_m: float) -> str:
-    """Calculate Body Mass Index (BMI) from weight and height.
-    
-    Args:
-        weight_kg: Weight in kilograms
-        height_m: Height in meters
-    """
-    bmi = weight_kg / (height_m ** 2)
-    
-    if bmi < 18.5:
-        category = "Underweight"
-    elif bmi < 25:
-        category = "Normal weight"
-    elif bmi < 30:
-        category = "Overweight"
-    else:
-        category = "Obese"
-    
-    return f"BMI: {bmi:.1f} - Category: {category}"
+# Starter catalog (per 100g): calories, protein, carbs, fats, fiber
+STARTER_FOODS = [
+    # International foods
+    ("chicken breast", 165, 31, 0, 3.6, 0),
+    ("brown rice", 112, 2.6, 24, 0.9, 1.8),
+    ("white rice", 130, 2.7, 28, 0.3, 0.4),
+    ("broccoli", 34, 2.8, 7, 0.4, 2.6),
+    ("banana", 89, 1.1, 23, 0.3, 2.6),
+    ("apple", 52, 0.3, 14, 0.2, 2.4),
+    ("salmon", 208, 20, 0, 13, 0),
+    ("eggs", 155, 13, 1.1, 11, 0),
+    ("oatmeal", 389, 17, 66, 7, 11),
+    ("almonds", 579, 21, 22, 50, 12.5),
+    ("sweet potato", 86, 1.6, 20, 0.1, 3),
+    ("spinach", 23, 2.9, 3.6, 0.4, 2.2),
+    ("greek yogurt", 59, 10, 3.6, 0.4, 0),
+    ("avocado", 160, 2, 9, 15, 7),
+    ("pasta", 131, 5, 25, 1.1, 1.8),
+    ("beef", 250, 26, 0, 15, 0),
+    # Indian foods
+    ("roti", 297, 11, 45, 9, 4),
+    ("dal", 116, 9, 20, 0.4, 8),
+    ("paneer", 265, 18, 1.2, 20, 0),
+    ("chapati", 120, 3.1, 18, 3.7, 2),
+    ("idli", 58, 2, 12, 0.1, 0.3),
+    ("dosa", 168, 4, 25, 6, 2),
+    ("curd", 60, 3.5, 4.7, 3.3, 0),
+    ("samosa", 252, 3.5, 23, 17, 2),
+    # Additional Indian/common foods for routines
+    ("bread", 265, 9, 49, 3.2, 2.7),
+    ("jam", 278, 0.4, 69, 0.1, 1),
+    ("poha", 110, 2, 23, 0.4, 2),
+    ("paratha", 320, 6, 40, 15, 3),
+    ("maggie", 400, 8, 60, 14, 2),
+    ("chowmein", 138, 4.5, 20, 4.5, 2),
+    ("fried rice", 130, 3, 20, 4, 1),
+    ("chana", 164, 9, 27, 3, 8),
+    ("ganne ka juice", 50, 0.2, 13, 0, 0),
+    ("pakora", 180, 3.5, 18, 11, 2),
+    ("cashews", 553, 18, 30, 44, 3.3),
+]
 
-@mcp.tool()
-def daily_water_intake(weight_kg: float) -> str:
-    """Calculate recommended daily water intake based on body weight.
-    
-    Args:
-        weight_kg: Weight in kilograms
+
+# ==== SCHEMA MIGRATIONS ====
+# PRAGMA user_version records how many migrations a database has applied.
+# create_base_tables() is version 0; append new steps, never edit shipped ones.
+
+def _migration_date_indexes(cursor):
+    """v1: date indexes so the log tables aren't full-scanned by every read tool."""
+    # Covering index: daily SUM()s over meals never touch the table itself
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_meals_date_nutrients
+        ON meals(date, calories, protein, carbs, fats, fiber)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_weight_log_date ON weight_log(date, weight_kg)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sleep_log_date ON sleep_log(date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_exercise_log_date ON exercise_log(date)")
+
+
+def _migration_data_versions(cursor):
+    """v2: per-table change counters, bumped by triggers, for cross-process cache checks."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("INSERT OR IGNORE INTO data_versions (table_name) VALUES ('food_database')")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS food_database_version_{event.lower()}
+            AFTER {event} ON food_database
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE table_name = 'food_database';
+            END
+        """)
+
+
+def _migration_daily_totals(cursor):
+    """v3: per-day aggregate table, backfilled from the raw logs."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_totals (
+            date TEXT PRIMARY KEY,
+            calories REAL NOT NULL DEFAULT 0,
+            protein REAL NOT NULL DEFAULT 0,
+            carbs REAL NOT NULL DEFAULT 0,
+            fats REAL NOT NULL DEFAULT 0,
+            fiber REAL NOT NULL DEFAULT 0,
+            meal_items INTEGER NOT NULL DEFAULT 0,
+            exercise_calories REAL NOT NULL DEFAULT 0,
+            exercise_minutes REAL NOT NULL DEFAULT 0,
+            sleep_hours REAL,
+            weight_kg REAL
+        ) WITHOUT ROWID
+    """)
+    rebuild_daily_totals_table(cursor, rollups=False)  # meal_rollups only arrives in v10
+
+
+def _migration_weight_history_index(cursor):
+    """v4: (date, id) ordering on weight_log for keyset-paged history."""
+    cursor.execute("DROP INDEX IF EXISTS idx_weight_log_date")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_weight_log_date_id ON weight_log(date, id, weight_kg)")
+
+
+def _migration_food_search(cursor):
+    """v5: FTS5 index over food names, kept in sync with food_database by triggers."""
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS food_search USING fts5(
+            name,
+            content = 'food_database',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS food_search_insert AFTER INSERT ON food_database
+        BEGIN
+            INSERT INTO food_search (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS food_search_delete AFTER DELETE ON food_database
+        BEGIN
+            INSERT INTO food_search (food_search, rowid, name) VALUES ('delete', old.id, old.name);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS food_search_update AFTER UPDATE OF name ON food_database
+        BEGIN
+            INSERT INTO food_search (food_search, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO food_search (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    cursor.execute("INSERT INTO food_search (food_search) VALUES ('rebuild')")
+
+
+# Common spellings and local names for seeded foods
+FOOD_ALIASES = [
+    ("chapatti", "chapati"), ("phulka", "roti"), ("dahi", "curd"), ("yogurt", "greek yogurt"),
+    ("maggi", "maggie"), ("chow mein", "chowmein"), ("egg", "eggs"), ("oats", "oatmeal"),
+    ("rice", "white rice"), ("daal", "dal"), ("dhal", "dal"), ("lentils", "dal"),
+    ("idly", "idli"), ("dosai", "dosa"), ("chickpeas", "chana"), ("pakoda", "pakora"),
+    ("almond", "almonds"), ("cashew", "cashews"), ("chicken", "chicken breast"),
+]
+
+
+def seed_food_aliases(cursor):
+    """Add FOOD_ALIASES whose target food is in the catalog."""
+    cursor.executemany("""
+        INSERT OR IGNORE INTO food_aliases (alias, food_name)
+        SELECT ?, name FROM food_database WHERE name = ?
+    """, FOOD_ALIASES)
+
+
+def _migration_food_aliases(cursor):
+    """v6: alias/synonym table for food names; part of the catalog version."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS food_aliases (
+            alias TEXT PRIMARY KEY,
+            food_name TEXT NOT NULL,
+            FOREIGN KEY (food_name) REFERENCES food_database(name)
+        ) WITHOUT ROWID
+    """)
+    seed_food_aliases(cursor)
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS food_aliases_version_{event.lower()}
+            AFTER {event} ON food_aliases
+            BEGIN
+                UPDATE data_versions SET version = version + 1 WHERE table_name = 'food_database';
+            END
+        """)
+
+
+def _migration_seed_catalog(cursor):
+    """v7: starter foods and aliases for an empty catalog (used to be re-checked on every start)."""
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM food_database)")
+    if cursor.fetchone()[0]:
+        return
+    cursor.executemany(
+        "INSERT INTO food_database (name, calories, protein, carbs, fats, fiber) VALUES (?, ?, ?, ?, ?, ?)",
+        STARTER_FOODS
+    )
+    seed_food_aliases(cursor)
+
+
+def _migration_weight_trend(cursor):
+    """v8: stored smoothed-weight state for get_weight_trend, backfilled from weight_log."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS weight_trend (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_id INTEGER NOT NULL,
+            last_date TEXT NOT NULL,
+            trend_kg REAL NOT NULL,
+            entries INTEGER NOT NULL
+        )
+    """)
+    sync_weight_trend(cursor)
+
+
+# Tables whose writes the read cache must see; food_database has its own counter (v2)
+VERSIONED_TABLES = (
+    "meals", "daily_totals", "sleep_log", "weight_log", "exercise_log",
+    "user_profile", "user_pantry", "food_routines",
+)
+
+
+def _migration_table_versions(cursor):
+    """v9: data_versions counters for the tables cached read tools depend on.
+
+    Unlike food_database these are bumped by the write tools, once per
+    transaction: per-row triggers cost bulk imports about a third of their speed.
     """
-    # Simple formula: 30-35ml per kg of body weight
-    min_water = weight_kg * 30
-    max_water = weight_kg * 35
-    
-    return f"Recommended daily water intake: {min_water:.0f}-{max_water:.0f} ml ({min_water/1000:.1f}-{max_water/1000:.1f} liters)"
+    cursor.executemany("INSERT OR IGNORE INTO data_versions (table_name) VALUES (?)",
+                       [(table,) for table in VERSIONED_TABLES])
 
-@mcp.tool()
-def steps_to_calories(steps: int, weight_kg: float = 70) -> str:
-    """Estimate calories burned from walking steps.
-    
-    Args:
-        steps: Number of steps taken
-        weight_kg: Body weight in kilograms (default: 70)
+
+def _migration_meal_rollups(cursor):
+    """v10: per-day sums (and per-food monthly counts) of meal rows rolled up by compact_history."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS meal_rollups (
+            date TEXT PRIMARY KEY,
+            calories REAL NOT NULL DEFAULT 0,
+            protein REAL NOT NULL DEFAULT 0,
+            carbs REAL NOT NULL DEFAULT 0,
+            fats REAL NOT NULL DEFAULT 0,
+            fiber REAL NOT NULL DEFAULT 0,
+            meal_items INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS food_monthly_counts (
+            month TEXT NOT NULL,
+            food_name TEXT NOT NULL,
+            items INTEGER NOT NULL DEFAULT 0,
+            grams REAL NOT NULL DEFAULT 0,
+            calories REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, food_name)
+        ) WITHOUT ROWID
+    """)
+
+
+MIGRATIONS = [
+    _migration_date_indexes,
+    _migration_data_versions,
+    _migration_daily_totals,
+    _migration_weight_history_index,
+    _migration_food_search,
+    _migration_food_aliases,
+    _migration_seed_catalog,
+    _migration_weight_trend,
+    _migration_table_versions,
+    _migration_meal_rollups,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate_database(conn):
+    """Apply pending MIGRATIONS, each in its own transaction. Safe to call repeatedly."""
+    cursor = conn.cursor()
+    while True:
+        # IMMEDIATE takes the write lock first, so two processes starting
+        # together can't both apply the same step
+        cursor.execute("BEGIN IMMEDIATE")
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            conn.rollback()
+            return version
+        try:
+            MIGRATIONS[version](cursor)
+            cursor.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+# ==== FOOD CATALOG CACHE ====
+
+# log_meal auto-resolves a misspelled food at or above this similarity (0-1)
+FUZZY_MATCH_THRESHOLD = float(os.environ.get("HEALTH_MCP_FUZZY_THRESHOLD", "0.8"))
+
+# Below the auto-resolve threshold, names this similar are offered as "did you mean"
+FUZZY_SUGGEST_THRESHOLD = 0.5
+
+# Larger catalogs build their fuzzy index on a background thread (seconds at 300k)
+FUZZY_INLINE_BUILD_LIMIT = 50_000
+
+
+def name_trigrams(name: str) -> set:
+    """Character trigrams of a padded name ("  roti " -> "  r", " ro", ...)."""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def auto_resolves(query: str, match, score: float) -> bool:
+    """Whether `match` (from FoodCatalog.match) may stand in for `query` without asking.
+
+    Never when the match's words are a strict subset of the query's: "apple pie"
+    or "brown bread" contain a catalog name but are different foods, and Dice
+    similarity scores such pairs high.
     """
-    # Rough estimate: 0.04 calories per step per kg
-    calories = steps * 0.04 * (weight_kg / 70)
-    
-    return f"{steps} steps burned approximately {calories:.0f} calories"
+    if match is None or score < FUZZY_MATCH_THRESHOLD:
+        return False
+    return score == 1.0 or not set(match.split()) < set(query.split())
 
-@mcp.tool()
-def heart_rate_zone(age: int, resting_hr: int = 60) -> str:
-    """Calculate heart rate training zones based on age.
-    
-    Args:
-        age: Age in years
-        resting_hr: Resting heart rate (default: 60 bpm)
+
+class TrigramIndex:
+    """In-memory fuzzy name index: trigram -> ids, scored by Dice similarity.
+
+    Names are numbered in order of trigram count, so every posting array is
+    also sorted by name length. A query only counts the slice of each array
+    whose lengths could still reach the threshold (a short misspelling never
+    touches long catalog names), and counting is Counter.update on array
+    slices, which stays in C.
     """
-    max_hr = 220 - age
-    hr_reserve = max_hr - resting_hr
-    
-    zones = {
-        "Easy (50-60%)": (resting_hr + hr_reserve * 0.5, resting_hr + hr_reserve * 0.6),
-        "Moderate (60-70%)": (resting_hr + hr_reserve * 0.6, resting_hr + hr_reserve * 0.7),
-        "Hard (70-80%)": (resting_hr + hr_reserve * 0.7, resting_hr + hr_reserve * 0.8),
-        "Very Hard (80-90%)": (resting_hr + hr_reserve * 0.8, resting_hr + hr_reserve * 0.9),
-    }
-    
-    result = f"Max Heart Rate: {max_hr} bpm\n\nTraining Zones:\n"
-    for zone_name, (low, high) in zones.items():
-        result += f"  {zone_name}: {low:.0f}-{high:.0f} bpm\n"
-    
-    return result
 
-# ==== NUTRITION TRACKING TOOLS ====
+    def __init__(self, names):
+        entries = sorted(((name_trigrams(name), name) for name in names), key=lambda e: len(e[0]))
+        self.names = [name for _, name in entries]
+        self.sizes = array("I", [len(grams) for grams, _ in entries])
+        postings = {}
+        for name_id, (grams, _) in enumerate(entries):
+            for gram in grams:
+                postings.setdefault(gram, []).append(name_id)
+        self.postings = {gram: array("I", ids) for gram, ids in postings.items()}
+        self.recent = []  # (name, trigrams) added since the build, scanned directly
 
-@mcp.tool()
-def list_foods() -> str:
-    """List all available foods in the nutrition database."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT name, calories, protein, carbs, fats, fiber FROM food_database ORDER BY name")
-    foods = cursor.fetchall()
-    conn.close()
-    
-    if not foods:
-        return "No foods found in database."
-    
-    result = "Available Foods (per 100g):\n\n"
-    for name, cal, protein, carbs, fats, fiber in foods:
-        result += f"• {name.title()}: {cal}cal, P:{protein}g, C:{carbs}g, F:{fats}g, Fiber:{fiber}g\n"
-    
-    return result
+    def add(self, name):
+        self.recent.append((name, name_trigrams(name)))
 
-@mcp.tool()
-def log_meal(food_items: str, date: str = None) -> str:
-    """Log a meal by breaking it down into nutrients and storing in database.
-    
-    The LLM should parse the user's description and provide food items in format:
+    def best_match(self, query, min_score):
+        """(closest name, similarity) or (None, 0.0) if nothing reaches min_score."""
+        grams = name_trigrams(query)
+        size = len(grams)
+        # Dice >= min_score bounds both the other name's size and the overlap
+        lo_id = bisect_left(self.sizes, math.ceil(size * min_score / (2 - min_score)))
+        hi_id = bisect_right(self.sizes, math.floor(size * (2 - min_score) / min_score))
+        empty = array("I")
+        lists = []
+        for gram in grams:
+            ids = self.postings.get(gram, empty)
+            lists.append(ids[bisect_left(ids, lo_id):bisect_left(ids, hi_id)])
+        lists.sort(key=len)
+
+        # A name sharing min_shared trigrams must share one of the rarest
+        # (size - min_shared + 1), so only those lists propose candidates;
+        # the common lists just top up their counts.
+        min_shared = math.ceil(min_score * size / (2 - min_score))
+        prefix = size - min_shared + 1
+        counts = Counter()
+        for ids in lists[:prefix]:
+            counts.update(ids)
+        for ids in lists[prefix:]:
+            if len(counts) * 8 < len(ids):
+                for name_id in list(counts):
+                    i = bisect_left(ids, name_id)
+                    if i < len(ids) and ids[i] == name_id:
+                        counts[name_id] += 1
+            else:
+                # Names new to counts here can't reach min_shared anymore
+                counts.update(ids)
+
+        best_name, best_score = None, 0.0
+        sizes = self.sizes
+        for name_id, shared in counts.items():
+            if shared < min_shared:
+                continue
+            score = 2 * shared / (size + sizes[name_id])
+            if score > best_score:
+                best_name, best_score = self.names[name_id], score
+        for name, name_grams in self.recent:
+            score = 2 * len(grams & name_grams) / (size + len(name_grams))
+            if score > best_score:
+                best_name, best_score = name, score
+
+        if best_score < min_score:
+            return None, 0.0
+        return best_name, best_score
+
+
+class FoodCatalog:
+    """Process-wide copy of food_database: name -> per-100g nutrients, plus aliases.
+
+    Lookups never hit SQLite. Staleness is checked at most once per tool call:
+    PRAGMA data_version on a dedicated connection tells us whether *anything*
+    else committed; only then is the food_database counter in data_versions
+    read, and only if that moved is the catalog reloaded.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._foods = {}
+        self._aliases = {}
+        self._fuzzy = None  # TrigramIndex, built on the first lookup miss
+        self._fuzzy_building = False
+        self._matrix = None  # NutrientMatrix, built by the first recommendation
+        self._generation = 0  # bumped on every full reload
+        self._conn = None
+        self._data_version = None
+        self._catalog_version = None
+        self._closed = False  # set when the shard is evicted; the connection stays closed
+        self._lock = threading.Lock()
+
+    def _catalog_version_of(self, conn):
+        row = conn.execute(
+            "SELECT version FROM data_versions WHERE table_name = 'food_database'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _refresh(self):
+        if self._closed:
+            return  # evicted shard: calls still holding the catalog get the last load
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        catalog_version = self._catalog_version_of(self._conn)
+        if catalog_version != self._catalog_version:
+            rows = self._conn.execute(
+                "SELECT name, calories, protein, carbs, fats, fiber FROM food_database"
+            ).fetchall()
+            self._foods = {name: tuple(nutrients) for name, *nutrients in rows}
+            self._aliases = dict(self._conn.execute("SELECT alias, food_name FROM food_aliases"))
+            self._fuzzy = None
+            self._matrix = None
+            self._generation += 1
+            self._catalog_version = catalog_version
+        self._data_version = data_version
+
+    def foods(self) -> dict:
+        """Current catalog, refreshed if another connection changed food_database."""
+        with self._lock:
+            self._refresh()
+            return self._foods
+
+    def nutrient_matrix(self):
+        """(foods, NutrientMatrix) for the current catalog, building the matrix if needed."""
+        with self._lock:
+            self._refresh()
+            if self._matrix is None:
+                self._matrix = NutrientMatrix(self._foods)
+            return self._foods, self._matrix
+
+    def match(self, name):
+        """Best catalog name for `name` as (food_name, similarity 0-1), or (None, 0.0).
+
+        Exact names and aliases score 1.0; anything else goes through the
+        trigram index, trying the auto-resolve threshold first since that
+        search touches far fewer postings than the suggestion one.
+        """
+        with self._lock:
+            self._refresh()
+            if name in self._foods:
+                return name, 1.0
+            target = self._aliases.get(name)
+            if target in self._foods:
+                return target, 1.0
+            index = self._fuzzy_index()
+        if index is None:
+            return None, 0.0
+        match, score = index.best_match(name, FUZZY_MATCH_THRESHOLD)
+        if match is None:
+            match, score = index.best_match(name, FUZZY_SUGGEST_THRESHOLD)
+        return match, score
+
+    def _fuzzy_index(self):
+        # Caller holds the lock. None while a background build is running.
+        if self._fuzzy is None and len(self._foods) <= FUZZY_INLINE_BUILD_LIMIT:
+            self._fuzzy = TrigramIndex(self._foods)
+        elif self._fuzzy is None and not self._fuzzy_building:
+            self._fuzzy_building = True
+            threading.Thread(target=self._build_fuzzy_index, args=(self._foods, self._generation),
+                             name="food-fuzzy-index", daemon=True).start()
+        return self._fuzzy
+
+    def _build_fuzzy_index(self, foods, generation):
+        index = TrigramIndex(foods)
+        with self._lock:
+            self._fuzzy_building = False
+            if generation != self._generation:
+                return  # reloaded meanwhile; the next miss builds a fresh one
+            if len(self._foods) != len(foods):
+                for name in self._foods.keys() - foods.keys():
+                    index.add(name)  # written through while we were building
+            self._fuzzy = index
+
+    def _write_through(self, conn, apply):
+        # Read the counter our own uncommitted write produced, so committing
+        # it doesn't look like a foreign change and force a full reload
+        catalog_version = self._catalog_version_of(conn)
+
+        def committed():
+            with self._lock:
+                if self._catalog_version == catalog_version - 1:
+                    # Our write is the only change since the last load; otherwise
+                    # the next lookup reloads everything, our write included
+                    apply()
+                    self._catalog_version = catalog_version
+
+        # Only a committed write reaches the cache (batch(): once the batch commits)
+        conn.after_commit(committed)
+
+    def add(self, conn, name, nutrients):
+        """Write-through after inserting a food on `conn`, applied when it commits."""
+        def apply():
+            foods = dict(self._foods)
+            foods[name] = tuple(nutrients)
+            self._foods = foods
+            if self._fuzzy is not None:
+                self._fuzzy.add(name)
+            if self._matrix is not None:
+                self._matrix.add(name, tuple(nutrients))
+        self._write_through(conn, apply)
+
+    def add_alias(self, conn, alias, food_name):
+        """Write-through after upserting an alias on `conn`, applied when it commits."""
+        def apply():
+            aliases = dict(self._aliases)
+            aliases[alias] = food_name
+            self._aliases = aliases
+        self._write_through(conn, apply)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def get_food_catalog(path=None) -> FoodCatalog:
+    """The FoodCatalog for a database file (current shard by default)."""
+    return _shard_helper(path, "catalog", FoodCatalog)
+
+
+# ==== DAILY TOTALS ====
+# daily_totals holds one row per date with everything the read tools sum up.
+# Every log_* tool updates it in the same transaction as its raw insert.
+
+DAILY_TOTALS_UPSERT = """
+    INSERT INTO daily_totals (date, calories, protein, carbs, fats, fiber, meal_items,
+                              exercise_calories, exercise_minutes, sleep_hours, weight_kg)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        calories = calories + excluded.calories,
+        protein = protein + excluded.protein,
+        carbs = carbs + excluded.carbs,
+        fats = fats + excluded.fats,
+        fiber = fiber + excluded.fiber,
+        meal_items = meal_items + excluded.meal_items,
+        exercise_calories = exercise_calories + excluded.exercise_calories,
+        exercise_minutes = exercise_minutes + excluded.exercise_minutes,
+        sleep_hours = CASE WHEN excluded.sleep_hours IS NULL THEN sleep_hours
+                           ELSE COALESCE(sleep_hours, 0) + excluded.sleep_hours END,
+        weight_kg = COALESCE(excluded.weight_kg, weight_kg)
+"""
+
+
+def add_to_daily_totals(cursor, date, calories=0, protein=0, carbs=0, fats=0, fiber=0,
+                        meal_items=0, exercise_calories=0, exercise_minutes=0,
+                        sleep_hours=None, weight_kg=None):
+    """Fold one write into daily_totals. Sums accumulate; weight_kg is the latest entry."""
+    cursor.execute(DAILY_TOTALS_UPSERT, (date, calories, protein, carbs, fats, fiber, meal_items,
+                                         exercise_calories, exercise_minutes, sleep_hours, weight_kg))
+
+
+# Per-day meal sums: the item rows plus whatever compact_history rolled up
+MEAL_DAY_SUMS = """
+    SELECT date, SUM(calories) AS calories, SUM(protein) AS protein, SUM(carbs) AS carbs,
+           SUM(fats) AS fats, SUM(fiber) AS fiber, SUM(items) AS items
+    FROM (
+        SELECT date, SUM(calories) AS calories, SUM(protein) AS protein, SUM(carbs) AS carbs,
+               SUM(fats) AS fats, SUM(fiber) AS fiber, COUNT(*) AS items
+        FROM meals GROUP BY date
+        UNION ALL
+        SELECT date, calories, protein, carbs, fats, fiber, meal_items FROM meal_rollups
+    ) GROUP BY date
+"""
+MEAL_ITEM_DAY_SUMS = """
+    SELECT date, SUM(calories) AS calories, SUM(protein) AS protein, SUM(carbs) AS carbs,
+           SUM(fats) AS fats, SUM(fiber) AS fiber, COUNT(*) AS items
+    FROM meals GROUP BY date
+"""
+
+
+def rebuild_daily_totals_table(cursor, rollups=True):
+    """Recompute daily_totals from the raw log tables and meal rollups. Returns the number of days."""
+    meal_days = "SELECT date FROM meals UNION SELECT date FROM meal_rollups" if rollups else "SELECT date FROM meals"
+    cursor.execute("DELETE FROM daily_totals")
+    cursor.execute(f"""
+        INSERT INTO daily_totals (date, calories, protein, carbs, fats, fiber, meal_items,
+                                  exercise_calories, exercise_minutes, sleep_hours, weight_kg)
+        SELECT d.date,
+               COALESCE(m.calories, 0), COALESCE(m.protein, 0), COALESCE(m.carbs, 0),
+               COALESCE(m.fats, 0), COALESCE(m.fiber, 0), COALESCE(m.items, 0),
+               COALESCE(e.calories, 0), COALESCE(e.minutes, 0),
+               s.hours, w.weight_kg
+        FROM (
+            {meal_days} UNION SELECT date FROM exercise_log
+            UNION SELECT date FROM sleep_log UNION SELECT date FROM weight_log
+        ) d
+        LEFT JOIN ({MEAL_DAY_SUMS if rollups else MEAL_ITEM_DAY_SUMS}) m ON m.date = d.date
+        LEFT JOIN (
+            SELECT date, SUM(calories_burned) AS calories, SUM(duration_minutes) AS minutes
+            FROM exercise_log GROUP BY date
+        ) e ON e.date = d.date
+        LEFT JOIN (
+            SELECT date, SUM(hours) AS hours FROM sleep_log GROUP BY date
+        ) s ON s.date = d.date
+        LEFT JOIN (
+            SELECT date, weight_kg FROM weight_log
+            WHERE id IN (SELECT MAX(id) FROM weight_log GROUP BY date)
+        ) w ON w.date = d.date
+    """)
+    return cursor.rowcount
+
+
+# A day's totals, sleep entries and exercises in one statement, tagged by kind.
+# Branches run in order, so exercises keep their logging order.
+DAY_SUMMARY_QUERY = """
+    SELECT 'totals', calories, protein, carbs, fats, exercise_calories, weight_kg
+    FROM daily_totals WHERE date = ?1
+    UNION ALL
+    SELECT 'sleep', sleep_time, wake_time, hours, quality, NULL, NULL
+    FROM sleep_log WHERE date = ?1
+    UNION ALL
+    SELECT 'exercise', exercise_name, duration_minutes, calories_burned, NULL, NULL, NULL
+    FROM exercise_log WHERE date = ?1
+"""
+
+# One row per calendar day from ?1 to ?2 (inclusive), empty days included
+RANGE_SUMMARY_QUERY = """
+    WITH RECURSIVE days(date) AS (
+        SELECT ?1
+        UNION ALL
+        SELECT date(date, '+1 day') FROM days WHERE date < ?2
+    )
+    SELECT days.date, daily_totals.calories, daily_totals.protein, daily_totals.meal_items,
+           daily_totals.exercise_calories, daily_totals.exercise_minutes,
+           daily_totals.sleep_hours, daily_totals.weight_kg
+    FROM days LEFT JOIN daily_totals ON daily_totals.date = days.date
+    ORDER BY days.date
+"""
+
+
+def read_day(cursor, date):
+    """(daily_totals row or None, first sleep entry or None, exercises) for a date, in one query."""
+    totals, sleep, exercises = None, None, []
+    cursor.execute(DAY_SUMMARY_QUERY, (date,))
+    for kind, *row in cursor.fetchall():
+        if kind == "totals":
+            totals = row[:6]
+        elif kind == "sleep":
+            sleep = sleep or row[:4]
+        else:
+            exercises.append(row[:3])
+    return totals, sleep, exercises
+
+
+def calories_consumed(cursor, date) -> float:
+    """Calories eaten on a date, from daily_totals."""
+    cursor.execute("SELECT calories FROM daily_totals WHERE date = ?", (date,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+# ==== WEIGHT TREND ====
+# weight_trend holds an exponentially smoothed "true weight" over the whole
+# history, so get_weight_trend never rereads years of entries. Every write path
+# (log_weight, imports, rebuild_daily_totals) folds the rows it added in, O(1)
+# per row; a back-dated entry triggers one full recompute. get_weight_trend only
+# reads the stored state.
+
+# Share of the gap between trend and scale weight closed per day (Hacker's Diet 10%)
+WEIGHT_TREND_SMOOTHING = 0.1
+
+
+WEIGHT_SINCE_QUERY = "SELECT id, date, weight_kg FROM weight_log WHERE id > ?"
+
+
+def smooth_weight(trend, weight, days_elapsed):
+    """Move the trend toward one new weigh-in `days_elapsed` days after the last one."""
+    alpha = 1 - (1 - WEIGHT_TREND_SMOOTHING) ** max(days_elapsed, 1)
+    return trend + alpha * (weight - trend)
+
+
+def weight_day(date):
+    """Day number of a weight_log date, or None if it isn't YYYY-MM-DD (e.g. a hand edit)."""
+    try:
+        return datetime.strptime(date, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _weight_rows(fetched):
+    # (day, id, weight) in date order; rows without a usable date stay out of the trend
+    return sorted((day, row_id, weight) for row_id, date, weight in fetched
+                  if (day := weight_day(date)) is not None and weight is not None)
+
+
+def sync_weight_trend(cursor):
+    """Fold weight_log rows newer than the stored state into it. Returns (trend_kg, entries) or None.
+
+    Call it in the transaction of every write to weight_log.
+    """
+    cursor.execute("SELECT last_id, last_date, trend_kg, entries FROM weight_trend WHERE id = 1")
+    state = cursor.fetchone()
+    last_id, last_date, trend, entries = state or (0, "", None, 0)
+    
+    # A rowid range (usually one row); sorting it here keeps the lookup off the date index
+    cursor.execute(WEIGHT_SINCE_QUERY, (last_id,))
+    fetched = cursor.fetchall()
+    if not fetched:
+        return (trend, entries) if state else None
+    newest_id = max(row[0] for row in fetched)
+    rows = _weight_rows(fetched)
+    last_day = weight_day(last_date)
+    if rows and last_day is not None and rows[0][0] < last_day:
+        # Back-dated entry: the smoothing has to be replayed from the start
+        cursor.execute("SELECT id, date, weight_kg FROM weight_log")
+        fetched = cursor.fetchall()
+        newest_id = max(row[0] for row in fetched)
+        rows = _weight_rows(fetched)
+        last_day, trend, entries = None, None, 0
+    
+    for day, _, weight in rows:
+        trend = weight if trend is None else smooth_weight(trend, weight, day - last_day)
+        last_day = day
+    entries += len(rows)
+    if trend is None:
+        return None  # no usable entries yet
+    cursor.execute("""
+        INSERT OR REPLACE INTO weight_trend (id, last_id, last_date, trend_kg, entries)
+        VALUES (1, ?, ?, ?, ?)
+    """, (max(last_id, newest_id), datetime.fromordinal(last_day).strftime("%Y-%m-%d"), trend, entries))
+    return trend, entries
+
+
+# Least-squares sums over a window (x = days since the window start) and the
+# 7/30-day averages ending at the newest entry, as SQLite aggregates over the
+# covering (date, id, weight_kg) index, so no rows come back to Python
+WEIGHT_FIT_QUERY = """
+    SELECT COUNT(*), SUM(x), SUM(x * x), SUM(weight_kg), SUM(x * weight_kg)
+    FROM (
+        SELECT julianday(date) - julianday('now', '-' || ?1 || ' days') AS x, weight_kg
+        FROM weight_log WHERE date >= date('now', '-' || ?1 || ' days')
+    )
+"""
+
+WEIGHT_AVERAGES_QUERY = """
+    SELECT AVG(CASE WHEN date > date(?1, '-7 days') THEN weight_kg END), AVG(weight_kg)
+    FROM weight_log WHERE date > date(?1, '-30 days') AND date <= ?1
+"""
+
+
+def regression_slope(n, sum_x, sum_xx, sum_y, sum_xy):
+    """Least-squares slope (kg/day) from running sums, or None without two distinct days."""
+    denominator = n * sum_xx - sum_x * sum_x
+    if n < 2 or abs(denominator) < 1e-9:
+        return None
+    return (n * sum_xy - sum_x * sum_y) / denominator
+
+
+def project_goal_date(trend_kg, slope, target_kg, from_day):
+    """Date the trend reaches target_kg at `slope` kg/day, or None if it's heading away."""
+    gap = target_kg - trend_kg
+    if not slope or (gap > 0) != (slope > 0):
+        return None
+    days_needed = gap / slope
+    if days_needed > 3650:
+        return None  # a rate this slow isn't a useful forecast
+    return datetime.fromordinal(from_day + math.ceil(days_needed))
+
+
+# ==== MEAL RECOMMENDER ====
+# recommend_foods searches food combinations for one that hits the meal's
+# calorie target and macro split. Each food gets a role (protein source, staple
+# carb, light side, other); the catalog keeps a short ranked list per role
+# (NutrientMatrix), so the search looks at a few dozen candidates whatever the
+# catalog size. Portions come from a small least-squares solve per combination.
+
+# Share of the daily calorie goal per meal
+MEAL_TARGETS = {
+    "breakfast": 0.25,
+    "lunch": 0.35,
+    "dinner": 0.30,
+    "snack": 0.10
+}
+
+# Share of a meal's calories from protein, carbs and fats (4/4/9 kcal per gram)
+MACRO_SPLIT = (0.25, 0.50, 0.25)
+
+# Relative weight of missing the calorie, protein, carbs and fats targets
+FIT_WEIGHTS = (4.0, 2.0, 1.0, 1.0)
+
+MIN_PORTION_G = 30
+MAX_PORTION_G = {"protein": 250, "carb": 300, "side": 250, "other": 80}
+ROLE_SHORTLIST_SIZE = 500   # ranked foods kept per role for large catalogs
+ROLE_CANDIDATES = 8         # foods per role that go into the combination search
+
+# Pantry meals: up to this many foods, from the best candidates per role
+PANTRY_MEAL_ITEMS = 3
+PANTRY_ROLE_CANDIDATES = 8
+PANTRY_MIN_PORTION_G = 10   # smaller leftovers aren't worth suggesting
+PANTRY_LISTED_ITEMS = 30    # ingredients shown above the suggestions
+MIN_MEAL_CALORIES = 150     # smallest target when little of the day's goal is left
+
+# Routine periods (food_routines columns) that count as each meal
+MEAL_ROUTINE_PERIODS = {
+    "breakfast": ("morning",),
+    "lunch": ("midday", "afternoon"),
+    "dinner": ("evening", "night"),
+    "snack": ("afternoon", "latenight"),
+}
+
+REGIONAL_FOODS = {
+    "india": {"roti", "dal", "paneer", "chapati", "idli", "dosa", "curd", "samosa", "poha",
+              "paratha", "chana", "pakora", "ganne ka juice", "white rice", "brown rice",
+              "spinach", "banana", "almonds", "cashews", "chicken breast", "eggs"},
+}
+# Used when the profile's region has no entry above
+DEFAULT_REGIONAL_FOODS = {"chicken breast", "brown rice", "broccoli", "banana", "apple", "salmon",
+                          "eggs", "oatmeal", "almonds", "sweet potato", "spinach", "greek yogurt",
+                          "avocado", "pasta", "beef"}
+
+_MEAT = "chicken beef pork mutton lamb goat turkey bacon ham sausage salami keema"
+_FISH = "fish salmon tuna cod sardine prawn prawns shrimp crab"
+_EGG = "egg eggs omelette"
+_DAIRY = "milk curd yogurt yoghurt paneer cheese butter ghee cream lassi"
+# dietary_preferences keyword -> words that rule a food out (matched as whole words)
+DIET_EXCLUSIONS = {
+    "vegan": f"{_MEAT} {_FISH} {_EGG} {_DAIRY}",
+    "vegetarian": f"{_MEAT} {_FISH} {_EGG}",
+    "eggetarian": f"{_MEAT} {_FISH}",
+    "pescatarian": _MEAT,
+    "dairy-free": _DAIRY,
+}
+
+
+def diet_filter(dietary_preferences):
+    """Compiled pattern matching foods the preferences rule out, or None."""
+    prefs = (dietary_preferences or "").lower()
+    if "non-veg" in prefs or "non veg" in prefs:
+        prefs = prefs.replace("non-veg", "").replace("non veg", "")
+    words = set()
+    for keyword, excluded in DIET_EXCLUSIONS.items():
+        if keyword in prefs:
+            words.update(excluded.split())
+    if not words:
+        return None
+    return re.compile(r"\b(?:" + "|".join(sorted(map(re.escape, words))) + r")\b")
+
+
+def food_role(nutrients):
+    """'protein', 'carb', 'side' or 'other' from per-100g nutrients."""
+    calories, protein, carbs, fats, fiber = nutrients
+    if calories <= 0:
+        return "other"
+    if protein >= 8 and protein * 4 / calories >= 0.2:
+        return "protein"
+    if calories <= 100:
+        return "side"
+    if carbs * 4 / calories >= 0.5:
+        return "carb"
+    return "other"
+
+
+def _role_rank(role, nutrients):
+    # Higher is better: lean protein for protein sources, fiber per kcal otherwise
+    calories, protein, carbs, fats, fiber = nutrients
+    if role == "protein":
+        return protein / calories
+    return (fiber + 0.1) / calories
+
+
+class NutrientMatrix:
+    """Per-role shortlists of the catalog, best first, for the recommender.
+    
+    Built once per catalog load and kept current by FoodCatalog.add(), so a
+    recommendation never walks the whole catalog.
+    """
+
+    def __init__(self, foods):
+        # food_role() and _role_rank() inlined: this is one pass over the whole catalog
+        ranked = {"protein": [], "carb": [], "side": [], "other": []}
+        protein_foods, carb_foods, side_foods, other_foods = ranked.values()
+        for name, (calories, protein, carbs, fats, fiber) in foods.items():
+            if calories <= 0:
+                continue
+            if protein >= 8 and protein * 4 >= 0.2 * calories:
+                protein_foods.append((protein / calories, name))
+            elif calories <= 100:
+                side_foods.append(((fiber + 0.1) / calories, name))
+            elif carbs * 4 >= 0.5 * calories:
+                carb_foods.append(((fiber + 0.1) / calories, name))
+            else:
+                other_foods.append(((fiber + 0.1) / calories, name))
+        self.shortlists = {role: heapq.nlargest(ROLE_SHORTLIST_SIZE, entries)
+                           for role, entries in ranked.items()}
+
+    def add(self, name, nutrients):
+        if nutrients[0] <= 0:
+            return
+        role = food_role(nutrients)
+        entries = self.shortlists[role]
+        entry = (_role_rank(role, nutrients), name)
+        if len(entries) < ROLE_SHORTLIST_SIZE or entry > entries[-1]:
+            entries = sorted(entries + [entry], reverse=True)[:ROLE_SHORTLIST_SIZE]
+            self.shortlists = {**self.shortlists, role: entries}
+
+    def candidates(self, role, excluded, count):
+        """Up to `count` names from a role's shortlist that `excluded` doesn't match."""
+        names = []
+        for _, name in self.shortlists[role]:
+            if excluded is None or not excluded.search(name):
+                names.append(name)
+                if len(names) == count:
+                    break
+        return names
+
+
+def _solve(m, v):
+    """Solve the 1-3 variable normal equations m x = v by Cramer's rule; None if singular."""
+    if len(v) == 1:
+        return [v[0] / m[0][0]] if m[0][0] else None
+    if len(v) == 2:
+        det = m[0][0] * m[1][1] - m[0][1] * m[1][0]
+        if abs(det) < 1e-12:
+            return None
+        return [(v[0] * m[1][1] - m[0][1] * v[1]) / det, (m[0][0] * v[1] - v[0] * m[1][0]) / det]
+    (a, b, c), (d, e, f), (g, h, i) = m
+    ei_fh, di_fg, dh_eg = e * i - f * h, d * i - f * g, d * h - e * g
+    det = a * ei_fh - b * di_fg + c * dh_eg
+    if abs(det) < 1e-12:
+        return None
+    x, y, z = v
+    return [(x * ei_fh - b * (y * i - f * z) + c * (y * h - e * z)) / det,
+            (a * (y * i - f * z) - x * di_fg + c * (d * z - y * g)) / det,
+            (a * (e * z - y * h) - b * (d * z - y * g) + x * dh_eg) / det]
+
+
+def fit_portions(combo, fit, floors, limits):
+    """Grams per food (rounded to 10 g, within floors/limits) and the weighted miss.
+    
+    `combo` indexes the candidates of `fit`, a FitTables. The miss is the
+    weighted sum of squared relative errors on calories, protein, carbs and
+    fats, so 0.01 is ~10% off on one of them.
+    """
+    gram, weights = fit.gram, fit.weights
+    grams = _solve([[gram[i][j] for j in combo] for i in combo], [weights[i] for i in combo])
+    if grams is None:
+        return None, math.inf
+    grams = [min(max(round(g, -1), floors[i]), limits[i]) for g, i in zip(grams, combo)]
+    # |A g - 1|^2 expanded, so no per-nutrient loop is needed
+    miss = sum(FIT_WEIGHTS)
+    for g, i in zip(grams, combo):
+        miss -= 2 * g * weights[i]
+        for h, j in zip(grams, combo):
+            miss += g * h * gram[i][j]
+    return grams, miss
+
+
+class FitTables:
+    """Per-gram contribution of each candidate food as a fraction of each meal
+    target (`scaled`), plus their weighted Gram matrix and sums, so scoring a
+    combination only indexes these."""
+
+    def __init__(self, catalog_foods, names, target_calories):
+        protein_share, carb_share, fat_share = MACRO_SPLIT
+        targets = (target_calories, target_calories * protein_share / 4,
+                   target_calories * carb_share / 4, target_calories * fat_share / 9)
+        self.scaled = [[catalog_foods[name][k] / 100 / targets[k] for k in range(4)] for name in names]
+        self.gram = [[sum(w * x * y for w, x, y in zip(FIT_WEIGHTS, a, b)) for b in self.scaled]
+                     for a in self.scaled]
+        self.weights = [sum(w * x for w, x in zip(FIT_WEIGHTS, a)) for a in self.scaled]
+
+
+def _distinct_plans(plans, names, count):
+    """The best `count` of sorted (score, combo, grams) plans, each sharing at
+    most one food with any earlier pick, as (score, [(name, grams), ...])."""
+    chosen = []
+    for score, combo, grams in plans:
+        if all(len(set(combo) & set(other)) <= min(1, len(combo) - 1) for _, other, _ in chosen):
+            chosen.append((score, combo, grams))
+            if len(chosen) == count:
+                break
+    return [(score, [(names[i], g) for i, g in zip(combo, grams)]) for score, combo, grams in chosen]
+
+
+def plan_meals(catalog_foods, matrix, target_calories, meal_type, excluded=None,
+               preferred=None, count=3):
+    """Best food combinations for a meal, as [(score, [(name, grams), ...]), ...].
+    
+    `preferred` maps food name -> bonus (routine, pantry, region); those foods
+    are always candidates and their bonus is subtracted from a combination's
+    miss. `excluded` is a diet_filter() pattern.
+    """
+    preferred = preferred or {}
+    names, roles, pools = [], [], {}
+    for role in ("protein", "carb", "side", "other"):
+        pool = [name for name, _ in sorted(preferred.items(), key=lambda item: -item[1])
+                if name in catalog_foods and catalog_foods[name][0] > 0
+                and food_role(catalog_foods[name]) == role
+                and (excluded is None or not excluded.search(name))][:ROLE_CANDIDATES]
+        for name in matrix.candidates(role, excluded, ROLE_CANDIDATES * 2):
+            if len(pool) >= ROLE_CANDIDATES:
+                break
+            if name not in pool:
+                pool.append(name)
+        pools[role] = list(range(len(names), len(names) + len(pool)))
+        names += pool
+        roles += [role] * len(pool)
+    
+    fit = FitTables(catalog_foods, names, target_calories)
+    floors = [MIN_PORTION_G] * len(names)
+    limits = [MAX_PORTION_G[role] for role in roles]
+    bonus = [preferred.get(name, 0) for name in names]
+    
+    if meal_type == "snack":
+        shapes = [("side",), ("carb",), ("protein",), ("other",), ("side", "protein"), ("side", "other")]
+    else:
+        shapes = [("protein", "carb", "side"), ("protein", "carb"), ("protein", "side"),
+                  ("protein", "carb", "other")]
+    
+    plans = []
+    for shape in shapes:
+        for combo in _role_combinations([pools[role] for role in shape]):
+            grams, miss = fit_portions(combo, fit, floors, limits)
+            if grams is not None:
+                plans.append((miss - sum(bonus[i] for i in combo), combo, grams))
+    plans.sort(key=lambda plan: plan[0])
+    return _distinct_plans(plans, names, count)
+
+
+def _role_combinations(pools):
+    if not pools:
+        yield ()
+        return
+    for name in pools[0]:
+        for rest in _role_combinations(pools[1:]):
+            if name not in rest:
+                yield (name,) + rest
+
+
+def plan_pantry_meals(catalog_foods, pantry, target_calories, count=3):
+    """Best meals of 1-PANTRY_MEAL_ITEMS pantry foods, as plan_meals() returns them.
+    
+    `pantry` maps food name -> grams on hand (None if untracked); portions never
+    exceed what's there. The search is a depth-first branch and bound over the
+    candidates, best single-food fit first. For a partial meal, each nutrient
+    can only end up between the sum of the chosen foods' minimum portions and
+    their full amounts plus the largest amounts the remaining slots could add.
+    The distance of that interval from the target bounds the miss of every
+    meal that extends it, so branches that can't beat the kept plans are cut.
+    """
+    names, floors, limits = [], [], []
+    for name, quantity in pantry.items():
+        nutrients = catalog_foods.get(name)
+        if not nutrients or nutrients[0] <= 0 or (quantity is not None and quantity < PANTRY_MIN_PORTION_G):
+            continue
+        limit = MAX_PORTION_G[food_role(nutrients)]
+        if quantity is not None:
+            limit = min(limit, quantity)
+        names.append(name)
+        floors.append(min(MIN_PORTION_G, limit))
+        limits.append(limit)
+    if not names:
+        return []
+    
+    # Keep the most promising foods of each role (by how well each fits alone)
+    single = [fit_portions((0,), FitTables(catalog_foods, [name], target_calories), [floor], [limit])[1]
+              for name, floor, limit in zip(names, floors, limits)]
+    by_role = {}
+    for i in sorted(range(len(names)), key=single.__getitem__):
+        by_role.setdefault(food_role(catalog_foods[names[i]]), []).append(i)
+    order = sorted((i for pool in by_role.values() for i in pool[:PANTRY_ROLE_CANDIDATES]),
+                   key=single.__getitem__)
+    names = [names[i] for i in order]
+    floors = [floors[i] for i in order]
+    limits = [limits[i] for i in order]
+    fit = FitTables(catalog_foods, names, target_calories)
+    n = len(names)
+    
+    # low/high[i][k]: nutrient k of food i at its floor/limit, as a fraction of the target.
+    # best_rest[p][r][k]: the most r foods from p onwards could add to nutrient k.
+    low = [[floors[i] * a for a in fit.scaled[i]] for i in range(n)]
+    high = [[limits[i] * a for a in fit.scaled[i]] for i in range(n)]
+    slots = PANTRY_MEAL_ITEMS - 1
+    best_rest = [[[0.0] * 4 for _ in range(slots + 1)] for _ in range(n + 1)]
+    top = [[] for _ in range(4)]
+    for p in range(n - 1, -1, -1):
+        for k in range(4):
+            top[k] = sorted(top[k] + [high[p][k]], reverse=True)[:slots]
+            for r in range(1, slots + 1):
+                best_rest[p][r][k] = sum(top[k][:r])
+    
+    keep = count * 8
+    kept = []  # (score, combo, grams), best first
+    w_cal, w_protein, w_carbs, w_fats = FIT_WEIGHTS
+    
+    def search(start, combo, lo, hi):
+        slots_left = PANTRY_MEAL_ITEMS - len(combo) - 1
+        for p in range(start, n):
+            worst = kept[-1][0] if len(kept) == keep else math.inf
+            lo_p, hi_p, rest = low[p], high[p], best_rest[p + 1][slots_left]
+            new_lo = [lo[0] + lo_p[0], lo[1] + lo_p[1], lo[2] + lo_p[2], lo[3] + lo_p[3]]
+            new_hi = [hi[0] + hi_p[0], hi[1] + hi_p[1], hi[2] + hi_p[2], hi[3] + hi_p[3]]
+            bound = 0.0
+            for w, l, h in ((w_cal, new_lo[0], new_hi[0] + rest[0]), (w_protein, new_lo[1], new_hi[1] + rest[1]),
+                            (w_carbs, new_lo[2], new_hi[2] + rest[2]), (w_fats, new_lo[3], new_hi[3] + rest[3])):
+                if h < 1:
+                    bound += w * (h - 1) ** 2
+                elif l > 1:
+                    bound += w * (l - 1) ** 2
+            if bound >= worst:
+                continue
+            extended = combo + (p,)
+            grams, miss = fit_portions(extended, fit, floors, limits)
+            if miss < worst:
+                insort(kept, (miss, extended, grams))
+                del kept[keep:]
+            if slots_left:
+                search(p + 1, extended, new_lo, new_hi)
+    
+    search(0, (), [0.0] * 4, [0.0] * 4)
+    return _distinct_plans(kept, names, count)
+
+
+# ==== METRICS ====
+
+# Per-tool call/SQL metrics for server_metrics(). "0" turns them off; "trace" also
+# counts every statement SQLite runs (trigger bodies, each executemany row) via the
+# sqlite3 trace callback, which costs ~2 µs per statement.
+METRICS_MODE = os.environ.get("HEALTH_MCP_METRICS", "1")
+METRICS_ENABLED = METRICS_MODE != "0"
+TRACE_STATEMENTS = METRICS_MODE == "trace"
+
+# Single SQL statements slower than this are logged and kept for get_slow_queries()
+SLOW_QUERY_SECONDS = float(os.environ.get("HEALTH_MCP_SLOW_QUERY_MS", "100")) / 1000
+MAX_SLOW_QUERIES = 100
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+slow_query_log = logging.getLogger("health_mcp.slow_query")
+
+# CallStats of the tool call running in this thread (None outside metered calls)
+_call_stats = contextvars.ContextVar("health_call_stats", default=None)
+
+
+class Histogram:
+    """Prometheus-style histogram: per-bucket counts, rendered cumulatively."""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+
+class CallStats:
+    """What one tool call did; filled in lock-free by its own thread, merged at the end."""
+
+    __slots__ = ("tool", "statements", "sql_seconds", "rows_read", "rows_written", "slow_queries")
+
+    def __init__(self, tool):
+        self.tool = tool
+        self.statements = 0
+        self.sql_seconds = []  # one entry per execute/executemany
+        self.rows_read = 0
+        self.rows_written = 0
+        self.slow_queries = 0
+
+    def slow_query(self, sql, seconds):
+        self.slow_queries += 1
+        statement = " ".join(sql.split())
+        METRICS.slow_queries.append((time.time(), self.tool, seconds, statement))
+        slow_query_log.warning("slow query in %s (%.0f ms): %s", self.tool, seconds * 1000, statement[:500])
+
+
+class ToolMetrics:
+    __slots__ = ("calls", "errors", "latency", "sql", "statements", "rows_read", "rows_written", "slow_queries")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram()
+        self.sql = Histogram()
+        self.statements = 0
+        self.rows_read = 0
+        self.rows_written = 0
+        self.slow_queries = 0
+
+
+class MetricsRegistry:
+    """Process-wide tool metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.tools = {}
+        self.slow_queries = deque(maxlen=MAX_SLOW_QUERIES)  # (unix time, tool, seconds, sql)
+        self._lock = threading.Lock()
+
+    def record(self, tool, seconds, failed, call):
+        with self._lock:
+            metrics = self.tools.get(tool)
+            if metrics is None:
+                metrics = self.tools[tool] = ToolMetrics()
+            metrics.calls += 1
+            metrics.errors += failed
+            metrics.latency.observe(seconds)
+            for sql_seconds in call.sql_seconds:
+                metrics.sql.observe(sql_seconds)
+            metrics.statements += call.statements
+            metrics.rows_read += call.rows_read
+            metrics.rows_written += call.rows_written
+            metrics.slow_queries += call.slow_queries
+
+    def render(self) -> str:
+        with self._lock:
+            tools = sorted(self.tools.items())
+            lines = []
+            for name, kind, help_text, attr in (
+                ("health_mcp_tool_calls_total", "counter", "Tool calls.", "calls"),
+                ("health_mcp_tool_errors_total", "counter", "Tool calls that raised.", "errors"),
+                ("health_mcp_tool_duration_seconds", "histogram", "Tool call latency.", "latency"),
+                ("health_mcp_sql_statements_total", "counter", "SQL statements executed.", "statements"),
+                ("health_mcp_sql_duration_seconds", "histogram", "Time in cursor.execute per statement.", "sql"),
+                ("health_mcp_rows_read_total", "counter", "Rows fetched from SQLite.", "rows_read"),
+                ("health_mcp_rows_written_total", "counter", "Rows inserted/updated/deleted.", "rows_written"),
+                ("health_mcp_slow_queries_total", "counter", "Statements over the slow-query threshold.",
+                 "slow_queries"),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for tool, metrics in tools:
+                    value = getattr(metrics, attr)
+                    if kind == "counter":
+                        lines.append(f'{name}{{tool="{tool}"}} {value}')
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), value.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{tool="{tool}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{tool="{tool}"}} {value.sum:.6f}')
+                    lines.append(f'{name}_count{{tool="{tool}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+def _count_statement(sql):
+    # sqlite3 trace callback (HEALTH_MCP_METRICS=trace): every statement SQLite runs
+    stats = _call_stats.get()
+    if stats is not None:
+        stats.statements += 1
+
+
+class MeteredCursor(sqlite3.Cursor):
+    """Cursor that times statements and counts rows for the current CallStats."""
+
+    def execute(self, sql, parameters=()):
+        stats = _call_stats.get()
+        if stats is None:
+            return super().execute(sql, parameters)
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        seconds = time.perf_counter() - start
+        stats.sql_seconds.append(seconds)
+        if not TRACE_STATEMENTS:
+            stats.statements += 1
+        if self.rowcount > 0:
+            stats.rows_written += self.rowcount
+        if seconds >= SLOW_QUERY_SECONDS:
+            stats.slow_query(sql, seconds)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        stats = _call_stats.get()
+        if stats is None:
+            return super().executemany(sql, seq_of_parameters)
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        seconds = time.perf_counter() - start
+        stats.sql_seconds.append(seconds)
+        if self.rowcount > 0:
+            stats.rows_written += self.rowcount
+        if not TRACE_STATEMENTS:
+            stats.statements += max(self.rowcount, 1)
+        if seconds >= SLOW_QUERY_SECONDS:
+            stats.slow_query(sql, seconds)
+        return self
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            stats = _call_stats.get()
+            if stats is not None:
+                stats.rows_read += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        stats = _call_stats.get()
+        if stats is not None:
+            stats.rows_read += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        stats = _call_stats.get()
+        if stats is not None:
+            stats.rows_read += len(rows)
+        return rows
+
+
+def metered(fn):
+    """Wrap a tool function so every call is recorded in METRICS (no-op if disabled)."""
+    if not METRICS_ENABLED:
+        return fn
+    tool = fn.__name__
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        stats = CallStats(tool)
+        token = _call_stats.set(stats)
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _call_stats.reset(token)
+            METRICS.record(tool, time.perf_counter() - start, failed, stats)
+
+    return call
+
+
+# ==== PROFILING ====
+
+# Setting HEALTH_MCP_PROFILE_DIR turns on per-call cProfile support: one .pstats
+# file per profiled call. Unset, tools aren't wrapped at all.
+PROFILE_DIR = os.environ.get("HEALTH_MCP_PROFILE_DIR")
+PROFILE_DIR = Path(PROFILE_DIR) if PROFILE_DIR else None
+
+# Profile every Nth call of each tool; 0 = only calls armed with profile_tool()
+PROFILE_EVERY = int(os.environ.get("HEALTH_MCP_PROFILE_EVERY", "0"))
+
+_profile_armed = {}  # tool -> profiled calls still requested
+_profile_calls = Counter()  # tool -> calls seen (for PROFILE_EVERY)
+_profile_state_lock = threading.Lock()
+# cProfile can only be active once per process (3.12+), so calls take turns
+_profiler_lock = threading.Lock()
+
+TOOL_NAMES = set()
+
+# Orders get_profile_summary can sort by
+PROFILE_SORTS = ("cumulative", "tottime", "ncalls")
+
+
+def _should_profile(tool):
+    with _profile_state_lock:
+        remaining = _profile_armed.get(tool)
+        if remaining:
+            if remaining == 1:
+                del _profile_armed[tool]
+            else:
+                _profile_armed[tool] = remaining - 1
+            return True
+        if PROFILE_EVERY:
+            _profile_calls[tool] += 1
+            return _profile_calls[tool] % PROFILE_EVERY == 0
+    return False
+
+
+def profiled(fn):
+    """Wrap a tool function so selected calls run under cProfile (no-op without PROFILE_DIR)."""
+    TOOL_NAMES.add(fn.__name__)
+    if PROFILE_DIR is None:
+        return fn
+    tool = fn.__name__
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        if not (_profile_armed or PROFILE_EVERY) or not _should_profile(tool):
+            return fn(*args, **kwargs)
+        if not _profiler_lock.acquire(blocking=False):
+            return fn(*args, **kwargs)  # another call is being profiled right now
+        try:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+                PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(PROFILE_DIR / f"{tool}-{datetime.now():%Y%m%d-%H%M%S-%f}.pstats")
+        finally:
+            _profiler_lock.release()
+
+    return call
+
+
+def summarize_profiles(tool_name: str = "", top: int = 15, sort: str = "cumulative"):
+    """(files read, pstats report) for PROFILE_DIR, optionally one tool's; None if no files.
+
+    tool_name must be empty or in TOOL_NAMES (it becomes a glob pattern) and
+    sort one of PROFILE_SORTS; anything else raises ValueError.
+    """
+    if tool_name and tool_name not in TOOL_NAMES:
+        raise ValueError(f"Unknown tool '{tool_name}'.")
+    if sort not in PROFILE_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(PROFILE_SORTS)}.")
+    files = sorted(PROFILE_DIR.glob(f"{tool_name or '*'}-*.pstats")) if PROFILE_DIR else []
+    if not files:
+        return None
+    import pstats
+    out = io.StringIO()
+    stats = pstats.Stats(*map(str, files), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(max(top, 1))
+    return len(files), out.getvalue()
+
+
+def tool(fn):
+    """Register a tool that never touches the database; it runs inline, metered."""
+    mcp.tool()(metered(profiled(fn)))
+    return fn
+
+
+# ==== READ CACHE ====
+# Clients re-ask the same questions within a conversation, so read tools keep
+# their formatted result keyed by (database file, tool, arguments, day). Each
+# entry remembers the data_versions counters of the tables it read; a lookup
+# only hits while those are unchanged. Write tools bump the counters in the
+# same transaction as their writes, so a commit from any process or connection
+# invalidates exactly the results that read those tables.
+
+# Cached results kept across all databases; 0 turns the cache off
+READ_CACHE_ENTRIES = int(os.environ.get("HEALTH_MCP_CACHE_ENTRIES", "256"))
+
+# Upper bound on the cached result text (least recently used dropped first)
+READ_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+
+def bump_table_versions(cursor, *tables):
+    """Mark `tables` (from VERSIONED_TABLES) as changed; call inside the write's transaction."""
+    cursor.execute(
+        f"UPDATE data_versions SET version = version + 1 WHERE table_name IN ({', '.join('?' * len(tables))})",
+        tables
+    )
+
+
+class TableVersions:
+    """Per-file copy of the data_versions counters.
+
+    Like FoodCatalog, a dedicated connection asks PRAGMA data_version whether
+    any other connection committed since the last look; only then are the
+    counters re-read (one small WITHOUT ROWID table).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._conn = None
+        self._data_version = None
+        self._versions = {}
+        self._closed = False  # set when the shard is evicted; the connection stays closed
+        self._lock = threading.Lock()
+
+    def current(self, tables) -> tuple:
+        """Counters of `tables`, in order, as of the latest commit."""
+        with self._lock:
+            if self._closed:
+                # Evicted shard: read the counters without keeping a connection open
+                conn = sqlite3.connect(self.path)
+                try:
+                    versions = dict(conn.execute("SELECT table_name, version FROM data_versions"))
+                finally:
+                    conn.close()
+                return tuple(versions.get(table, 0) for table in tables)
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._versions = dict(self._conn.execute("SELECT table_name, version FROM data_versions"))
+                self._data_version = data_version
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def get_table_versions(path=None) -> TableVersions:
+    """The TableVersions for a database file (current shard by default)."""
+    return _shard_helper(path, "versions", TableVersions)
+
+
+class ReadCache:
+    """LRU of read-tool results, bounded by entry count and total text size."""
+
+    def __init__(self, max_entries=READ_CACHE_ENTRIES, max_bytes=READ_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = Counter()  # tool -> lookups answered from the cache
+        self.misses = Counter()  # tool -> lookups that ran the tool (absent or stale)
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()  # key -> (versions, result), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, tool, key, versions):
+        """Cached result for `key` if it was computed at `versions`, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits[tool] += 1
+                return entry[1]
+            self.misses[tool] += 1
+            if entry is not None:
+                del self._entries[key]
+                self.bytes -= len(entry[1])
+            return None
+
+    def put(self, key, versions, result):
+        if len(result) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old[1])
+            self._entries[key] = (versions, result)
+            self.bytes += len(result)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self.bytes -= len(dropped)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """(entries, bytes, evictions, {tool: (hits, misses)}) at this moment."""
+        with self._lock:
+            tools = {tool: (self.hits[tool], self.misses[tool]) for tool in self.hits | self.misses}
+            return len(self._entries), self.bytes, self.evictions, tools
+
+    def render(self) -> str:
+        """Prometheus text lines for the cache counters."""
+        entries, size, evictions, tools = self.stats()
+        lines = []
+        for name, help_text, index in (
+            ("health_mcp_cache_hits_total", "Read tool calls answered from the cache.", 0),
+            ("health_mcp_cache_misses_total", "Read tool calls that ran the query.", 1),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for tool, counts in sorted(tools.items()):
+                lines.append(f'{name}{{tool="{tool}"}} {counts[index]}')
+        for name, kind, help_text, value in (
+            ("health_mcp_cache_evictions_total", "counter", "Entries dropped to stay within bounds.", evictions),
+            ("health_mcp_cache_entries", "gauge", "Cached results.", entries),
+            ("health_mcp_cache_bytes", "gauge", "Characters of cached result text.", size),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+READ_CACHE = ReadCache()
+
+
+def cached(fn, tables):
+    """Wrap a read tool so repeated calls are served from READ_CACHE while `tables` are unchanged.
+
+    Versions are read before the tool runs, so a write committing mid-call
+    leaves an entry that is already stale rather than one that looks fresh.
+    The key includes today's local and UTC dates for tools that default to
+    "today" or use date('now').
+    """
+    if READ_CACHE_ENTRIES <= 0:
+        return fn
+    tool = fn.__name__
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        path = current_db_path()
+        flush_pending_writes(path)  # queued log entries must bump the versions first
+        versions = get_table_versions(path).current(tables)
+        key = (path, tool, args, tuple(sorted(kwargs.items())),
+               time.strftime("%Y-%m-%d"), time.strftime("%Y-%m-%d", time.gmtime()))
+        result = READ_CACHE.get(tool, key, versions)
+        if result is None:
+            result = fn(*args, **kwargs)
+            READ_CACHE.put(key, versions, result)
+        return result
+
+    return call
+
+
+# ==== ASYNC TOOL EXECUTION ====
+
+# Threads that run database-backed tools; defaults to one per pooled connection
+DB_WORKERS = int(os.environ.get("HEALTH_MCP_DB_WORKERS", str(POOL_SIZE)))
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="health-db")
+
+
+def _run_on_shard(db_path, fn, args, kwargs):
+    token = _current_db_path.set(db_path)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _current_db_path.reset(token)
+
+
+# name -> (plain function, tables it reads) for every database-backed tool; used by batch()
+DB_TOOLS = {}
+
+
+def db_tool(fn=None, *, reads=()):
+    """Register a database-backed tool with MCP as a coroutine.
+
+    The registered version awaits fn on the bounded DB executor, so blocking
+    sqlite3 I/O never stalls the event loop while other clients are served.
+    The module-level name stays the plain function, so tools can still call
+    each other (and benchmarks can call them) synchronously; the coroutine
+    is available as fn.run_async.
+
+    Read-only tools list the tables they read as `reads`, which puts their
+    MCP calls behind the read cache; direct calls are never cached.
+    """
+    if fn is None:
+        return functools.partial(db_tool, reads=reads)
+    call = metered(profiled(cached(fn, reads) if reads else fn))
+
+    @functools.wraps(fn)
+    async def run_async(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Resolve the user's shard here, where the MCP request context lives
+        db_path = resolve_tenant_db_path()
+        return await loop.run_in_executor(
+            _db_executor, functools.partial(_run_on_shard, db_path, call, args, kwargs)
+        )
+
+    mcp.tool()(run_async)
+    fn.run_async = run_async
+    DB_TOOLS[fn.__name__] = (fn, reads)
+    return fn
+
+@tool
+def calculate_bmi(weight_kg: float, height_m: float) -> str:
+    """Calculate Body Mass Index (BMI) from weight and height.
+    
+    Args:
+        weight_kg: Weight in kilograms
+        height_m: Height in meters
+    """
+    bmi = weight_kg / (height_m ** 2)
+    
+    if bmi < 18.5:
+        category = "Underweight"
+    elif bmi < 25:
+        category = "Normal weight"
+    elif bmi < 30:
+        category = "Overweight"
+    else:
+        category = "Obese"
+    
+    return f"BMI: {bmi:.1f} - Category: {category}"
+
+@tool
+def daily_water_intake(weight_kg: float) -> str:
+    """Calculate recommended daily water intake based on body weight.
+    
+    Args:
+        weight_kg: Weight in kilograms
+    """
+    # Simple formula: 30-35ml per kg of body weight
+    min_water = weight_kg * 30
+    max_water = weight_kg * 35
+    
+    return f"Recommended daily water intake: {min_water:.0f}-{max_water:.0f} ml ({min_water/1000:.1f}-{max_water/1000:.1f} liters)"
+
+@tool
+def steps_to_calories(steps: int, weight_kg: float = 70) -> str:
+    """Estimate calories burned from walking steps.
+    
+    Args:
+        steps: Number of steps taken
+        weight_kg: Body weight in kilograms (default: 70)
+    """
+    # Rough estimate: 0.04 calories per step per kg
+    calories = steps * 0.04 * (weight_kg / 70)
+    
+    return f"{steps} steps burned approximately {calories:.0f} calories"
+
+@tool
+def heart_rate_zone(age: int, resting_hr: int = 60) -> str:
+    """Calculate heart rate training zones based on age.
+    
+    Args:
+        age: Age in years
+        resting_hr: Resting heart rate (default: 60 bpm)
+    """
+    max_hr = 220 - age
+    hr_reserve = max_hr - resting_hr
+    
+    zones = {
+        "Easy (50-60%)": (resting_hr + hr_reserve * 0.5, resting_hr + hr_reserve * 0.6),
+        "Moderate (60-70%)": (resting_hr + hr_reserve * 0.6, resting_hr + hr_reserve * 0.7),
+        "Hard (70-80%)": (resting_hr + hr_reserve * 0.7, resting_hr + hr_reserve * 0.8),
+        "Very Hard (80-90%)": (resting_hr + hr_reserve * 0.8, resting_hr + hr_reserve * 0.9),
+    }
+    
+    result = f"Max Heart Rate: {max_hr} bpm\n\nTraining Zones:\n"
+    for zone_name, (low, high) in zones.items():
+        result += f"  {zone_name}: {low:.0f}-{high:.0f} bpm\n"
+    
+    return result
+
+# ==== NUTRITION TRACKING TOOLS ====
+
+@db_tool(reads=("food_database",))
+def list_foods(limit: int = 100, cursor: str = None) -> str:
+    """List foods in the nutrition database, alphabetically, one page at a time.
+    
+    Args:
+        limit: Foods per page (default: 100, max: 500)
+        cursor: Continue after this food name (use the cursor printed at the end of the previous page)
+    """
+    limit = clamp_page_size(limit, 100)
+    conn = get_connection()
+    db = conn.cursor()
+    
+    # Keyset pagination: seek straight to the cursor on the name index
+    db.execute("""
+        SELECT name, calories, protein, carbs, fats, fiber FROM food_database
+        WHERE name > ? ORDER BY name LIMIT ?
+    """, (cursor or "", limit + 1))
+    
+    result = ""
+    last_name = None
+    has_more = False
+    for i, (name, cal, protein, carbs, fats, fiber) in enumerate(iter_rows(db)):
+        if i == limit:
+            has_more = True
+            break
+        result += f"• {name.title()}: {cal}cal, P:{protein}g, C:{carbs}g, F:{fats}g, Fiber:{fiber}g\n"
+        last_name = name
+    conn.close()
+    
+    if last_name is None:
+        return "No more foods." if cursor else "No foods found in database."
+    
+    result = "Available Foods (per 100g):\n\n" + result
+    if has_more:
+        result += f"\n📄 More foods: list_foods(limit={limit}, cursor=\"{last_name}\")"
+    
+    return result
+
+@db_tool(reads=("food_database",))
+def search_foods(query: str, limit: int = 10) -> str:
+    """Search the food database by name (word prefixes, best matches first).
+    
+    Use this to find the exact database name before calling log_meal(),
+    e.g. search_foods("brown rice") or search_foods("chick").
+    
+    Args:
+        query: Words to search for; each word matches as a prefix
+        limit: Maximum results (default: 10, max: 500)
+    """
+    limit = clamp_page_size(limit, 10)
+    terms = re.findall(r"\w+", query.lower())
+    if not terms:
+        return "⚠️ Please provide a food name to search for."
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # 1. Names that start with the query (exact match first): a range scan on
+    #    the name index, which also fills the page for broad one-word queries
+    #    that would otherwise make bm25 rank thousands of hits
+    prefix = query.strip().lower()
+    cursor.execute("""
+        SELECT name, calories, protein, carbs, fats, fiber FROM food_database
+        WHERE name >= ? AND name < ?
+        ORDER BY name LIMIT ?
+    """, (prefix, prefix + "\U0010ffff", limit))
+    foods = cursor.fetchall()
+    
+    # 2. Full-text: every word must match as a prefix ("brown ric" -> "brown"* "ric"*)
+    if len(foods) < limit:
+        fts_query = " ".join(f'"{term}"*' for term in terms)
+        seen = {food[0] for food in foods}
+        cursor.execute("""
+            SELECT f.name, f.calories, f.protein, f.carbs, f.fats, f.fiber
+            FROM (
+                SELECT rowid, rank FROM food_search
+                WHERE food_search MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            ) hits
+            JOIN food_database f ON f.id = hits.rowid
+            ORDER BY hits.rank
+        """, (fts_query, limit + len(foods)))
+        foods += [food for food in cursor.fetchall() if food[0] not in seen][:limit - len(foods)]
+    
+    conn.close()
+    
+    if not foods:
+        return f"No foods matching '{query}'. Add it with add_food_to_database()"
+    
+    result = f"🔎 Foods matching '{query}' (per 100g):\n\n"
+    for name, cal, protein, carbs, fats, fiber in foods:
+        result += f"• {name}: {cal}cal, P:{protein}g, C:{carbs}g, F:{fats}g, Fiber:{fiber}g\n"
+    result += "\n💡 Use the exact name in log_meal(), e.g. log_meal(\"" + foods[0][0] + ":100\")"
+    
+    return result
+
+@db_tool
+def log_meal(food_items: str, date: str = None) -> str:
+    """Log a meal by breaking it down into nutrients and storing in database.
+    
+    The LLM should parse the user's description and provide food items in format:
     "food_name1:quantity_grams, food_name2:quantity_grams"
     
     Args:
@@ -325,11 +2521,12 @@ def log_meal(food_items: str, date: str = None) -> str:
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    catalog = get_food_catalog()
+    foods = catalog.foods()
     
     result = f"Meal logged for {date}:\n\n"
     total_nutrients = {"calories": 0, "protein": 0, "carbs": 0, "fats": 0, "fiber": 0}
+    meal_rows = []
     
     # Parse food items
     items = [item.strip() for item in food_items.split(",")]
@@ -340,16 +2537,23 @@ def log_meal(food_items: str, date: str = None) -> str:
             food_name = food_name.strip().lower()
             quantity = float(quantity.strip())
             
-            # Get nutrition info from database
-            cursor.execute(
-                "SELECT calories, protein, carbs, fats, fiber FROM food_database WHERE name = ?",
-                (food_name,)
-            )
-            nutrition = cursor.fetchone()
+            # Get nutrition info from the catalog cache
+            nutrition = foods.get(food_name)
             
             if not nutrition:
-                result += f"⚠️  '{food_name}' not found in database. Skipped.\n"
-                continue
+                # Fall back to aliases and the closest spelling in the catalog
+                match, score = catalog.match(food_name)
+                if auto_resolves(food_name, match, score):
+                    how = "alias" if score == 1.0 else f"{score:.0%} match"
+                    result += f"🔎 '{food_name}' → '{match}' ({how})\n"
+                    food_name = match
+                    nutrition = foods.get(match) or catalog.foods()[match]
+                elif match is not None:
+                    result += f"⚠️  '{food_name}' not found in database. Did you mean '{match}'? Skipped.\n"
+                    continue
+                else:
+                    result += f"⚠️  '{food_name}' not found in database. Skipped.\n"
+                    continue
             
             # Calculate nutrients for the given quantity (database is per 100g)
             multiplier = quantity / 100
@@ -359,11 +2563,7 @@ def log_meal(food_items: str, date: str = None) -> str:
             fats = nutrition[3] * multiplier
             fiber = nutrition[4] * multiplier
             
-            # Insert into meals table
-            cursor.execute("""
-                INSERT INTO meals (date, food_name, quantity_grams, calories, protein, carbs, fats, fiber)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (date, food_name, quantity, calories, protein, carbs, fats, fiber))
+            meal_rows.append((date, food_name, quantity, calories, protein, carbs, fats, fiber))
             
             # Add to totals
             total_nutrients["calories"] += calories
@@ -377,8 +2577,15 @@ def log_meal(food_items: str, date: str = None) -> str:
         except ValueError:
             result += f"⚠️  Invalid format for item: '{item}'. Use 'food:quantity'\n"
     
-    conn.commit()
-    conn.close()
+    if meal_rows:
+        def write(cursor):
+            cursor.executemany("""
+                INSERT INTO meals (date, food_name, quantity_grams, calories, protein, carbs, fats, fiber)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, meal_rows)
+            add_to_daily_totals(cursor, date, meal_items=len(meal_rows), **total_nutrients)
+            bump_table_versions(cursor, "meals", "daily_totals")
+        run_write(write, rows=len(meal_rows))
     
     result += f"\n📊 TOTAL: {total_nutrients['calories']:.0f} calories, "
     result += f"Protein: {total_nutrients['protein']:.1f}g, "
@@ -388,7 +2595,7 @@ def log_meal(food_items: str, date: str = None) -> str:
     
     return result
 
-@mcp.tool()
+@db_tool(reads=("meals",))
 def get_daily_nutrition(date: str = None) -> str:
     """Get total nutrition intake for a specific day.
     
@@ -398,7 +2605,7 @@ def get_daily_nutrition(date: str = None) -> str:
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Get all meals for the day
@@ -409,9 +2616,13 @@ def get_daily_nutrition(date: str = None) -> str:
     """, (date,))
     
     meals = cursor.fetchall()
+    # Items compact_history rolled up; meal_rollups only changes along with meals
+    cursor.execute("SELECT calories, protein, carbs, fats, fiber, meal_items FROM meal_rollups WHERE date = ?",
+                   (date,))
+    rollup = cursor.fetchone()
     conn.close()
     
-    if not meals:
+    if not meals and rollup is None:
         return f"No meals logged for {date}"
     
     result = f"📅 Nutrition Summary for {date}\n\n"
@@ -419,6 +2630,15 @@ def get_daily_nutrition(date: str = None) -> str:
     
     totals = {"calories": 0, "protein": 0, "carbs": 0, "fats": 0, "fiber": 0}
     
+    if rollup is not None:
+        cal, protein, carbs, fats, fiber, items = rollup
+        result += f"  • {items} items (rolled up, details no longer kept): {cal:.0f}cal, P:{protein:.1f}g, C:{carbs:.1f}g, F:{fats:.1f}g\n"
+        totals["calories"] += cal
+        totals["protein"] += protein
+        totals["carbs"] += carbs
+        totals["fats"] += fats
+        totals["fiber"] += fiber
+    
     for food, qty, cal, protein, carbs, fats, fiber, timestamp in meals:
         time = timestamp.split()[1][:5]  # Get HH:MM
         result += f"  • {time} - {food.title()} ({qty}g): {cal:.0f}cal, P:{protein:.1f}g, C:{carbs:.1f}g, F:{fats:.1f}g\n"
@@ -439,7 +2659,7 @@ def get_daily_nutrition(date: str = None) -> str:
     
     return result
 
-@mcp.tool()
+@db_tool
 def add_food_to_database(name: str, calories: float, protein: float, carbs: float, fats: float, fiber: float = 0) -> str:
     """Add a new food item to the nutrition database (values per 100g).
     
@@ -451,7 +2671,7 @@ def add_food_to_database(name: str, calories: float, protein: float, carbs: floa
         fats: Fats in grams per 100g
         fiber: Fiber in grams per 100g (optional)
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
@@ -459,7 +2679,8 @@ def add_food_to_database(name: str, calories: float, protein: float, carbs: floa
             INSERT INTO food_database (name, calories, protein, carbs, fats, fiber)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (name.lower(), calories, protein, carbs, fats, fiber))
-        conn.commit()
+        get_food_catalog().add(conn, name.lower(), (calories, protein, carbs, fats, fiber))
+        conn.commit()  # the catalog cache only learns about the food if this succeeds
         result = f"✓ Added '{name}' to food database: {calories}cal, P:{protein}g, C:{carbs}g, F:{fats}g, Fiber:{fiber}g (per 100g)"
     except sqlite3.IntegrityError:
         result = f"⚠️  '{name}' already exists in the database."
@@ -468,61 +2689,103 @@ def add_food_to_database(name: str, calories: float, protein: float, carbs: floa
     
     return result
 
-@mcp.tool()
-def get_nutrition_stats(days: int = 7) -> str:
-    """Get nutrition statistics for the last N days.
+@db_tool
+def add_food_alias(alias: str, food_name: str) -> str:
+    """Teach log_meal another name for a food already in the database.
     
     Args:
-        days: Number of days to analyze (default: 7)
+        alias: Alternative name or spelling (e.g., "dahi", "chapatti")
+        food_name: Existing food it refers to (e.g., "curd")
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    alias = alias.strip().lower()
+    food_name = food_name.strip().lower()
+    catalog = get_food_catalog()
+    foods = catalog.foods()
     
-    cursor.execute("""
-        SELECT date,
-               SUM(calories) as total_cal,
-               SUM(protein) as total_protein,
-               SUM(carbs) as total_carbs,
-               SUM(fats) as total_fats,
-               SUM(fiber) as total_fiber
-        FROM meals
-        WHERE date >= date('now', '-' || ? || ' days')
-        GROUP BY date
-        ORDER BY date DESC
-    """, (days,))
+    if food_name not in foods:
+        return f"⚠️  '{food_name}' not found in database. Add it first with add_food_to_database()."
+    if alias in foods:
+        return f"⚠️  '{alias}' is already a food in the database."
     
-    stats = cursor.fetchall()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO food_aliases (alias, food_name) VALUES (?, ?)
+        ON CONFLICT(alias) DO UPDATE SET food_name = excluded.food_name
+    """, (alias, food_name))
+    catalog.add_alias(conn, alias, food_name)
+    conn.commit()
     conn.close()
     
-    if not stats:
-        return f"No nutrition data found for the last {days} days."
+    return f"✓ '{alias}' now logs as '{food_name}'"
+
+@db_tool(reads=("daily_totals",))
+def get_nutrition_stats(days: int = 7, limit: int = 30, cursor: str = None) -> str:
+    """Get nutrition statistics for the last N days.
     
-    result = f"📈 Nutrition Stats for Last {days} Days:\n\n"
+    Averages always cover the whole period; the per-day list is paged.
+    
+    Args:
+        days: Number of days to analyze (default: 7)
+        limit: Days listed per page (default: 30, max: 500)
+        cursor: Continue listing before this date (printed at the end of the previous page)
+    """
+    limit = clamp_page_size(limit, 30)
+    conn = get_connection()
+    db = conn.cursor()
+    
+    db.execute("""
+        SELECT COUNT(*), AVG(calories), AVG(protein), AVG(carbs), AVG(fats), AVG(fiber)
+        FROM daily_totals
+        WHERE date >= date('now', '-' || ? || ' days') AND meal_items > 0
+    """, (days,))
+    days_count, avg_cal, avg_protein, avg_carbs, avg_fats, avg_fiber = db.fetchone()
     
-    avg_cal, avg_protein, avg_carbs, avg_fats, avg_fiber = 0, 0, 0, 0, 0
+    if not days_count:
+        conn.close()
+        return f"No nutrition data found for the last {days} days."
+    
+    db.execute("""
+        SELECT date, calories, protein, carbs, fats, fiber
+        FROM daily_totals
+        WHERE date >= date('now', '-' || ? || ' days') AND meal_items > 0 AND date < ?
+        ORDER BY date DESC
+        LIMIT ?
+    """, (days, cursor or "9999-12-31", limit + 1))
     
-    for date, cal, protein, carbs, fats, fiber in stats:
+    result = f"📈 Nutrition Stats for Last {days} Days:\n\n"
+    last_date = None
+    for i, (date, cal, protein, carbs, fats, fiber) in enumerate(iter_rows(db)):
+        if i == limit:
+            result += f"\n📄 More days: get_nutrition_stats(days={days}, limit={limit}, cursor=\"{last_date}\")\n"
+            break
         result += f"{date}: {cal:.0f} kcal | P:{protein:.0f}g | C:{carbs:.0f}g | F:{fats:.0f}g | Fiber:{fiber:.0f}g\n"
-        avg_cal += cal
-        avg_protein += protein
-        avg_carbs += carbs
-        avg_fats += fats
-        avg_fiber += fiber
+        last_date = date
+    conn.close()
     
-    days_count = len(stats)
     result += f"\n{'='*50}\n"
     result += f"📊 Averages over {days_count} days:\n"
-    result += f"  Calories: {avg_cal/days_count:.0f} kcal/day\n"
-    result += f"  Protein:  {avg_protein/days_count:.0f}g/day\n"
-    result += f"  Carbs:    {avg_carbs/days_count:.0f}g/day\n"
-    result += f"  Fats:     {avg_fats/days_count:.0f}g/day\n"
-    result += f"  Fiber:    {avg_fiber/days_count:.0f}g/day\n"
+    result += f"  Calories: {avg_cal:.0f} kcal/day\n"
+    result += f"  Protein:  {avg_protein:.0f}g/day\n"
+    result += f"  Carbs:    {avg_carbs:.0f}g/day\n"
+    result += f"  Fats:     {avg_fats:.0f}g/day\n"
+    result += f"  Fiber:    {avg_fiber:.0f}g/day\n"
     
     return result
 
 # ==== SLEEP TRACKING TOOLS ====
 
-@mcp.tool()
+def sleep_duration_hours(sleep_time: str, wake_time: str) -> float:
+    """Hours between two HH:MM times, handling sleep across midnight. Raises ValueError."""
+    sleep_dt = datetime.strptime(sleep_time, "%H:%M")
+    wake_dt = datetime.strptime(wake_time, "%H:%M")
+    
+    # Handle sleep across midnight
+    if wake_dt < sleep_dt:
+        return (24 - sleep_dt.hour + wake_dt.hour) + (wake_dt.minute - sleep_dt.minute) / 60
+    return (wake_dt.hour - sleep_dt.hour) + (wake_dt.minute - sleep_dt.minute) / 60
+
+@db_tool
 def log_sleep(sleep_time: str, wake_time: str, date: str = None, quality: str = "good", notes: str = "") -> str:
     """Log sleep information - when you slept and when you woke up.
     
@@ -539,27 +2802,17 @@ def log_sleep(sleep_time: str, wake_time: str, date: str = None, quality: str =
         date = datetime.now().strftime("%Y-%m-%d")
     
     # Calculate sleep hours
-    from datetime import datetime as dt
     try:
-        sleep_dt = dt.strptime(sleep_time, "%H:%M")
-        wake_dt = dt.strptime(wake_time, "%H:%M")
+        hours = sleep_duration_hours(sleep_time, wake_time)
         
-        # Handle sleep across midnight
-        if wake_dt < sleep_dt:
-            hours = (24 - sleep_dt.hour + wake_dt.hour) + (wake_dt.minute - sleep_dt.minute) / 60
-        else:
-            hours = (wake_dt.hour - sleep_dt.hour) + (wake_dt.minute - sleep_dt.minute) / 60
-        
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO sleep_log (date, sleep_time, wake_time, hours, quality, notes)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (date, sleep_time, wake_time, hours, quality, notes))
-        
-        conn.commit()
-        conn.close()
+        def write(cursor):
+            cursor.execute("""
+                INSERT INTO sleep_log (date, sleep_time, wake_time, hours, quality, notes)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (date, sleep_time, wake_time, hours, quality, notes))
+            add_to_daily_totals(cursor, date, sleep_hours=hours)
+            bump_table_versions(cursor, "sleep_log", "daily_totals")
+        run_write(write)
         
         quality_emoji = {"excellent": "😴✨", "good": "😊", "fair": "😐", "poor": "😞"}.get(quality, "😊")
         
@@ -568,38 +2821,56 @@ def log_sleep(sleep_time: str, wake_time: str, date: str = None, quality: str =
     except ValueError:
         return "⚠️ Invalid time format. Please use HH:MM format (e.g., '23:30')"
 
-@mcp.tool()
-def get_sleep_summary(days: int = 7) -> str:
+@db_tool(reads=("sleep_log",))
+def get_sleep_summary(days: int = 7, limit: int = 30, cursor: str = None) -> str:
     """Get sleep summary for the last N days.
     
+    The average always covers the whole period; the nightly list is paged.
+    
     Args:
         days: Number of days to analyze (default: 7)
+        limit: Nights listed per page (default: 30, max: 500)
+        cursor: Continue from this point (printed at the end of the previous page)
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    limit = clamp_page_size(limit, 30)
+    try:
+        cursor_date, cursor_id = parse_history_cursor(cursor)
+    except ValueError:
+        return "⚠️ Invalid cursor. Use the cursor printed by the previous page."
     
-    cursor.execute("""
-        SELECT date, sleep_time, wake_time, hours, quality
-        FROM sleep_log
+    conn = get_connection()
+    db = conn.cursor()
+    
+    db.execute("""
+        SELECT COUNT(*), AVG(hours) FROM sleep_log
         WHERE date >= date('now', '-' || ? || ' days')
-        ORDER BY date DESC
     """, (days,))
+    nights, avg_hours = db.fetchone()
     
-    logs = cursor.fetchall()
-    conn.close()
-    
-    if not logs:
+    if not nights:
+        conn.close()
         return f"No sleep data found for the last {days} days."
     
-    result = f"😴 Sleep Summary for Last {days} Days:\n\n"
-    total_hours = 0
+    # Keyset on (date, id) so nights logged on the same date page stably
+    db.execute("""
+        SELECT id, date, sleep_time, wake_time, hours, quality
+        FROM sleep_log
+        WHERE date >= date('now', '-' || ? || ' days') AND (date, id) < (?, ?)
+        ORDER BY date DESC, id DESC
+        LIMIT ?
+    """, (days, cursor_date, cursor_id, limit + 1))
     
-    for date, sleep, wake, hours, quality in logs:
+    result = f"😴 Sleep Summary for Last {days} Days:\n\n"
+    last_key = None
+    for i, (row_id, date, sleep, wake, hours, quality) in enumerate(iter_rows(db)):
+        if i == limit:
+            result += f"\n📄 More nights: get_sleep_summary(days={days}, limit={limit}, cursor=\"{last_key}\")\n"
+            break
         quality_emoji = {"excellent": "✨", "good": "😊", "fair": "😐", "poor": "😞"}.get(quality, "")
         result += f"{date}: {sleep} → {wake} ({hours:.1f}h) {quality_emoji}\n"
-        total_hours += hours
+        last_key = history_cursor(date, row_id)
+    conn.close()
     
-    avg_hours = total_hours / len(logs)
     result += f"\n📊 Average: {avg_hours:.1f} hours/night\n"
     
     if avg_hours >= 7 and avg_hours <= 9:
@@ -613,7 +2884,7 @@ def get_sleep_summary(days: int = 7) -> str:
 
 # ==== WEIGHT TRACKING TOOLS ====
 
-@mcp.tool()
+@db_tool
 def log_weight(weight_kg: float, date: str = None, notes: str = "") -> str:
     """Log your weight for tracking progress.
     
@@ -624,18 +2895,15 @@ def log_weight(weight_kg: float, date: str = None, notes: str = "") -> str:
     """
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
+    try:
+        date = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")  # "2025-1-6" -> "2025-01-06"
+    except ValueError:
+        return "⚠️ Dates must be in YYYY-MM-DD format."
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute("""
-        INSERT INTO weight_log (date, weight_kg, notes)
-        VALUES (?, ?, ?)
-    """, (date, weight_kg, notes))
-    
-    conn.commit()
-    
-    # Get weight trend
+    # Previous entry, for the change shown below
     cursor.execute("""
         SELECT weight_kg FROM weight_log
         WHERE date < ?
@@ -645,6 +2913,16 @@ def log_weight(weight_kg: float, date: str = None, notes: str = "") -> str:
     prev = cursor.fetchone()
     conn.close()
     
+    def write(cursor):
+        cursor.execute("""
+            INSERT INTO weight_log (date, weight_kg, notes)
+            VALUES (?, ?, ?)
+        """, (date, weight_kg, notes))
+        add_to_daily_totals(cursor, date, weight_kg=weight_kg)
+        sync_weight_trend(cursor)
+        bump_table_versions(cursor, "weight_log", "daily_totals")
+    run_write(write)
+    
     result = f"✓ Weight logged: {weight_kg} kg on {date}"
     if prev:
         diff = weight_kg - prev[0]
@@ -657,35 +2935,75 @@ def log_weight(weight_kg: float, date: str = None, notes: str = "") -> str:
     
     return result
 
-@mcp.tool()
-def get_weight_trend(days: int = 30) -> str:
-    """Get weight trend over time.
+@db_tool(reads=("weight_log", "user_profile"))
+def get_weight_trend(days: int = 30, limit: int = 30, cursor: str = None) -> str:
+    """Get weight trend over time - smoothed weight, moving averages, rate and goal projection.
+    
+    The overall change and trend always cover the whole period; the entry list is paged.
     
     Args:
         days: Number of days to analyze (default: 30)
+        limit: Entries listed per page (default: 30, max: 500)
+        cursor: Continue from this point (printed at the end of the previous page)
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    limit = clamp_page_size(limit, 30)
+    try:
+        cursor_date, cursor_id = parse_history_cursor(cursor)
+    except ValueError:
+        return "⚠️ Invalid cursor. Use the cursor printed by the previous page."
     
-    cursor.execute("""
+    conn = get_connection()
+    db = conn.cursor()
+    
+    # Newest and oldest entries of the window, both straight off the index
+    db.execute("""
         SELECT date, weight_kg FROM weight_log
         WHERE date >= date('now', '-' || ? || ' days')
-        ORDER BY date DESC
+        ORDER BY date DESC, id DESC LIMIT 1
     """, (days,))
+    newest = db.fetchone()
     
-    logs = cursor.fetchall()
-    conn.close()
-    
-    if not logs:
+    if not newest:
+        conn.close()
         return f"No weight data found for the last {days} days."
     
-    result = f"⚖️ Weight Trend (Last {days} Days):\n\n"
+    db.execute("""
+        SELECT weight_kg FROM weight_log
+        WHERE date >= date('now', '-' || ? || ' days')
+        ORDER BY date, id LIMIT 1
+    """, (days,))
+    oldest = db.fetchone()[0]
+    db.execute(WEIGHT_FIT_QUERY, (days,))
+    entries, *fit_sums = db.fetchone()
+    db.execute(WEIGHT_AVERAGES_QUERY, (newest[0],))
+    ma7, ma30 = db.fetchone()
+    
+    db.execute("""
+        SELECT id, date, weight_kg FROM weight_log
+        WHERE date >= date('now', '-' || ? || ' days') AND (date, id) < (?, ?)
+        ORDER BY date DESC, id DESC
+        LIMIT ?
+    """, (days, cursor_date, cursor_id, limit + 1))
     
-    for date, weight in logs:
+    result = f"⚖️ Weight Trend (Last {days} Days):\n\n"
+    last_key = None
+    for i, (row_id, date, weight) in enumerate(iter_rows(db)):
+        if i == limit:
+            result += f"\n📄 More entries: get_weight_trend(days={days}, limit={limit}, cursor=\"{last_key}\")\n"
+            break
         result += f"{date}: {weight:.1f} kg\n"
+        last_key = history_cursor(date, row_id)
+    
+    # Kept current by the write paths; only weight rows without a usable date leave it unset
+    db.execute("SELECT trend_kg FROM weight_trend WHERE id = 1")
+    state = db.fetchone()
+    trend_kg = state[0] if state else newest[1]
+    db.execute("SELECT target_weight_kg FROM user_profile ORDER BY id DESC LIMIT 1")
+    profile = db.fetchone()
+    conn.close()
     
-    if len(logs) >= 2:
-        change = logs[0][1] - logs[-1][1]
+    if entries >= 2:
+        change = newest[1] - oldest
         result += f"\n📊 Overall change: "
         if change > 0:
             result += f"+{change:.1f} kg (gained)"
@@ -693,12 +3011,32 @@ def get_weight_trend(days: int = 30) -> str:
             result += f"{change:.1f} kg (lost)"
         else:
             result += "No change"
+        result += "\n"
+    
+    slope = regression_slope(entries, *fit_sums)
+    
+    result += f"\n📉 Trend:\n"
+    result += f"  Smoothed weight: {trend_kg:.1f} kg\n"
+    if ma30 is not None:  # None when the newest date isn't YYYY-MM-DD (hand edits)
+        result += f"  7-day average: {ma7:.1f} kg | 30-day average: {ma30:.1f} kg\n"
+    if slope is not None:
+        result += f"  Rate: {slope * 7:+.2f} kg/week (linear fit over {days} days)\n"
+    target = profile[0] if profile else None
+    if target:
+        from_day = weight_day(newest[0]) or datetime.now().toordinal()
+        goal_date = project_goal_date(trend_kg, slope, target, from_day)
+        if abs(target - trend_kg) < 0.05:
+            result += f"  🎯 At target ({target:.1f} kg)\n"
+        elif goal_date:
+            result += f"  🎯 Target {target:.1f} kg around {goal_date:%Y-%m-%d} at this rate\n"
+        else:
+            result += f"  🎯 Target {target:.1f} kg: not reached at the current rate\n"
     
     return result
 
 # ==== USER PROFILE & GOALS ====
 
-@mcp.tool()
+@db_tool
 def set_user_profile(height_m: float = None, target_weight_kg: float = None, 
                      daily_calorie_goal: float = None, activity_level: str = None,
                      region: str = None, dietary_preferences: str = None) -> str:
@@ -712,7 +3050,7 @@ def set_user_profile(height_m: float = None, target_weight_kg: float = None,
         region: Your region (e.g., "India", "USA", "Europe")
         dietary_preferences: e.g., "vegetarian", "vegan", "no-restrictions"
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Check if profile exists
@@ -755,15 +3093,16 @@ def set_user_profile(height_m: float = None, target_weight_kg: float = None,
             VALUES (?, ?, ?, ?, ?, ?)
         """, (height_m, target_weight_kg, daily_calorie_goal, activity_level, region, dietary_preferences))
     
+    bump_table_versions(cursor, "user_profile")
     conn.commit()
     conn.close()
     
     return f"✓ Profile updated successfully!\n  Height: {height_m}m\n  Target: {target_weight_kg}kg\n  Calorie Goal: {daily_calorie_goal} kcal\n  Activity: {activity_level}\n  Region: {region}\n  Diet: {dietary_preferences}"
 
-@mcp.tool()
+@db_tool(reads=("user_profile",))
 def get_user_profile() -> str:
     """Get current user profile and goals."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("SELECT * FROM user_profile ORDER BY id DESC LIMIT 1")
@@ -788,10 +3127,15 @@ def get_user_profile() -> str:
 
 # ==== SMART RECOMMENDATIONS ====
 
-@mcp.tool()
+@db_tool(reads=("user_profile", "daily_totals", "food_routines", "user_pantry", "food_database"))
 def recommend_foods(meal_type: str = "lunch", pantry_only: bool = False) -> str:
     """Recommend foods based on daily calorie goal, what you've eaten today, and your region.
     
+    Searches the whole food database for combinations and portions that hit the
+    meal's calorie target and a balanced macro split, skipping foods your
+    dietary preferences rule out and favouring your usual foods for this meal,
+    your pantry and your region.
+    
     Args:
         meal_type: "breakfast", "lunch", "dinner", or "snack"
         pantry_only: If True, only recommend from foods in your pantry
@@ -800,7 +3144,7 @@ def recommend_foods(meal_type: str = "lunch", pantry_only: bool = False) -> str:
     if pantry_only:
         return recommend_from_pantry(meal_type)
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Get user profile
@@ -815,99 +3159,69 @@ def recommend_foods(meal_type: str = "lunch", pantry_only: bool = False) -> str:
     
     # Get today's consumption
     today = datetime.now().strftime("%Y-%m-%d")
-    cursor.execute("""
-        SELECT SUM(calories) FROM meals WHERE date = ?
-    """, (today,))
-    
-    consumed = cursor.fetchone()[0] or 0
+    consumed = calories_consumed(cursor, today)
     remaining = cal_goal - consumed
     
-    # Get available foods from region
-    region_lower = region.lower() if region else ""
-    
     result = f"🍽️ Food Recommendations for {meal_type.title()}:\n\n"
     result += f"📊 Today's Status:\n"
     result += f"  Goal: {cal_goal:.0f} kcal\n"
     result += f"  Consumed: {consumed:.0f} kcal\n"
     result += f"  Remaining: {remaining:.0f} kcal\n\n"
     
-    # Meal calorie targets
-    meal_targets = {
-        "breakfast": 0.25,
-        "lunch": 0.35,
-        "dinner": 0.30,
-        "snack": 0.10
-    }
-    
-    target_calories = cal_goal * meal_targets.get(meal_type, 0.30)
+    target_calories = cal_goal * MEAL_TARGETS.get(meal_type, 0.30)
     result += f"🎯 Target for {meal_type}: ~{target_calories:.0f} kcal\n\n"
     
-    # Region-based recommendations
-    if "india" in region_lower:
-        recommendations = {
-            "breakfast": [
-                ("idli:150, sambar:100", "Light and healthy South Indian"),
-                ("oatmeal:50, banana:100, almonds:10", "Nutritious balanced meal"),
-                ("chapati:2, curd:100, dal:50", "Traditional North Indian"),
-            ],
-            "lunch": [
-                ("brown rice:150, dal:100, chicken breast:100", "High protein balanced meal"),
-                ("roti:3, paneer:80, spinach:100", "Vegetarian protein-rich"),
-                ("white rice:150, dal:100, curd:100", "Light vegetarian meal"),
-            ],
-            "dinner": [
-                ("chapati:2, dal:100, spinach:50", "Light dinner"),
-                ("brown rice:100, chicken breast:120, broccoli:80", "Protein-focused"),
-                ("idli:100, sambar:100", "Light South Indian"),
-            ],
-            "snack": [
-                ("banana:100", "Quick energy"),
-                ("almonds:20", "Healthy fats"),
-                ("apple:150", "Low calorie fruit"),
-            ]
-        }
-    else:
-        recommendations = {
-            "breakfast": [
-                ("oatmeal:60, banana:100, almonds:10", "Balanced breakfast"),
-                ("eggs:100, brown rice:80", "High protein"),
-                ("greek yogurt:150, banana:100", "Quick and healthy"),
-            ],
-            "lunch": [
-                ("chicken breast:150, brown rice:150, broccoli:100", "Balanced lunch"),
-                ("salmon:120, sweet potato:150, spinach:80", "Omega-3 rich"),
-                ("pasta:100, chicken breast:100, spinach:50", "Moderate carbs"),
-            ],
-            "dinner": [
-                ("chicken breast:120, sweet potato:100, broccoli:80", "Light dinner"),
-                ("salmon:100, brown rice:100, spinach:100", "Healthy fats"),
-                ("eggs:100, avocado:50, spinach:80", "Low carb option"),
-            ],
-            "snack": [
-                ("banana:100", "Quick snack"),
-                ("almonds:20", "Healthy fats"),
-                ("apple:150, almonds:10", "Fruit & nuts"),
-            ]
-        }
-    
-    meal_options = recommendations.get(meal_type, recommendations["lunch"])
+    # Foods to favour: usual ones for this meal, what's in the pantry, regional staples
+    periods = MEAL_ROUTINE_PERIODS.get(meal_type, ("midday", "afternoon"))
+    cursor.execute(f"""
+        SELECT food_name, MAX(preference_score) FROM food_routines
+        WHERE {" OR ".join(f"{period} = 1" for period in periods)}
+        GROUP BY food_name
+    """)
+    routine_foods = dict(cursor.fetchall())
+    cursor.execute("SELECT food_name FROM user_pantry WHERE available = 1")
+    pantry_foods = {row[0] for row in cursor.fetchall()}
+    conn.close()
+    
+    region_lower = region.lower() if region else ""
+    regional = next((foods for key, foods in REGIONAL_FOODS.items() if key in region_lower),
+                    DEFAULT_REGIONAL_FOODS)
+    preferred = {}
+    for name in regional:
+        preferred[name] = 0.02
+    for name in pantry_foods:
+        preferred[name] = preferred.get(name, 0) + 0.03
+    for name, score in routine_foods.items():
+        preferred[name] = preferred.get(name, 0) + 0.01 * (score or 5)
+    
+    foods, matrix = get_food_catalog().nutrient_matrix()
+    plans = plan_meals(foods, matrix, target_calories, meal_type, diet_filter(diet_pref), preferred)
+    
+    if not plans:
+        result += "⚠️ No combinations fit your preferences. Add foods with add_food_to_database().\n"
+        return result
     
     result += "Suggested meals:\n\n"
-    for i, (meal, desc) in enumerate(meal_options, 1):
-        result += f"{i}. {desc}:\n"
+    for i, (_, plan) in enumerate(plans, 1):
+        totals = [sum(foods[name][k] * grams / 100 for name, grams in plan) for k in range(4)]
+        meal = ", ".join(f"{name}:{grams:.0f}" for name, grams in plan)
+        tags = "".join(tag for tag, chosen in (
+            (" 🔁 usual", any(name in routine_foods for name, _ in plan)),
+            (" 🥫 in pantry", any(name in pantry_foods for name, _ in plan)),
+        ) if chosen)
+        result += f"{i}. {totals[0]:.0f} kcal | P:{totals[1]:.0f}g C:{totals[2]:.0f}g F:{totals[3]:.0f}g{tags}\n"
         result += f"   Foods: {meal}\n"
         result += f"   💡 Use: log_meal(\"{meal}\")\n\n"
     
     if remaining < 500 and meal_type != "snack":
         result += "⚠️ Low remaining calories! Consider lighter options or adjust your goal.\n"
     
-    conn.close()
     return result
 
-@mcp.tool()
+@db_tool(reads=("user_profile", "weight_log", "sleep_log"))
 def recommend_exercise() -> str:
     """Recommend exercises based on your activity level, sleep, and goals to stay healthy and energetic."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Get user profile
@@ -991,7 +3305,14 @@ def recommend_exercise() -> str:
     
     return result
 
-@mcp.tool()
+# Estimate calories burned (rough estimates)
+EXERCISE_CALORIE_RATES = {
+    "light": 3,      # 3 cal/min
+    "moderate": 6,   # 6 cal/min
+    "intense": 10    # 10 cal/min
+}
+
+@db_tool
 def log_exercise(exercise_name: str, duration_minutes: float, intensity: str = "moderate", date: str = None) -> str:
     """Log your exercise/workout.
     
@@ -1004,30 +3325,22 @@ def log_exercise(exercise_name: str, duration_minutes: float, intensity: str = "
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
     
-    # Estimate calories burned (rough estimates)
-    calorie_rates = {
-        "light": 3,      # 3 cal/min
-        "moderate": 6,   # 6 cal/min
-        "intense": 10    # 10 cal/min
-    }
-    
-    rate = calorie_rates.get(intensity, 6)
+    rate = EXERCISE_CALORIE_RATES.get(intensity, 6)
     calories_burned = duration_minutes * rate
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO exercise_log (date, exercise_name, duration_minutes, intensity, calories_burned)
-        VALUES (?, ?, ?, ?, ?)
-    """, (date, exercise_name, duration_minutes, intensity, calories_burned))
-    
-    conn.commit()
-    conn.close()
+    def write(cursor):
+        cursor.execute("""
+            INSERT INTO exercise_log (date, exercise_name, duration_minutes, intensity, calories_burned)
+            VALUES (?, ?, ?, ?, ?)
+        """, (date, exercise_name, duration_minutes, intensity, calories_burned))
+        add_to_daily_totals(cursor, date, exercise_calories=calories_burned,
+                            exercise_minutes=duration_minutes)
+        bump_table_versions(cursor, "exercise_log", "daily_totals")
+    run_write(write)
     
     return f"✓ Exercise logged!\n  {exercise_name.title()}: {duration_minutes} min ({intensity})\n  🔥 Estimated calories burned: ~{calories_burned:.0f} kcal"
 
-@mcp.tool()
+@db_tool(reads=("daily_totals", "sleep_log", "exercise_log"))
 def get_daily_summary(date: str = None) -> str:
     """Get complete health summary for a day - meals, sleep, exercise, weight.
     
@@ -1037,19 +3350,16 @@ def get_daily_summary(date: str = None) -> str:
     if date is None:
         date = datetime.now().strftime("%Y-%m-%d")
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     result = f"📅 Health Summary for {date}\n"
     result += "=" * 50 + "\n\n"
     
-    # Meals
-    cursor.execute("""
-        SELECT SUM(calories), SUM(protein), SUM(carbs), SUM(fats)
-        FROM meals WHERE date = ?
-    """, (date,))
+    totals, sleep_data, exercises = read_day(cursor, date)
+    conn.close()
     
-    meal_data = cursor.fetchone()
+    meal_data = totals[:4] if totals else None
     if meal_data and meal_data[0]:
         cal, protein, carbs, fats = meal_data
         result += f"🍽️ NUTRITION:\n"
@@ -1059,12 +3369,6 @@ def get_daily_summary(date: str = None) -> str:
         result += "🍽️ NUTRITION: No meals logged\n\n"
     
     # Sleep
-    cursor.execute("""
-        SELECT sleep_time, wake_time, hours, quality
-        FROM sleep_log WHERE date = ?
-    """, (date,))
-    
-    sleep_data = cursor.fetchone()
     if sleep_data:
         sleep, wake, hours, quality = sleep_data
         result += f"😴 SLEEP:\n"
@@ -1073,45 +3377,96 @@ def get_daily_summary(date: str = None) -> str:
     else:
         result += "😴 SLEEP: Not logged\n\n"
     
-    # Exercise
-    cursor.execute("""
-        SELECT exercise_name, duration_minutes, calories_burned
-        FROM exercise_log WHERE date = ?
-    """, (date,))
-    
-    exercises = cursor.fetchall()
+    # Exercise (summed from the rows if daily_totals lacks the day, e.g. after a hand edit)
+    burned = totals[4] if totals else sum(cal for _, _, cal in exercises)
     if exercises:
         result += "💪 EXERCISE:\n"
-        total_cal_burned = 0
         for name, duration, cal in exercises:
             result += f"  • {name.title()}: {duration:.0f} min (~{cal:.0f} kcal)\n"
-            total_cal_burned += cal
-        result += f"  Total burned: ~{total_cal_burned:.0f} kcal\n\n"
+        result += f"  Total burned: ~{burned:.0f} kcal\n\n"
     else:
         result += "💪 EXERCISE: No exercise logged\n\n"
     
-    # Weight
-    cursor.execute("""
-        SELECT weight_kg FROM weight_log WHERE date = ?
-    """, (date,))
-    
-    weight_data = cursor.fetchone()
-    if weight_data:
-        result += f"⚖️ WEIGHT: {weight_data[0]:.1f} kg\n\n"
+    # Weight
+    if totals and totals[5] is not None:
+        result += f"⚖️ WEIGHT: {totals[5]:.1f} kg\n\n"
     else:
         result += "⚖️ WEIGHT: Not logged\n\n"
     
     # Net calories
     if meal_data and meal_data[0] and exercises:
-        net_cal = meal_data[0] - sum(e[2] for e in exercises)
+        net_cal = meal_data[0] - burned
         result += f"📊 NET CALORIES: {net_cal:.0f} kcal\n"
     
+    return result
+
+@db_tool(reads=("daily_totals",))
+def get_range_summary(start_date: str, end_date: str = None) -> str:
+    """Get a day-by-day health dashboard for a date range - calories, exercise, sleep, weight.
+    
+    Args:
+        start_date: First day in YYYY-MM-DD format
+        end_date: Last day in YYYY-MM-DD format (default: today)
+    
+    Example: get_range_summary("2025-01-01", "2025-03-31") - one line per day plus averages
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        return "⚠️ Dates must be in YYYY-MM-DD format."
+    span = (end - start).days + 1
+    if span < 1:
+        return "⚠️ end_date must not be before start_date."
+    if span > MAX_PAGE_SIZE:
+        return f"⚠️ Ranges are limited to {MAX_PAGE_SIZE} days; split longer periods."
+    start_date, end_date = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(RANGE_SUMMARY_QUERY, (start_date, end_date))
+    days = cursor.fetchall()
     conn.close()
+    
+    result = f"📅 Health Summary {start_date} → {end_date} ({span} days)\n"
+    result += "=" * 50 + "\n"
+    meal_days, calories, burned, workouts, sleep, weights = 0, 0, 0, 0, [], []
+    for date, cal, protein, meal_items, ex_cal, ex_min, sleep_hours, weight in days:
+        parts = []
+        if meal_items:
+            meal_days += 1
+            calories += cal
+            parts.append(f"🍽️ {cal:.0f} kcal P:{protein:.0f}g")
+        if ex_min:
+            workouts += 1
+            burned += ex_cal
+            parts.append(f"💪 {ex_min:.0f} min ~{ex_cal:.0f} kcal")
+        if sleep_hours is not None:
+            sleep.append(sleep_hours)
+            parts.append(f"😴 {sleep_hours:.1f}h")
+        if weight is not None:
+            weights.append(weight)
+            parts.append(f"⚖️ {weight:.1f} kg")
+        result += f"{date}: {' | '.join(parts) if parts else 'nothing logged'}\n"
+    
+    result += f"\n📊 Over {span} days:\n"
+    if meal_days:
+        result += f"  Calories: {calories / meal_days:.0f} kcal/day ({meal_days} days logged)\n"
+    result += f"  Exercise: {workouts} active days, ~{burned:.0f} kcal burned\n"
+    if sleep:
+        result += f"  Sleep: {sum(sleep) / len(sleep):.1f} h/night ({len(sleep)} nights)\n"
+    if len(weights) >= 2:
+        result += f"  Weight: {weights[0]:.1f} → {weights[-1]:.1f} kg ({weights[-1] - weights[0]:+.1f} kg)\n"
+    elif weights:
+        result += f"  Weight: {weights[0]:.1f} kg\n"
+    
     return result
 
 # ==== PANTRY MANAGEMENT TOOLS ====
 
-@mcp.tool()
+@db_tool
 def add_to_pantry(food_name: str, quantity_grams: float = None, notes: str = "") -> str:
     """Add food to your available pantry inventory.
     
@@ -1122,15 +3477,13 @@ def add_to_pantry(food_name: str, quantity_grams: float = None, notes: str = "")
     
     Example: add_to_pantry("chicken breast", 500, "in freezer")
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     # Verify food exists in database
-    cursor.execute("SELECT name FROM food_database WHERE name = ?", (food_name.lower(),))
-    if not cursor.fetchone():
-        conn.close()
+    if food_name.lower() not in get_food_catalog().foods():
         return f"⚠️ '{food_name}' not in food database. Add it first with add_food_to_database()"
     
+    conn = get_connection()
+    cursor = conn.cursor()
+    
     # Check if already in pantry
     cursor.execute("SELECT id FROM user_pantry WHERE food_name = ?", (food_name.lower(),))
     existing = cursor.fetchone()
@@ -1156,15 +3509,16 @@ def add_to_pantry(food_name: str, quantity_grams: float = None, notes: str = "")
     if notes:
         result += f"\n  Notes: {notes}"
     
+    bump_table_versions(cursor, "user_pantry")
     conn.commit()
     conn.close()
     return result
 
 
-@mcp.tool()
+@db_tool
 def remove_from_pantry(food_name: str) -> str:
     """Remove food from your pantry (mark as unavailable)."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("DELETE FROM user_pantry WHERE food_name = ?", (food_name.lower(),))
@@ -1174,15 +3528,16 @@ def remove_from_pantry(food_name: str) -> str:
     else:
         result = f"⚠️ '{food_name}' was not in your pantry"
     
+    bump_table_versions(cursor, "user_pantry")
     conn.commit()
     conn.close()
     return result
 
 
-@mcp.tool()
+@db_tool(reads=("user_pantry", "food_database"))
 def list_my_pantry() -> str:
     """List all foods currently in your pantry with quantities and notes."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("""
@@ -1214,7 +3569,7 @@ def list_my_pantry() -> str:
     return result
 
 
-@mcp.tool()
+@db_tool(reads=("user_profile", "daily_totals", "user_pantry", "food_database"))
 def recommend_from_pantry(meal_type: str = "lunch") -> str:
     """Recommend meals using ONLY foods available in your pantry.
     
@@ -1222,12 +3577,11 @@ def recommend_from_pantry(meal_type: str = "lunch") -> str:
         meal_type: "breakfast", "lunch", "dinner", or "snack"
     
     This considers:
-    - Only foods in your pantry
-    - Your calorie goals and what you've eaten today
-    - Your region preferences
-    - Available quantities (warns if insufficient)
+    - Only foods in your pantry (any combination of up to 3)
+    - Your calorie goals, what you've eaten today and a balanced macro split
+    - Available quantities (portions never exceed what you have)
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Get user profile
@@ -1242,8 +3596,7 @@ def recommend_from_pantry(meal_type: str = "lunch") -> str:
     
     # Get today's consumption
     today = datetime.now().strftime("%Y-%m-%d")
-    cursor.execute("SELECT SUM(calories) FROM meals WHERE date = ?", (today,))
-    consumed = cursor.fetchone()[0] or 0
+    consumed = calories_consumed(cursor, today)
     remaining = cal_goal - consumed
     
     # Get available pantry foods
@@ -1262,70 +3615,41 @@ def recommend_from_pantry(meal_type: str = "lunch") -> str:
     result = f"🍽️ Meal Recommendations from YOUR PANTRY ({meal_type.title()}):\n\n"
     result += f"📊 Today: {consumed:.0f}/{cal_goal:.0f} kcal consumed, {remaining:.0f} remaining\n\n"
     
-    # Meal calorie targets
-    meal_targets = {
-        "breakfast": 0.25,
-        "lunch": 0.35,
-        "dinner": 0.30,
-        "snack": 0.10
-    }
-    target_cal = cal_goal * meal_targets.get(meal_type, 0.30)
+    # The usual share of the day, or what's left of it if that's less
+    target_cal = min(cal_goal * MEAL_TARGETS.get(meal_type, 0.30), max(remaining, MIN_MEAL_CALORIES))
     result += f"🎯 Target for {meal_type}: ~{target_cal:.0f} kcal\n\n"
     
     result += "Available ingredients:\n"
-    for food, qty in pantry_items:
+    for food, qty in pantry_items[:PANTRY_LISTED_ITEMS]:
         result += f"  • {food.title()}"
         if qty:
             result += f" ({qty}g)"
         result += "\n"
+    if len(pantry_items) > PANTRY_LISTED_ITEMS:
+        result += f"  … and {len(pantry_items) - PANTRY_LISTED_ITEMS} more (list_my_pantry())\n"
     
     result += "\n💡 Suggested combinations:\n\n"
     
-    # Generate meal combinations based on available foods
-    foods_dict = {food: qty for food, qty in pantry_items}
-    suggestions = []
-    
-    # Smart combination logic
-    if "chicken breast" in foods_dict and "brown rice" in foods_dict:
-        suggestions.append(("Protein Bowl", "chicken breast:150, brown rice:150", 
-                           "High protein balanced meal"))
-    
-    if "eggs" in foods_dict and "spinach" in foods_dict:
-        suggestions.append(("Healthy Omelette", "eggs:100, spinach:50",
-                           "Quick protein-rich option"))
-    
-    if "roti" in foods_dict and "dal" in foods_dict:
-        suggestions.append(("Traditional Indian", "roti:120, dal:100",
-                           "Balanced vegetarian meal"))
-    
-    if "oatmeal" in foods_dict:
-        banana_part = ", banana:100" if "banana" in foods_dict else ""
-        suggestions.append(("Oats Bowl", f"oatmeal:50{banana_part}",
-                           "Healthy breakfast"))
-    
-    if "pasta" in foods_dict and "chicken breast" in foods_dict:
-        suggestions.append(("Chicken Pasta", "pasta:100, chicken breast:100",
-                           "Balanced protein meal"))
-    
-    if "brown rice" in foods_dict and "dal" in foods_dict:
-        suggestions.append(("Rice & Dal", "brown rice:150, dal:100",
-                           "Complete protein vegetarian"))
+    foods = get_food_catalog().foods()
+    plans = plan_pantry_meals(foods, dict(pantry_items), target_cal)
     
-    if not suggestions:
+    if not plans:
         result += "⚠️ Not enough variety for meal suggestions.\n"
         result += "Try combining what you have or add more foods to pantry!"
     else:
-        for i, (name, foods, desc) in enumerate(suggestions, 1):
-            result += f"{i}. {name}: {desc}\n"
-            result += f"   Foods: {foods}\n"
-            result += f"   💡 Use: log_meal(\"{foods}\")\n\n"
+        for i, (_, plan) in enumerate(plans, 1):
+            totals = [sum(foods[name][k] * grams / 100 for name, grams in plan) for k in range(4)]
+            meal = ", ".join(f"{name}:{grams:.0f}" for name, grams in plan)
+            result += f"{i}. {totals[0]:.0f} kcal | P:{totals[1]:.0f}g C:{totals[2]:.0f}g F:{totals[3]:.0f}g\n"
+            result += f"   Foods: {meal}\n"
+            result += f"   💡 Use: log_meal(\"{meal}\")\n\n"
     
     return result
 
 
 # ==================== FOOD ROUTINES MANAGEMENT ====================
 
-@mcp.tool()
+@db_tool
 def add_to_food_routine(
     food_name: str,
     morning: bool = False,
@@ -1358,15 +3682,13 @@ def add_to_food_routine(
     
     Example: add_to_food_routine("maggie", evening=True, preparation="quick", effort="easy", portion=50)
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
     # Verify food exists in database
-    cursor.execute("SELECT name FROM food_database WHERE name = ?", (food_name.lower(),))
-    if not cursor.fetchone():
-        conn.close()
+    if food_name.lower() not in get_food_catalog().foods():
         return f"⚠️ '{food_name}' not in food database. Add it first with add_food_to_database()"
     
+    conn = get_connection()
+    cursor = conn.cursor()
+    
     # Check if already in routines
     cursor.execute("SELECT id FROM food_routines WHERE food_name = ?", (food_name.lower(),))
     existing = cursor.fetchone()
@@ -1412,15 +3734,16 @@ def add_to_food_routine(
     result += f"\n  Portion: {typical_portion_grams}g"
     result += f"\n  Preference: {preference_score}/10"
     
+    bump_table_versions(cursor, "food_routines")
     conn.commit()
     conn.close()
     return result
 
 
-@mcp.tool()
+@db_tool
 def remove_from_food_routine(food_name: str) -> str:
     """Remove food from your routines."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute("DELETE FROM food_routines WHERE food_name = ?", (food_name.lower(),))
@@ -1430,25 +3753,27 @@ def remove_from_food_routine(food_name: str) -> str:
     else:
         result = f"⚠️ '{food_name}' was not in your routines"
     
+    bump_table_versions(cursor, "food_routines")
     conn.commit()
     conn.close()
     return result
 
 
-@mcp.tool()
+@db_tool(reads=("food_routines", "food_database"))
 def view_food_routines(time_period: str = "all") -> str:
     """View your food routines by time period.
     
     Args:
         time_period: 'all', 'morning', 'midday', 'afternoon', 'evening', 'night', 'latenight'
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     if time_period == "all":
         cursor.execute("""
             SELECT r.food_name, r.morning, r.midday, r.afternoon, r.evening, r.night, r.latenight,
-                   r.preparation_type, r.effort_level, r.typical_portion_grams, r.preference_score,
+                   r.preparation_type, COALESCE(r.effort_level, 'easy'),
+                   COALESCE(r.typical_portion_grams, 100), r.preference_score,
                    f.calories, f.protein, f.carbs, f.fats
             FROM food_routines r
             JOIN food_database f ON r.food_name = f.name
@@ -1458,8 +3783,8 @@ def view_food_routines(time_period: str = "all") -> str:
         # Filter by specific time period
         time_col = time_period.lower()
         cursor.execute(f"""
-            SELECT r.food_name, r.preparation_type, r.effort_level, r.typical_portion_grams,
-                   r.preference_score, r.notes,
+            SELECT r.food_name, r.preparation_type, COALESCE(r.effort_level, 'easy'),
+                   COALESCE(r.typical_portion_grams, 100), r.preference_score, r.notes,
                    f.calories, f.protein, f.carbs, f.fats
             FROM food_routines r
             JOIN food_database f ON r.food_name = f.name
@@ -1501,7 +3826,7 @@ def view_food_routines(time_period: str = "all") -> str:
     return result
 
 
-@mcp.tool()
+@db_tool
 def recommend_from_routines(
     time_period: str = "current",
     filter_by_effort: str = "all",
@@ -1521,7 +3846,7 @@ def recommend_from_routines(
     - Your preference scores
     - What's in your pantry (if include_pantry=True)
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Auto-detect time period if "current"
@@ -1552,16 +3877,15 @@ def recommend_from_routines(
     
     # Get today's consumption
     today = datetime.now().strftime("%Y-%m-%d")
-    cursor.execute("SELECT SUM(calories) FROM meals WHERE date = ?", (today,))
-    consumed = cursor.fetchone()[0] or 0
+    consumed = calories_consumed(cursor, today)
     remaining = cal_goal - consumed
     
     # Get routines for this time period
     time_col = time_period.lower()
     if filter_by_effort == "all":
         cursor.execute(f"""
-            SELECT r.food_name, r.preparation_type, r.effort_level, r.typical_portion_grams,
-                   r.preference_score, r.notes,
+            SELECT r.food_name, r.preparation_type, COALESCE(r.effort_level, 'easy'),
+                   COALESCE(r.typical_portion_grams, 100), r.preference_score, r.notes,
                    f.calories, f.protein, f.carbs, f.fats
             FROM food_routines r
             JOIN food_database f ON r.food_name = f.name
@@ -1570,12 +3894,12 @@ def recommend_from_routines(
         """)
     else:
         cursor.execute(f"""
-            SELECT r.food_name, r.preparation_type, r.effort_level, r.typical_portion_grams,
-                   r.preference_score, r.notes,
+            SELECT r.food_name, r.preparation_type, COALESCE(r.effort_level, 'easy'),
+                   COALESCE(r.typical_portion_grams, 100), r.preference_score, r.notes,
                    f.calories, f.protein, f.carbs, f.fats
             FROM food_routines r
             JOIN food_database f ON r.food_name = f.name
-            WHERE r.{time_col} = 1 AND r.effort_level = ?
+            WHERE r.{time_col} = 1 AND COALESCE(r.effort_level, 'easy') = ?
             ORDER BY r.preference_score DESC
         """, (filter_by_effort,))
     
@@ -1604,123 +3928,1580 @@ def recommend_from_routines(
         "latenight": "🌃"
     }
     
-    result = f"{time_emoji.get(time_period, '🍽️')} {time_period.title()} Food Options:\n\n"
-    result += f"📊 Today: {consumed:.0f}/{cal_goal:.0f} kcal | Remaining: {remaining:.0f} kcal\n\n"
+    result = f"{time_emoji.get(time_period, '🍽️')} {time_period.title()} Food Options:\n\n"
+    result += f"📊 Today: {consumed:.0f}/{cal_goal:.0f} kcal | Remaining: {remaining:.0f} kcal\n\n"
+    
+    if not routine_items and not pantry_items:
+        result += f"⚠️ No routines set for {time_period}!\n"
+        result += "💡 Add foods with: add_to_food_routine()\n"
+        result += "💡 Or add to pantry with: add_to_pantry()"
+        return result
+    
+    # Group by effort level
+    if routine_items:
+        result += "**Your Usual Options:**\n\n"
+        
+        effort_groups = {"easy": [], "medium": [], "hard": []}
+        for food, prep, effort, portion, pref, notes, cal, prot, carbs, fats in routine_items:
+            if effort not in effort_groups:
+                effort = "easy"
+            effort_groups[effort].append((food, prep, portion, pref, notes, cal, prot))
+        
+        for effort_name, emoji in [("easy", "⚡"), ("medium", "🔥"), ("hard", "💪")]:
+            items = effort_groups.get(effort_name, [])
+            if items:
+                result += f"{emoji} **{effort_name.title()} Options:**\n"
+                for food, prep, portion, pref, notes, cal, prot in items:
+                    actual_cal = cal * portion / 100
+                    actual_prot = prot * portion / 100
+                    result += f"  • {food.title()} ({prep}) - {actual_cal:.0f} cal, {actual_prot:.1f}g protein\n"
+                    result += f"    {portion}g portion | ⭐{pref}/10"
+                    if notes:
+                        result += f" | {notes}"
+                    result += "\n"
+                result += "\n"
+    
+    # Add pantry suggestions
+    if pantry_items:
+        result += "**From Your Pantry:**\n"
+        for food, qty, cal, prot in pantry_items:
+            result += f"  • {food.title()}"
+            if qty:
+                result += f" ({qty}g available)"
+            result += f" - {cal}cal/100g\n"
+        result += "\n"
+    
+    # Add smart suggestion
+    result += "💡 **Smart Pick:** "
+    if routine_items:
+        best = routine_items[0]
+        food, prep, effort, portion, pref, notes, cal, prot, carbs, fats = best
+        actual_cal = cal * portion / 100
+        result += f"{food.title()} ({prep}, {effort}) = {actual_cal:.0f} cal"
+    
+    return result
+
+
+@db_tool
+def bulk_setup_routines(morning_foods: str = "", evening_foods: str = "", afternoon_foods: str = "") -> str:
+    """Quick setup multiple foods for different times at once.
+    
+    Args:
+        morning_foods: Comma-separated food names for morning (e.g., "bread,poha,paratha")
+        evening_foods: Comma-separated food names for evening (e.g., "maggie,oats,chowmein")
+        afternoon_foods: Comma-separated food names for afternoon (e.g., "roti,dal,rice")
+    
+    Example: bulk_setup_routines(morning="bread,poha,paratha", evening="maggie,oats")
+    """
+    catalog = get_food_catalog().foods()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    added = []
+    failed = []
+    
+    def add_foods(foods_str, time_col):
+        if not foods_str:
+            return
+        foods = [f.strip().lower() for f in foods_str.split(",")]
+        for food in foods:
+            if not food:
+                continue
+            # Check if food exists
+            if food not in catalog:
+                failed.append(f"{food} (not in database)")
+                continue
+            
+            # Insert or update
+            cursor.execute("SELECT id FROM food_routines WHERE food_name = ?", (food,))
+            if cursor.fetchone():
+                cursor.execute(f"UPDATE food_routines SET {time_col} = 1 WHERE food_name = ?", (food,))
+            else:
+                cursor.execute(f"""
+                    INSERT INTO food_routines (food_name, {time_col}, effort_level, typical_portion_grams)
+                    VALUES (?, 1, 'easy', 100)
+                """, (food,))
+            added.append(f"{food} ({time_col})")
+    
+    add_foods(morning_foods, "morning")
+    add_foods(afternoon_foods, "afternoon")
+    add_foods(evening_foods, "evening")
+    
+    bump_table_versions(cursor, "food_routines")
+    conn.commit()
+    conn.close()
+    
+    result = "✓ Bulk routine setup complete!\n\n"
+    if added:
+        result += f"Added {len(added)} items:\n"
+        for item in added:
+            result += f"  • {item}\n"
+    if failed:
+        result += f"\n⚠️ Failed {len(failed)} items:\n"
+        for item in failed:
+            result += f"  • {item}\n"
+        result += "\nAdd missing foods with: add_food_to_database()"
+    
+    return result
+
+
+# ==================== BULK IMPORT ====================
+
+# The only folder import_history, export_history and import_food_catalog touch.
+# With DATA_DIR every user gets their own subfolder, so nobody reads, writes or
+# overwrites files outside it (or another user's).
+EXPORT_DIR = os.environ.get("HEALTH_MCP_EXPORT_DIR")
+EXPORT_DIR = Path(EXPORT_DIR) if EXPORT_DIR else None
+
+
+def export_dir(db_path=None) -> Path:
+    """Folder the file tools may use for a database file (current shard by default)."""
+    path = Path(db_path or current_db_path())
+    if DATA_DIR is None or path.parent not in (DATA_DIR, DATA_DIR / "hashed"):
+        return EXPORT_DIR or DB_PATH.parent / "exports"
+    # Plain and hashed ids live in separate folders, like their database files
+    users = "hashed" if path.parent == DATA_DIR / "hashed" else "users"
+    return (EXPORT_DIR or DATA_DIR / "exports") / users / path.stem
+
+
+def user_file(path: str) -> Path:
+    """`path` resolved inside export_dir() (relative paths start there).
+
+    Raises PermissionError for anything that ends up outside it, including
+    through "..", "~" or symlinks.
+    """
+    root = export_dir().resolve()
+    target = (root / Path(path).expanduser()).resolve()
+    if not target.is_relative_to(root):
+        raise PermissionError(f"Files must be inside {root}")
+    return target
+
+
+# Rows listed in an import report before it switches to "... and N more"
+MAX_REPORTED_ERRORS = 20
+
+# Rows decoded and written per step, so imports of any length use flat memory
+IMPORT_CHUNK_ROWS = 10_000
+
+MEAL_INSERT = """
+    INSERT INTO meals (date, food_name, quantity_grams, calories, protein, carbs, fats, fiber, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+"""
+SLEEP_INSERT = """
+    INSERT INTO sleep_log (date, sleep_time, wake_time, hours, quality, notes)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+WEIGHT_INSERT = "INSERT INTO weight_log (date, weight_kg, notes) VALUES (?, ?, ?)"
+EXERCISE_INSERT = """
+    INSERT INTO exercise_log (date, exercise_name, duration_minutes, intensity, calories_burned)
+    VALUES (?, ?, ?, ?, ?)
+"""
+# Pantry and routine rows replace the entry for their food, like add_to_pantry/add_to_food_routine:
+# insert the missing ones, then update every row in order (the last one for a food wins)
+PANTRY_INSERT = """
+    INSERT INTO user_pantry (food_name)
+    SELECT ?1 WHERE NOT EXISTS (SELECT 1 FROM user_pantry WHERE food_name = ?1)
+"""
+PANTRY_UPDATE = """
+    UPDATE user_pantry SET available = 1, quantity_grams = ?2, notes = ?3, last_updated = CURRENT_TIMESTAMP
+    WHERE food_name = ?1
+"""
+ROUTINE_INSERT = """
+    INSERT INTO food_routines (food_name)
+    SELECT ?1 WHERE NOT EXISTS (SELECT 1 FROM food_routines WHERE food_name = ?1)
+"""
+ROUTINE_UPDATE = """
+    UPDATE food_routines
+    SET morning = ?2, midday = ?3, afternoon = ?4, evening = ?5, night = ?6, latenight = ?7,
+        preparation_type = ?8, effort_level = ?9, typical_portion_grams = ?10,
+        preference_score = ?11, notes = ?12, last_updated = CURRENT_TIMESTAMP
+    WHERE food_name = ?1
+"""
+
+# Rolled-up meal sums (see compact_history) add to what's already there
+ROLLUP_UPSERT = """
+    INSERT INTO meal_rollups (date, calories, protein, carbs, fats, fiber, meal_items)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date) DO UPDATE SET
+        calories = calories + excluded.calories,
+        protein = protein + excluded.protein,
+        carbs = carbs + excluded.carbs,
+        fats = fats + excluded.fats,
+        fiber = fiber + excluded.fiber,
+        meal_items = meal_items + excluded.meal_items
+"""
+FOOD_MONTH_UPSERT = """
+    INSERT INTO food_monthly_counts (month, food_name, items, grams, calories)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(month, food_name) DO UPDATE SET
+        items = items + excluded.items,
+        grams = grams + excluded.grams,
+        calories = calories + excluded.calories
+"""
+
+ROUTINE_PERIODS = ("morning", "midday", "afternoon", "evening", "night", "latenight")
+
+# Row types every import report lists, even at 0
+DIARY_KINDS = ("meal", "sleep", "weight", "exercise")
+
+
+def _decode_ndjson(lines):
+    """(line_number, row or None if unparseable) for [(line_number, text), ...]."""
+    # Fast path: decode every line in one C-level pass as a JSON array
+    try:
+        parsed = json.loads("[" + ",".join(line for _, line in lines) + "]")
+    except ValueError:
+        parsed = None
+    if parsed is not None and len(parsed) == len(lines):
+        yield from zip((line_no for line_no, _ in lines), parsed)
+        return
+    # Some line is malformed: decode one by one to pin errors to lines
+    for line_no, line in lines:
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, None
+
+
+def diary_rows(source, format: str = "ndjson"):
+    """Yield (line_number, row dict or None if unparseable) from NDJSON or CSV.
+
+    `source` is an open text file (or io.StringIO); NDJSON is decoded
+    IMPORT_CHUNK_ROWS lines at a time, so the whole input is never in memory.
+    """
+    if format == "csv":
+        reader = csv.DictReader(source)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    chunk = []
+    for line_no, line in enumerate(source, 1):
+        if line.strip():
+            chunk.append((line_no, line))
+            if len(chunk) >= IMPORT_CHUNK_ROWS:
+                yield from _decode_ndjson(chunk)
+                chunk = []
+    yield from _decode_ndjson(chunk)
+
+
+def _given(value) -> bool:
+    # CSV leaves absent fields as ""
+    return value is not None and value != ""
+
+
+def _flag(value) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def _text(row, field) -> str:
+    """row[field] stripped; ValueError unless it's non-empty text."""
+    value = row[field]
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{field} must be non-empty text")
+    return value.strip()
+
+
+def ingest_diary_rows(cursor, rows):
+    """Validate diary rows and write them with one executemany per table and chunk.
+
+    Foods resolve against the catalog cache (meals that carry their own
+    calories/macros don't need to) and daily_totals gets one upsert per
+    touched date. Rows are written every IMPORT_CHUNK_ROWS, so memory stays
+    flat however many there are. The caller owns the transaction. Returns
+    (counts by type, number of days touched, first MAX_REPORTED_ERRORS
+    [(line_number, error), ...], number of rows skipped).
+    """
+    catalog = get_food_catalog()
+    foods = catalog.foods()
+    pending = {kind: [] for kind in (*DIARY_KINDS, "pantry", "routine", "rollup", "food_month")}
+    counts = dict.fromkeys(pending, 0)
+    meals, sleeps, weights, exercises = pending["meal"], pending["sleep"], pending["weight"], pending["exercise"]
+    day_totals = {}
+    valid_dates = {}  # date as given -> YYYY-MM-DD
+    errors = []
+    skipped = 0
+    queued = 0
+
+    def lookup(food_name):
+        # (catalog name, nutrients) or (None, error message)
+        nutrition = foods.get(food_name)
+        if nutrition is not None:
+            return food_name, nutrition
+        match, score = catalog.match(food_name)
+        if not auto_resolves(food_name, match, score):
+            hint = f" (did you mean '{match}'?)" if match else ""
+            return None, f"'{food_name}' not found in database{hint}"
+        return match, foods.get(match) or catalog.foods()[match]
+
+    def flush():
+        cursor.executemany(MEAL_INSERT, meals)
+        cursor.executemany(SLEEP_INSERT, sleeps)
+        cursor.executemany(WEIGHT_INSERT, weights)
+        cursor.executemany(EXERCISE_INSERT, exercises)
+        if pending["pantry"]:
+            cursor.executemany(PANTRY_INSERT, [row[:1] for row in pending["pantry"]])
+            cursor.executemany(PANTRY_UPDATE, pending["pantry"])
+        if pending["routine"]:
+            cursor.executemany(ROUTINE_INSERT, [row[:1] for row in pending["routine"]])
+            cursor.executemany(ROUTINE_UPDATE, pending["routine"])
+        cursor.executemany(ROLLUP_UPSERT, pending["rollup"])
+        cursor.executemany(FOOD_MONTH_UPSERT, pending["food_month"])
+        for kind, queue in pending.items():
+            counts[kind] += len(queue)
+            queue.clear()
+
+    for line_no, row in rows:
+        error = None
+        if not isinstance(row, dict):
+            error = "not a valid JSON object"
+        else:
+            try:
+                kind = row["type"]
+                if kind == "pantry":
+                    food_name, found = lookup(_text(row, "food").lower())
+                    if food_name is None:
+                        error = found
+                    else:
+                        grams = row.get("grams")
+                        pending["pantry"].append((food_name, float(grams) if _given(grams) else None,
+                                                  row.get("notes") or ""))
+                elif kind == "routine":
+                    food_name, found = lookup(_text(row, "food").lower())
+                    if food_name is None:
+                        error = found
+                    else:
+                        grams, score = row.get("grams"), row.get("preference_score")
+                        pending["routine"].append((
+                            food_name, *(_flag(row.get(period)) for period in ROUTINE_PERIODS),
+                            row.get("preparation_type") or "", row.get("effort_level") or "easy",
+                            float(grams) if _given(grams) else 100, int(score) if _given(score) else 5,
+                            row.get("notes") or ""))
+                elif kind == "food_month":
+                    month = datetime.strptime(row["month"], "%Y-%m").strftime("%Y-%m")
+                    pending["food_month"].append((month, _text(row, "food").lower(), int(row["items"]),
+                                                  float(row.get("grams") or 0), float(row.get("calories") or 0)))
+                else:
+                    date = valid_dates.get(row["date"])
+                    if date is None:
+                        # Stored zero-padded, so day keys and date ranges line up
+                        date = datetime.strptime(row["date"], "%Y-%m-%d").strftime("%Y-%m-%d")
+                        valid_dates[row["date"]] = date
+
+                    if kind == "meal":
+                        quantity = float(row["grams"])
+                        calories = row.get("calories")
+                        if _given(calories):
+                            # Exported meals carry their nutrients; the food needn't be in this catalog
+                            food_name = _text(row, "food").lower()
+                            cal = float(calories)
+                            protein = float(row.get("protein") or 0)
+                            carbs = float(row.get("carbs") or 0)
+                            fats = float(row.get("fats") or 0)
+                            fiber = float(row.get("fiber") or 0)
+                        else:
+                            food_name, nutrition = lookup(_text(row, "food").lower())
+                            if food_name is None:
+                                error = nutrition
+                            else:
+                                multiplier = quantity / 100
+                                cal = nutrition[0] * multiplier
+                                protein = nutrition[1] * multiplier
+                                carbs = nutrition[2] * multiplier
+                                fats = nutrition[3] * multiplier
+                                fiber = nutrition[4] * multiplier
+                        if error is None:
+                            timestamp = row.get("timestamp")
+                            if not _given(timestamp):
+                                time_of_day = row.get("time")
+                                timestamp = f"{date} {time_of_day}:00" if time_of_day else None
+                            meals.append((date, food_name, quantity, cal, protein, carbs, fats, fiber, timestamp))
+                            totals = day_totals.get(date) or day_totals.setdefault(date, [0] * 8 + [None, None])
+                            totals[0] += cal
+                            totals[1] += protein
+                            totals[2] += carbs
+                            totals[3] += fats
+                            totals[4] += fiber
+                            totals[5] += 1
+                    elif kind == "sleep":
+                        sleep_time, wake_time = _text(row, "sleep_time"), _text(row, "wake_time")
+                        hours = sleep_duration_hours(sleep_time, wake_time)
+                        sleeps.append((date, sleep_time, wake_time, hours,
+                                       row.get("quality") or "good", row.get("notes") or ""))
+                        totals = day_totals.get(date) or day_totals.setdefault(date, [0] * 8 + [None, None])
+                        totals[8] = (totals[8] or 0) + hours
+                    elif kind == "weight":
+                        weight_kg = float(row["weight_kg"])
+                        weights.append((date, weight_kg, row.get("notes") or ""))
+                        totals = day_totals.get(date) or day_totals.setdefault(date, [0] * 8 + [None, None])
+                        totals[9] = weight_kg
+                    elif kind == "exercise":
+                        duration = float(row["duration_minutes"])
+                        intensity = row.get("intensity") or "moderate"
+                        burned = row.get("calories_burned")
+                        burned = float(burned) if _given(burned) else duration * EXERCISE_CALORIE_RATES.get(intensity, 6)
+                        exercises.append((date, _text(row, "exercise"), duration, intensity, burned))
+                        totals = day_totals.get(date) or day_totals.setdefault(date, [0] * 8 + [None, None])
+                        totals[6] += burned
+                        totals[7] += duration
+                    elif kind == "rollup":
+                        sums = [float(row.get(field) or 0) for field in ("calories", "protein", "carbs", "fats", "fiber")]
+                        items = int(row["meal_items"])
+                        pending["rollup"].append((date, *sums, items))
+                        totals = day_totals.get(date) or day_totals.setdefault(date, [0] * 8 + [None, None])
+                        for position, value in enumerate(sums):
+                            totals[position] += value
+                        totals[5] += items
+                    else:
+                        error = (f"unknown type '{kind}' (use meal, sleep, weight, exercise, pantry, routine, "
+                                 "rollup, food_month)")
+            except KeyError as e:
+                error = f"missing field {e}"
+            except (TypeError, ValueError, AttributeError) as e:
+                error = f"invalid value ({e})"
+
+        if error is not None:
+            skipped += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append((line_no, error))
+            continue
+        queued += 1
+        if queued >= IMPORT_CHUNK_ROWS:
+            flush()
+            queued = 0
+
+    flush()
+    cursor.executemany(DAILY_TOTALS_UPSERT, [(date, *totals) for date, totals in day_totals.items()])
+    if counts["weight"]:
+        sync_weight_trend(cursor)
+    bump_table_versions(cursor, "meals", "sleep_log", "weight_log", "exercise_log", "daily_totals",
+                        "user_pantry", "food_routines")  # meals also covers meal_rollups
+    return counts, len(day_totals), errors, skipped
+
+
+def format_row_errors(errors, skipped) -> str:
+    """Compact per-row error report for import tools."""
+    if not skipped:
+        return ""
+    result = f"\n⚠️ {skipped} rows skipped:\n"
+    for line_no, message in errors:
+        result += f"  line {line_no}: {message}\n"
+    if skipped > len(errors):
+        result += f"  ... and {skipped - len(errors)} more\n"
+    return result
+
+
+def format_import_report(counts, days, errors, skipped, elapsed) -> str:
+    imported = sum(counts.values())
+    result = f"✓ Imported {imported} rows across {days} days in {elapsed:.2f}s"
+    result += f" ({imported / elapsed:,.0f} rows/s)\n" if elapsed and imported else "\n"
+    # Pantry, routine and rollup rows only come from exports; leave them out of diary imports
+    shown = {kind: n for kind, n in counts.items() if n or kind in DIARY_KINDS}
+    result += "  " + " | ".join(f"{kind}: {n}" for kind, n in shown.items()) + "\n"
+    result += format_row_errors(errors, skipped)
+    return result
+
+
+@db_tool
+def import_diary(entries: str, format: str = "ndjson") -> str:
+    """Import many dated diary entries (meals, sleep, weight, exercise) in ONE call.
+    
+    Use this instead of repeated log_meal/log_sleep/... calls when backfilling
+    days or months of history. Everything is written in a single transaction;
+    bad rows are skipped and reported by line number. For files on disk
+    (e.g. from export_history) use import_history.
+    
+    Args:
+        entries: NDJSON (one JSON object per line) or CSV text with a header row
+        format: "ndjson" (default) or "csv"
+    
+    Fields per type (meal/sleep/weight/exercise/rollup rows need "date" as YYYY-MM-DD):
+        meal:     food, grams, optional time (HH:MM) or timestamp, optional
+                  calories, protein, carbs, fats, fiber (used instead of the catalog)
+        sleep:    sleep_time, wake_time (HH:MM), optional quality, notes
+        weight:   weight_kg, optional notes
+        exercise: exercise, duration_minutes, optional intensity (light/moderate/intense),
+                  calories_burned
+        pantry:   food, optional grams, notes (replaces the food's pantry entry)
+        routine:  food, morning/midday/afternoon/evening/night/latenight (0/1), optional
+                  preparation_type, effort_level, grams, preference_score, notes
+        rollup:   meal_items, calories, protein, carbs, fats, fiber (a day compact_history
+                  rolled up; adds to that day)
+        food_month: month (YYYY-MM), food, items, grams, calories (no date)
+    
+    Example (NDJSON):
+        {"type": "meal", "date": "2025-01-05", "food": "roti", "grams": 120}
+        {"type": "weight", "date": "2025-01-05", "weight_kg": 72.4}
+    """
+    if format not in ("ndjson", "csv"):
+        return "⚠️ Unknown format. Use 'ndjson' or 'csv'."
+    
+    start = time.perf_counter()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        counts, days, errors, skipped = ingest_diary_rows(cursor, diary_rows(io.StringIO(entries), format))
+        conn.commit()
+    except sqlite3.Error as error:
+        conn.rollback()
+        return f"⚠️ Import failed, nothing was saved: {error}"
+    finally:
+        conn.close()
+    return format_import_report(counts, days, errors, skipped, time.perf_counter() - start)
+
+
+@db_tool
+def import_history(path: str, format: str = "") -> str:
+    """Import a history file from disk (e.g. one written by export_history), streaming.
+    
+    Same rows as import_diary (meals, sleep, weight, exercise, pantry, routines, rollups),
+    read and written in chunks, so multi-million-row files use flat memory.
+    Everything is one transaction; bad rows are skipped and reported by line.
+    
+    Args:
+        path: NDJSON or CSV file in the export folder (relative paths start there)
+        format: "ndjson" or "csv" (default: from the file extension)
+    """
+    try:
+        source = user_file(path)
+    except PermissionError as error:
+        return f"⚠️ {error}"
+    if not source.is_file():
+        return f"⚠️ {source} not found"
+    format = format or ("csv" if source.suffix.lower() == ".csv" else "ndjson")
+    if format not in ("ndjson", "csv"):
+        return "⚠️ Unknown format. Use 'ndjson' or 'csv'."
+    
+    start = time.perf_counter()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        with open(source, newline="", encoding="utf-8") as f:
+            counts, days, errors, skipped = ingest_diary_rows(cursor, diary_rows(f, format))
+        conn.commit()
+    except (OSError, UnicodeDecodeError) as error:
+        conn.rollback()  # the rows read so far
+        return f"⚠️ Can't read {source}: {getattr(error, 'strerror', None) or error}"
+    except sqlite3.Error as error:
+        conn.rollback()
+        return f"⚠️ Import failed, nothing was saved: {error}"
+    finally:
+        conn.close()
+    return format_import_report(counts, days, errors, skipped, time.perf_counter() - start)
+
+
+FOOD_INSERT = """
+    INSERT OR IGNORE INTO food_database (name, calories, protein, carbs, fats, fiber)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# USDA FoodData Central nutrient ids per column, most preferred first
+FDC_NUTRIENT_IDS = {
+    "calories": ("1008", "2048", "2047"),   # Energy (kcal), then Atwater factors
+    "protein": ("1003",),
+    "carbs": ("1005", "1050"),              # by difference, then by summation
+    "fats": ("1004", "1085"),
+    "fiber": ("1079",),
+}
+
+
+def normalize_food_name(name: str) -> str:
+    """Lower-case name without ',' or ':' (they separate items in log_meal)."""
+    return " ".join(re.sub(r"[,:]", " ", name).lower().split())
+
+
+# Columns each kind of catalog file must have
+FLAT_FOOD_COLUMNS = ("name", "calories", "protein", "carbs", "fats")
+FDC_FOOD_COLUMNS = ("fdc_id", "description")
+FDC_NUTRIENT_COLUMNS = ("fdc_id", "nutrient_id", "amount")
+
+
+def csv_header(path) -> list:
+    """First row of a CSV file ([] if it is empty)."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+
+def missing_columns(path, columns) -> list:
+    header = csv_header(path)
+    return [column for column in columns if column not in header]
+
+
+def _csv_dict_rows(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.DictReader(f)
+
+
+def _flat_food_rows(path, skipped):
+    """(name, calories, protein, carbs, fats, fiber) from a name,calories,... CSV."""
+    for row in _csv_dict_rows(path):
+        try:
+            yield (normalize_food_name(row["name"]), float(row["calories"]), float(row["protein"]),
+                   float(row["carbs"]), float(row["fats"]), float(row.get("fiber") or 0))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            skipped[0] += 1
+
+
+def _fdc_food_rows(directory, skipped):
+    """Join an FDC CSV dump's food.csv with food_nutrient.csv, streaming both files.
+
+    Only the five tracked nutrients per food are held in memory.
+    """
+    slots = {}
+    for column, ids in enumerate(FDC_NUTRIENT_IDS.values()):
+        for priority, nutrient_id in enumerate(ids):
+            slots[nutrient_id] = (column, priority)
+
+    # fdc_id -> [5 values, 5 priorities]
+    nutrients = {}
+    with open(directory / "food_nutrient.csv", newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        fdc_col, nutrient_col, amount_col = (header.index(c) for c in ("fdc_id", "nutrient_id", "amount"))
+        for row in reader:
+            slot = slots.get(row[nutrient_col])
+            if slot is None:
+                continue
+            column, priority = slot
+            values = nutrients.get(row[fdc_col])
+            if values is None:
+                values = nutrients[row[fdc_col]] = [None] * 5 + [99] * 5
+            if priority < values[5 + column]:
+                try:
+                    values[column] = float(row[amount_col])
+                    values[5 + column] = priority
+                except ValueError:
+                    pass
+
+    for row in _csv_dict_rows(directory / "food.csv"):
+        values = nutrients.get(row.get("fdc_id"))
+        name = normalize_food_name(row.get("description") or "")
+        if values is None or values[0] is None or not name:
+            skipped[0] += 1
+            continue
+        yield (name, values[0], values[1] or 0, values[2] or 0, values[3] or 0, values[4] or 0)
+
+
+@db_tool
+def import_food_catalog(path: str) -> str:
+    """Bulk-load foods (per 100g) from a nutrient dataset on disk.
+    
+    Accepts either:
+    - a USDA FoodData Central CSV dump folder (food.csv + food_nutrient.csv), or
+    - a CSV file with columns name, calories, protein, carbs, fats, fiber
+    
+    Rows are streamed in one transaction; names already in the database are kept.
+    Commas and colons in names become spaces ("Rice, brown, cooked" -> "rice brown cooked").
+    
+    Args:
+        path: Dump folder or CSV file in the export folder (relative paths start there)
+    """
+    try:
+        source = user_file(path)
+    except PermissionError as error:
+        return f"⚠️ {error}"
+    skipped = [0]
+    try:
+        if source.is_dir():
+            if not (source / "food.csv").exists() or not (source / "food_nutrient.csv").exists():
+                return f"⚠️ {source} has no food.csv / food_nutrient.csv (expected a FoodData Central CSV dump)"
+            checks = ((source / "food.csv", FDC_FOOD_COLUMNS),
+                      (source / "food_nutrient.csv", FDC_NUTRIENT_COLUMNS))
+            rows = _fdc_food_rows(source, skipped)
+        elif source.is_file():
+            checks = ((source, FLAT_FOOD_COLUMNS),)
+            rows = _flat_food_rows(source, skipped)
+        else:
+            return f"⚠️ {source} not found"
+        for file, columns in checks:
+            missing = missing_columns(file, columns)
+            if missing:
+                return f"⚠️ {file.name} is missing column(s): {', '.join(missing)}"
+    except (OSError, UnicodeDecodeError, csv.Error) as error:
+        return f"⚠️ Can't read {source}: {getattr(error, 'strerror', None) or error}"
+    
+    start = time.perf_counter()
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        # executemany consumes the generator lazily, so memory stays flat
+        cursor.executemany(FOOD_INSERT, rows)
+    except (OSError, UnicodeDecodeError, csv.Error) as error:
+        conn.close()  # rolls back the foods added so far
+        return f"⚠️ Can't read {source}: {getattr(error, 'strerror', None) or error}"
+    added = cursor.rowcount
     
-    if not routine_items and not pantry_items:
-        result += f"⚠️ No routines set for {time_period}!\n"
-        result += "💡 Add foods with: add_to_food_routine()\n"
-        result += "💡 Or add to pantry with: add_to_pantry()"
-        return result
+    conn.commit()
+    conn.close()
+    elapsed = time.perf_counter() - start
     
-    # Group by effort level
-    if routine_items:
-        result += "**Your Usual Options:**\n\n"
-        
-        effort_groups = {"easy": [], "medium": [], "hard": []}
-        for food, prep, effort, portion, pref, notes, cal, prot, carbs, fats in routine_items:
-            if effort not in effort_groups:
-                effort = "easy"
-            effort_groups[effort].append((food, prep, portion, pref, notes, cal, prot))
-        
-        for effort_name, emoji in [("easy", "⚡"), ("medium", "🔥"), ("hard", "💪")]:
-            items = effort_groups.get(effort_name, [])
-            if items:
-                result += f"{emoji} **{effort_name.title()} Options:**\n"
-                for food, prep, portion, pref, notes, cal, prot in items:
-                    actual_cal = cal * portion / 100
-                    actual_prot = prot * portion / 100
-                    result += f"  • {food.title()} ({prep}) - {actual_cal:.0f} cal, {actual_prot:.1f}g protein\n"
-                    result += f"    {portion}g portion | ⭐{pref}/10"
-                    if notes:
-                        result += f" | {notes}"
-                    result += "\n"
-                result += "\n"
+    result = f"✓ Added {added} foods from {source.name} in {elapsed:.1f}s"
+    if skipped[0]:
+        result += f"\n  ⚠️ {skipped[0]} rows skipped (missing name or nutrients)"
+    return result
+
+
+# ==================== HISTORY EXPORT ====================
+
+# Every field an exported row can have; CSV exports use these columns
+EXPORT_COLUMNS = [
+    "type", "date", "food", "grams", "timestamp", "calories", "protein", "carbs", "fats", "fiber",
+    "sleep_time", "wake_time", "quality", "weight_kg", "exercise", "duration_minutes", "intensity",
+    "calories_burned", *ROUTINE_PERIODS, "preparation_type", "effort_level", "preference_score", "notes",
+    "meal_items", "month", "items",
+]
+
+# What export_history can include -> (row type, query, fields of each selected column).
+# Dated queries take (start, end) and walk their date index in order.
+EXPORT_SOURCES = {
+    "meals": ("meal", """
+        SELECT date, food_name, quantity_grams, timestamp, calories, protein, carbs, fats, fiber
+        FROM meals WHERE date BETWEEN ? AND ? ORDER BY date, id
+    """, ("date", "food", "grams", "timestamp", "calories", "protein", "carbs", "fats", "fiber")),
+    "sleep": ("sleep", """
+        SELECT date, sleep_time, wake_time, quality, notes
+        FROM sleep_log WHERE date BETWEEN ? AND ? ORDER BY date, id
+    """, ("date", "sleep_time", "wake_time", "quality", "notes")),
+    "weight": ("weight", """
+        SELECT date, weight_kg, notes FROM weight_log WHERE date BETWEEN ? AND ? ORDER BY date, id
+    """, ("date", "weight_kg", "notes")),
+    "exercise": ("exercise", """
+        SELECT date, exercise_name, duration_minutes, intensity, calories_burned
+        FROM exercise_log WHERE date BETWEEN ? AND ? ORDER BY date, id
+    """, ("date", "exercise", "duration_minutes", "intensity", "calories_burned")),
+    "pantry": ("pantry", """
+        SELECT food_name, quantity_grams, notes FROM user_pantry WHERE available = 1 ORDER BY id
+    """, ("food", "grams", "notes")),
+    "routines": ("routine", f"""
+        SELECT food_name, {", ".join(ROUTINE_PERIODS)}, preparation_type, effort_level,
+               typical_portion_grams, preference_score, notes
+        FROM food_routines ORDER BY id
+    """, ("food", *ROUTINE_PERIODS, "preparation_type", "effort_level", "grams", "preference_score", "notes")),
+    "rollups": ("rollup", """
+        SELECT date, calories, protein, carbs, fats, fiber, meal_items
+        FROM meal_rollups WHERE date BETWEEN ? AND ? ORDER BY date
+    """, ("date", "calories", "protein", "carbs", "fats", "fiber", "meal_items")),
+    "food_months": ("food_month", """
+        SELECT month, food_name, items, grams, calories FROM food_monthly_counts
+        WHERE month BETWEEN substr(?, 1, 7) AND substr(?, 1, 7) ORDER BY month, food_name
+    """, ("month", "food", "items", "grams", "calories")),
+}
+
+
+def export_lines(cursor, kind, start_date, end_date, format):
+    """Yield one NDJSON/CSV line per row of an EXPORT_SOURCES entry, fetched in batches."""
+    row_type, query, fields = EXPORT_SOURCES[kind]
+    cursor.execute(query, (start_date, end_date) if "?" in query else ())
+    if format == "csv":
+        positions = [EXPORT_COLUMNS.index(field) for field in fields]
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        for row in iter_rows(cursor):
+            line = [row_type] + [""] * (len(EXPORT_COLUMNS) - 1)
+            for position, value in zip(positions, row):
+                if value is not None:
+                    line[position] = value
+            writer.writerow(line)
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+        return
+    dumps = json.dumps
+    for row in iter_rows(cursor):
+        record = {"type": row_type}
+        for field, value in zip(fields, row):
+            if value is not None:
+                record[field] = value
+        yield dumps(record) + "\n"
+
+
+@db_tool
+def export_history(path: str, start_date: str = None, end_date: str = None, format: str = "",
+                   include: str = "meals,sleep,weight,exercise,pantry,routines,rollups,food_months",
+                   overwrite: bool = False) -> str:
+    """Export your full history to a file on disk as NDJSON or CSV (streamed, any size).
     
-    # Add pantry suggestions
-    if pantry_items:
-        result += "**From Your Pantry:**\n"
-        for food, qty, cal, prot in pantry_items:
-            result += f"  • {food.title()}"
-            if qty:
-                result += f" ({qty}g available)"
-            result += f" - {cal}cal/100g\n"
-        result += "\n"
+    Rows use the import_diary/import_history format, so the file can be loaded
+    back or into another database; meals keep their logged calories and macros.
     
-    # Add smart suggestion
-    result += "💡 **Smart Pick:** "
-    if routine_items:
-        best = routine_items[0]
-        food, prep, effort, portion, pref, notes, cal, prot, carbs, fats = best
-        actual_cal = cal * portion / 100
-        result += f"{food.title()} ({prep}, {effort}) = {actual_cal:.0f} cal"
+    Args:
+        path: File to write in the export folder (e.g., "health-export.ndjson")
+        start_date: First day for meals/sleep/weight/exercise, YYYY-MM-DD (default: everything)
+        end_date: Last day, YYYY-MM-DD (default: everything)
+        format: "ndjson" or "csv" (default: from the file extension)
+        include: Comma-separated parts: meals, sleep, weight, exercise, pantry, routines,
+            rollups and food_months (meal history compact_history rolled up)
+        overwrite: Replace the file if it already exists (default: False)
+    """
+    try:
+        target = user_file(path)
+    except PermissionError as error:
+        return f"⚠️ {error}"
+    format = format or ("csv" if target.suffix.lower() == ".csv" else "ndjson")
+    if format not in ("ndjson", "csv"):
+        return "⚠️ Unknown format. Use 'ndjson' or 'csv'."
+    kinds = [kind.strip().lower() for kind in include.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in EXPORT_SOURCES]
+    if unknown or not kinds:
+        return f"⚠️ Unknown part(s) {', '.join(unknown) or '(none)'}. Use: {', '.join(EXPORT_SOURCES)}"
+    try:
+        for day in (start_date, end_date):
+            if day is not None:
+                datetime.strptime(day, "%Y-%m-%d")
+    except ValueError:
+        return "⚠️ Dates must be in YYYY-MM-DD format."
+    if target.exists() and not overwrite:
+        return f"⚠️ {target} already exists. Pass overwrite=True to replace it."
+    
+    start = time.perf_counter()
+    counts = {}
+    partial = target.with_name(target.name + ".part")
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        if target.parent == export_dir().resolve():
+            target.parent.mkdir(parents=True, exist_ok=True)
+        # One read transaction: every part sees the same snapshot
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+        with open(partial, "w", newline="", encoding="utf-8") as f:
+            if format == "csv":
+                f.write(",".join(EXPORT_COLUMNS) + "\n")
+            for kind in kinds:
+                written = 0
+                for line in export_lines(cursor, kind, start_date or "0000-01-01",
+                                         end_date or "9999-12-31", format):
+                    f.write(line)
+                    written += 1
+                counts[kind] = written
+        os.replace(partial, target)
+    except OSError as error:
+        return f"⚠️ Can't write {target}: {error.strerror or error}"
+    finally:
+        partial.unlink(missing_ok=True)
+        conn.close()
+    elapsed = time.perf_counter() - start
     
+    total = sum(counts.values())
+    result = f"✓ Exported {total} rows to {target} in {elapsed:.2f}s"
+    result += f" ({total / elapsed:,.0f} rows/s)\n" if total and elapsed else "\n"
+    result += "  " + " | ".join(f"{kind}: {n}" for kind, n in counts.items()) + "\n"
     return result
 
 
-@mcp.tool()
-def bulk_setup_routines(morning_foods: str = "", evening_foods: str = "", afternoon_foods: str = "") -> str:
-    """Quick setup multiple foods for different times at once.
+# ==================== BATCH ====================
+
+# Operations one batch() call may run
+MAX_BATCH_OPERATIONS = 100
+
+
+@db_tool
+def batch(operations: list[dict]) -> str:
+    """Run several tools in order as one call and one transaction (e.g. a morning check-in).
     
-    Args:
-        morning_foods: Comma-separated food names for morning (e.g., "bread,poha,paratha")
-        evening_foods: Comma-separated food names for evening (e.g., "maggie,oats,chowmein")
-        afternoon_foods: Comma-separated food names for afternoon (e.g., "roti,dal,rice")
+    Writes (log_sleep, log_weight, log_meal, log_exercise, set_user_profile, pantry
+    and routine tools...) and reads (get_daily_summary, recommend_foods...) can be
+    mixed; reads see the writes before them. If a write fails or answers with a ⚠️
+    warning, the whole batch is rolled back and nothing is saved. Foods and aliases
+    added in a batch can be used by log_meal once the batch is done.
     
-    Example: bulk_setup_routines(morning="bread,poha,paratha", evening="maggie,oats")
+    Args:
+        operations: Ordered list of {"tool": name, "args": {...}}, e.g.
+            [{"tool": "log_sleep", "args": {"sleep_time": "23:00", "wake_time": "07:00"}},
+             {"tool": "log_weight", "args": {"weight_kg": 72.4}},
+             {"tool": "log_meal", "args": {"food_items": "poha:200, tea:150"}},
+             {"tool": "get_daily_summary"}]
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    if not operations:
+        return "⚠️ No operations given."
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return f"⚠️ At most {MAX_BATCH_OPERATIONS} operations per batch; split it up."
+    
+    calls = []
+    for number, operation in enumerate(operations, 1):
+        if not isinstance(operation, dict):
+            return f"⚠️ Operation {number} must be an object like {{\"tool\": ..., \"args\": {{...}}}}. Nothing was run."
+        name = operation.get("tool")
+        args = operation.get("args") or {}
+        if name not in DB_TOOLS or name == "batch":
+            return f"⚠️ Operation {number}: unknown tool '{name}'. Nothing was run."
+        if not isinstance(args, dict):
+            return f"⚠️ Operation {number} ({name}): args must be an object. Nothing was run."
+        calls.append((name, args))
+    
+    conn = get_connection()
+    results = []
+    failure = None
+    conn.execute("BEGIN IMMEDIATE")  # take the write lock up front, not midway through
+    conn.in_batch = True
+    token = _batch_connection.set(conn)
+    try:
+        for number, (name, args) in enumerate(calls, 1):
+            fn, reads = DB_TOOLS[name]
+            try:
+                result = fn(**args)
+            except Exception as e:
+                failure = f"Operation {number} ({name}) failed: {type(e).__name__}: {e}"
+                break
+            if not reads and result.startswith("⚠️"):
+                failure = f"Operation {number} ({name}) failed: {result}"
+                break
+            results.append((name, result))
+    finally:
+        _batch_connection.reset(token)
+        conn.in_batch = False
+        if failure is None and len(results) == len(calls):
+            conn.commit()
+        else:
+            conn.rollback()
+        conn.close()
     
-    added = []
-    failed = []
+    if failure is not None:
+        return f"⚠️ Batch rolled back, nothing was saved.\n{failure}"
     
-    def add_foods(foods_str, time_col):
-        if not foods_str:
-            return
-        foods = [f.strip().lower() for f in foods_str.split(",")]
-        for food in foods:
-            if not food:
+    result = f"📦 {len(results)} operations done in one transaction:\n"
+    for number, (name, output) in enumerate(results, 1):
+        result += f"\n[{number}] {name}\n{output.rstrip()}\n"
+    return result
+
+
+# ==================== BACKUPS ====================
+# Snapshots are copied with the SQLite online backup API, BACKUP_PAGES_PER_STEP
+# pages at a time, while tool calls keep running. The source connection holds
+# one read transaction for the whole copy: under WAL that blocks nobody, and it
+# pins the snapshot, so writes from other connections can't restart the copy
+# (without it, a busy database restarts the backup over and over).
+
+BACKUP_DIR = os.environ.get("HEALTH_MCP_BACKUP_DIR")
+BACKUP_DIR = Path(BACKUP_DIR) if BACKUP_DIR else None  # default: "backups" next to each database
+
+# Background snapshots every this many hours (0 = only create_backup)
+BACKUP_INTERVAL_HOURS = float(os.environ.get("HEALTH_MCP_BACKUP_HOURS", "0"))
+
+# Snapshots kept per database file; older ones are deleted after each backup
+BACKUP_KEEP = int(os.environ.get("HEALTH_MCP_BACKUP_KEEP", "7"))
+
+BACKUP_PAGES_PER_STEP = 1024  # 4 MB at the default page size
+BACKUP_STEP_PAUSE = 0.001     # seconds between steps, so a big copy doesn't hog the disk
+
+backup_log = logging.getLogger("health_mcp.backup")
+
+# One backup or restore at a time per process
+_backup_lock = threading.Lock()
+
+
+def database_files() -> list:
+    """Every database file background maintenance looks after: DB_PATH, or each shard."""
+    if DATA_DIR is None:
+        return [DB_PATH]
+    return sorted(DATA_DIR.glob("*.db")) + sorted(DATA_DIR.glob("hashed/*.db"))
+
+
+def backup_dir(path: Path) -> Path:
+    if BACKUP_DIR is None:
+        return path.parent / "backups"
+    if DATA_DIR is not None and path.parent == DATA_DIR / "hashed":
+        return BACKUP_DIR / "hashed"  # hashed tenants' snapshots stay apart from plain ids'
+    return BACKUP_DIR
+
+
+def list_snapshots(path: Path) -> list:
+    """Snapshots of a database file, oldest first."""
+    directory = backup_dir(path)
+    if not directory.is_dir():
+        return []
+    pattern = re.compile(re.escape(path.stem) + r"-(\d{8}-\d{6})(-\d+)?\.db")
+    found = []
+    for f in directory.iterdir():
+        match = pattern.fullmatch(f.name)
+        if match:
+            # Snapshots taken in the same second are ordered by when they were written
+            found.append((match[1], f.stat().st_mtime_ns, f.name, f))
+    return [entry[-1] for entry in sorted(found)]
+
+
+def verify_snapshot(snapshot: Path):
+    """None if the snapshot is an intact health database this server can open, else why not."""
+    try:
+        conn = sqlite3.connect(f"{snapshot.as_uri()}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        return f"can't open it ({e})"
+    try:
+        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            problems = [line for line in check.splitlines() if not line.startswith("***")]
+            return f"integrity check failed ({problems[0] if problems else check})"
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            return f"it was written by a newer server (schema v{version}, this one is v{SCHEMA_VERSION})"
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'meals'").fetchone() is None:
+            return "it is not a health database"
+    except sqlite3.Error as e:
+        return f"can't read it ({e})"
+    finally:
+        conn.close()
+    return None
+
+
+def backup_database(path: Path, keep=BACKUP_KEEP):
+    """Snapshot a database file into its backup directory, verified, then rotate.
+
+    Returns (snapshot, bytes, pages, seconds, [removed snapshots]). keep=None
+    skips the rotation.
+    """
+    with _backup_lock:
+        return _backup_locked(Path(path), keep)
+
+
+def _backup_locked(path: Path, keep):
+    """backup_database's body; the caller holds _backup_lock."""
+    directory = backup_dir(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    flush_pending_writes(path)  # queued log entries belong in the snapshot
+    start = time.perf_counter()
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    snapshot = directory / f"{path.stem}-{stamp}.db"
+    suffix = 1
+    while snapshot.exists():
+        suffix += 1
+        snapshot = directory / f"{path.stem}-{stamp}-{suffix}.db"
+    partial = snapshot.with_name(snapshot.name + ".part")
+    
+    source = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    target = sqlite3.connect(partial)
+    try:
+        source.execute("PRAGMA busy_timeout = 5000")
+        source.execute("BEGIN")
+        source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone()  # starts the read snapshot
+        pages = source.execute("PRAGMA page_count").fetchone()[0]
+        source.backup(target, pages=BACKUP_PAGES_PER_STEP,
+                      progress=lambda status, remaining, total: time.sleep(BACKUP_STEP_PAUSE))
+        source.execute("COMMIT")
+        # A self-contained file: no -wal/-shm next to it when it's opened later
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        source.close()
+        target.close()
+    
+    error = verify_snapshot(partial)
+    if error is not None:
+        partial.unlink(missing_ok=True)
+        raise sqlite3.DatabaseError(f"backup of {path} failed verification: {error}")
+    os.replace(partial, snapshot)
+    elapsed = time.perf_counter() - start
+    
+    removed = []
+    if keep is not None:
+        for old in list_snapshots(path)[:-max(keep, 1)]:
+            old.unlink(missing_ok=True)
+            removed.append(old)
+    return snapshot, snapshot.stat().st_size, pages, elapsed, removed
+
+
+def restore_database(path: Path, snapshot: Path):
+    """Replace a live database's contents with a verified snapshot, in one transaction.
+
+    The current contents are snapshotted first (outside the rotation). Every
+    data_versions counter ends up above its pre-restore value, so read caches
+    and food catalogs in every process reload.
+    """
+    path = Path(path)
+    error = verify_snapshot(snapshot)
+    if error is not None:
+        raise sqlite3.DatabaseError(f"{snapshot.name} can't be restored: {error}")
+    with _backup_lock:
+        # Same lock as the restore, so no backup or restore slips in between
+        safety = _backup_locked(path, keep=None)[0]
+        conn = get_connection(path)
+        try:
+            before = dict(conn.execute("SELECT table_name, version FROM data_versions"))
+            source = sqlite3.connect(f"{snapshot.as_uri()}?mode=ro", uri=True)
+            try:
+                # One step: other connections see the old contents or the new ones, never a mix
+                source.backup(conn)
+            finally:
+                source.close()
+            migrate_database(conn)  # snapshots from older servers
+            conn.executemany("INSERT OR IGNORE INTO data_versions (table_name) VALUES (?)",
+                             [(table,) for table in before])
+            conn.executemany("UPDATE data_versions SET version = MAX(version, ?) + 1 WHERE table_name = ?",
+                             [(version, table) for table, version in before.items()])
+            conn.commit()
+        finally:
+            conn.close()
+    return safety
+
+
+class BackupScheduler:
+    """Background thread snapshotting every database file every BACKUP_INTERVAL_HOURS.
+
+    Files unchanged since their newest snapshot are skipped. Failures are
+    logged; the next round tries again.
+    """
+
+    def __init__(self, interval_hours=BACKUP_INTERVAL_HOURS):
+        self.interval = interval_hours * 3600
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.run_once()
+
+    def run_once(self) -> int:
+        """Back up every changed database file now. Returns how many were backed up."""
+        done = 0
+        for path in database_files():
+            if self._stopped.is_set():
+                break
+            if not path.exists() or not self.changed_since_backup(path):
                 continue
-            # Check if food exists
-            cursor.execute("SELECT name FROM food_database WHERE name = ?", (food,))
-            if not cursor.fetchone():
-                failed.append(f"{food} (not in database)")
+            try:
+                snapshot, size, _, elapsed, removed = backup_database(path)
+                backup_log.info("backed up %s to %s (%.1f MB in %.2fs, %d old removed)",
+                                path, snapshot.name, size / 2**20, elapsed, len(removed))
+                done += 1
+            except (OSError, sqlite3.Error):
+                backup_log.exception("scheduled backup of %s failed", path)
+        return done
+
+    @staticmethod
+    def changed_since_backup(path: Path) -> bool:
+        snapshots = list_snapshots(path)
+        if not snapshots:
+            return True
+        wal = path.with_name(path.name + "-wal")
+        modified = max(path.stat().st_mtime, wal.stat().st_mtime if wal.exists() else 0)
+        # >=: mtimes are coarse, and an extra snapshot beats a missed change
+        return modified >= snapshots[-1].stat().st_mtime
+
+
+@db_tool
+def create_backup(keep: int = None) -> str:
+    """Save a verified snapshot of your database now, without pausing other tools.
+    
+    Snapshots go to the backups folder next to the database (or
+    HEALTH_MCP_BACKUP_DIR); the oldest ones beyond `keep` are deleted.
+    
+    Args:
+        keep: Snapshots to keep, including this one (default: HEALTH_MCP_BACKUP_KEEP, 7)
+    """
+    path = current_db_path()
+    snapshot, size, pages, elapsed, removed = backup_database(path, BACKUP_KEEP if keep is None else keep)
+    result = f"✓ Backup saved: {snapshot}\n"
+    result += f"  {size / 2**20:.1f} MB ({pages} pages) in {elapsed:.2f}s, integrity verified\n"
+    if removed:
+        result += f"  Removed {len(removed)} old snapshot(s): {', '.join(old.name for old in removed)}\n"
+    return result
+
+
+@db_tool
+def list_backups() -> str:
+    """List the saved snapshots of your database, newest first."""
+    path = current_db_path()
+    snapshots = list_snapshots(path)
+    if not snapshots:
+        return f"No backups yet in {backup_dir(path)}. Use create_backup() to make one."
+    result = f"💾 {len(snapshots)} backup(s) in {backup_dir(path)}:\n"
+    for snapshot in reversed(snapshots):
+        info = snapshot.stat()
+        stamp = datetime.fromtimestamp(info.st_mtime).strftime("%Y-%m-%d %H:%M")
+        result += f"• {snapshot.name} ({info.st_size / 2**20:.1f} MB, {stamp})\n"
+    return result
+
+
+@db_tool
+def restore_backup(name: str) -> str:
+    """Restore your database from a snapshot listed by list_backups.
+    
+    The snapshot is integrity-checked first, and your current data is saved
+    as a new snapshot before it's replaced, so a restore can be undone.
+    
+    Args:
+        name: Snapshot file name (e.g., "health_data-20250105-030000.db")
+    """
+    if _batch_connection.get() is not None:
+        return "⚠️ restore_backup can't run inside batch()."
+    path = current_db_path()
+    snapshot = next((s for s in list_snapshots(path) if s.name == name), None)
+    if snapshot is None:
+        return f"⚠️ No backup named '{name}'. Use list_backups() to see them."
+    try:
+        safety = restore_database(path, snapshot)
+    except sqlite3.DatabaseError as e:
+        return f"⚠️ {e}"
+    return f"✓ Restored {name}\n  Your data from before the restore is saved as {safety.name}\n"
+
+
+# ==================== MEAL ROLLUP ====================
+# Item-level meal rows older than a retention period only ever feed daily
+# sums, which daily_totals already holds. compact_history folds them into
+# meal_rollups (per-day sums, so rebuilds and exports keep them) and optional
+# per-food monthly counts, deletes them, and hands the freed pages back with
+# incremental vacuum. Both run in short transactions with pauses in between,
+# so live tool calls wait at most one chunk.
+
+# Roll up meal items older than this many whole months (0 = keep every item)
+MEAL_RETENTION_MONTHS = int(os.environ.get("HEALTH_MCP_MEAL_RETENTION_MONTHS", "0"))
+
+# Keep per-food monthly counts (items, grams, calories) of rolled-up meals
+ROLLUP_FOOD_COUNTS = os.environ.get("HEALTH_MCP_FOOD_MONTHLY_COUNTS", "1") != "0"
+
+ROLLUP_CHUNK_DAYS = 31        # days of meals folded per transaction...
+ROLLUP_CHUNK_ROWS = 1000      # ...unless they hold more rows than this (whole days, at least one)
+VACUUM_PAGES_PER_STEP = 256   # pages released per incremental_vacuum transaction
+# Seconds between transactions. A tool call waiting on the write lock retries
+# on SQLite's busy-handler backoff (1, 2, 5, ... 25 ms); a gap at least this
+# long lets its next retry in instead of queueing it behind the next chunk.
+ROLLUP_STEP_PAUSE = 0.025
+ROLLUP_INTERVAL_HOURS = 24    # background rounds when MEAL_RETENTION_MONTHS is set
+ROLLUP_START_DELAY = 60       # seconds after startup before the first round
+
+rollup_log = logging.getLogger("health_mcp.rollup")
+
+ROLLUP_DAYS_UPSERT = """
+    INSERT INTO meal_rollups (date, calories, protein, carbs, fats, fiber, meal_items)
+    SELECT date, SUM(calories), SUM(protein), SUM(carbs), SUM(fats), SUM(fiber), COUNT(*)
+    FROM meals WHERE date BETWEEN ? AND ? GROUP BY date
+    ON CONFLICT(date) DO UPDATE SET
+        calories = calories + excluded.calories,
+        protein = protein + excluded.protein,
+        carbs = carbs + excluded.carbs,
+        fats = fats + excluded.fats,
+        fiber = fiber + excluded.fiber,
+        meal_items = meal_items + excluded.meal_items
+"""
+ROLLUP_FOOD_MONTHS_UPSERT = """
+    INSERT INTO food_monthly_counts (month, food_name, items, grams, calories)
+    SELECT substr(date, 1, 7), food_name, COUNT(*), SUM(quantity_grams), SUM(calories)
+    FROM meals WHERE date BETWEEN ? AND ? GROUP BY 1, 2
+    ON CONFLICT(month, food_name) DO UPDATE SET
+        items = items + excluded.items,
+        grams = grams + excluded.grams,
+        calories = calories + excluded.calories
+"""
+# Oldest days that still have item rows before the cutoff, off the (date, ...) covering index
+ROLLUP_NEXT_DAYS_QUERY = "SELECT date, COUNT(*) FROM meals WHERE date < ? GROUP BY date ORDER BY date LIMIT ?"
+
+
+def rollup_cutoff(months: int, today=None) -> str:
+    """First day of the month `months` months before this one: older meals get rolled up."""
+    today = today or datetime.now()
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    return f"{year:04d}-{month + 1:02d}-01"
+
+
+def roll_up_meals(path, cutoff, food_counts=ROLLUP_FOOD_COUNTS, stop=None):
+    """Fold meal rows dated before `cutoff` into meal_rollups, a few days per transaction.
+
+    daily_totals is untouched: it already holds these sums. Returns
+    (rows rolled up, days, first day, last day).
+    """
+    rows = days = 0
+    first = last = None
+    while stop is None or not stop.is_set():
+        conn = get_connection(path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(ROLLUP_NEXT_DAYS_QUERY, (cutoff, ROLLUP_CHUNK_DAYS))
+            dates = []
+            chunk_rows = 0
+            for date, items in cursor.fetchall():
+                if dates and chunk_rows + items > ROLLUP_CHUNK_ROWS:
+                    break
+                dates.append(date)
+                chunk_rows += items
+            if not dates:
+                break
+            span = (dates[0], dates[-1])
+            cursor.execute(ROLLUP_DAYS_UPSERT, span)
+            if food_counts:
+                cursor.execute(ROLLUP_FOOD_MONTHS_UPSERT, span)
+            cursor.execute("DELETE FROM meals WHERE date BETWEEN ? AND ?", span)
+            rows += cursor.rowcount
+            bump_table_versions(cursor, "meals")  # also covers meal_rollups
+            conn.commit()
+        finally:
+            conn.close()
+        days += len(dates)
+        first = first or dates[0]
+        last = dates[-1]
+        time.sleep(ROLLUP_STEP_PAUSE)
+    return rows, days, first, last
+
+
+def reclaim_free_pages(path, stop=None):
+    """Release free pages to the OS, VACUUM_PAGES_PER_STEP at a time.
+
+    Returns pages released, or None if the file isn't in incremental
+    auto-vacuum mode (its free pages are then only reused by later writes).
+    """
+    conn = get_connection(path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # 2 = INCREMENTAL
+            return None
+    finally:
+        conn.close()
+    released = 0
+    while stop is None or not stop.is_set():
+        conn = get_connection(path)
+        try:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free:
+                break
+            conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})").fetchall()
+            released += free - conn.execute("PRAGMA freelist_count").fetchone()[0]
+        finally:
+            conn.close()
+        time.sleep(ROLLUP_STEP_PAUSE)
+    return released
+
+
+def enable_incremental_vacuum(path) -> bool:
+    """Switch a file to incremental auto-vacuum; False if it already was.
+
+    Needs one full VACUUM, which blocks writers while it runs.
+    """
+    conn = get_connection(path)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+
+class RollupScheduler:
+    """Background thread rolling up old meals in every database file once a day.
+
+    Starts ROLLUP_START_DELAY seconds after the server, so startup isn't
+    competing with it. Failures are logged; the next round tries again.
+    """
+
+    def __init__(self, months=MEAL_RETENTION_MONTHS, interval_hours=ROLLUP_INTERVAL_HOURS):
+        self.months = months
+        self.interval = interval_hours * 3600
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="meal-rollup", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        delay = ROLLUP_START_DELAY
+        while not self._stopped.wait(delay):
+            self.run_once()
+            delay = self.interval
+
+    def run_once(self) -> int:
+        """Roll up every database file now. Returns meal rows rolled up."""
+        cutoff = rollup_cutoff(self.months)
+        total = 0
+        for path in database_files():
+            if self._stopped.is_set():
+                break
+            if not path.exists():
                 continue
-            
-            # Insert or update
-            cursor.execute("SELECT id FROM food_routines WHERE food_name = ?", (food,))
-            if cursor.fetchone():
-                cursor.execute(f"UPDATE food_routines SET {time_col} = 1 WHERE food_name = ?", (food,))
-            else:
-                cursor.execute(f"""
-                    INSERT INTO food_routines (food_name, {time_col})
-                    VALUES (?, 1)
-                """, (food,))
-            added.append(f"{food} ({time_col})")
+            try:
+                rows, days, _, _ = roll_up_meals(path, cutoff, stop=self._stopped)
+                released = reclaim_free_pages(path, stop=self._stopped) if rows else 0
+                if rows:
+                    rollup_log.info("rolled up %d meal rows from %d days before %s in %s, released %s pages",
+                                    rows, days, cutoff, path, released)
+                total += rows
+            except sqlite3.Error:
+                rollup_log.exception("meal rollup of %s failed", path)
+        return total
+
+
+@db_tool
+def compact_history(older_than_months: int = None, vacuum: bool = False) -> str:
+    """Roll up meal items older than N months into daily totals and delete them to save space.
     
-    add_foods(morning_foods, "morning")
-    add_foods(afternoon_foods, "afternoon")
-    add_foods(evening_foods, "evening")
+    Day totals, stats, summaries and exports stay the same; only the item-by-item
+    list of those days goes (get_daily_nutrition shows them as one rolled-up line).
+    Per-food monthly counts are kept unless HEALTH_MCP_FOOD_MONTHLY_COUNTS=0.
+    Runs in small chunks, so other tools keep working meanwhile.
+    
+    Args:
+        older_than_months: Roll up whole months older than this (default: HEALTH_MCP_MEAL_RETENTION_MONTHS)
+        vacuum: Also switch an older database to incremental vacuum so the file actually
+                shrinks. Needs one full VACUUM, which pauses writes while it runs.
+    """
+    if _batch_connection.get() is not None:
+        return "⚠️ compact_history can't run inside batch()."
+    months = older_than_months if older_than_months is not None else MEAL_RETENTION_MONTHS
+    if months < 1:
+        return "⚠️ Give older_than_months (1 or more), or set HEALTH_MCP_MEAL_RETENTION_MONTHS."
+    
+    path = current_db_path()
+    cutoff = rollup_cutoff(months)
+    start = time.perf_counter()
+    rows, days, first, last = roll_up_meals(path, cutoff)
+    converted = vacuum and enable_incremental_vacuum(path)
+    released = reclaim_free_pages(path)
+    elapsed = time.perf_counter() - start
+    
+    if rows:
+        result = f"✓ Rolled up {rows:,} meal items from {days} days ({first} to {last}) in {elapsed:.2f}s\n"
+        result += "  Daily totals are unchanged"
+        result += "; per-food monthly counts kept\n" if ROLLUP_FOOD_COUNTS else "\n"
+    else:
+        result = f"✓ No meal items before {cutoff} left to roll up\n"
+    if converted:
+        result += "  Vacuumed the file and switched it to incremental vacuum: later compactions shrink it\n"
+    if released is None:
+        result += "  Freed space is reused by new entries but the file won't shrink; "
+        result += "run compact_history(vacuum=True) once to enable incremental vacuum\n"
+    elif released:
+        conn = get_connection(path)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        conn.close()
+        result += f"  Released {released * page_size / 2**20:.1f} MB ({released} pages) back to the disk\n"
+    return result
+
+
+# ==================== MAINTENANCE & DIAGNOSTICS ====================
+
+@db_tool
+def rebuild_daily_totals() -> str:
+    """Recompute the per-day totals (calories, macros, exercise, sleep, weight) from the raw logs.
+    
+    Only needed after editing the database by hand - every log_* tool keeps
+    the totals up to date automatically.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    days = rebuild_daily_totals_table(cursor)
+    sync_weight_trend(cursor)  # picks up weight rows added or edited by hand
+    # Also the way to flush cached reads after editing any table by hand
+    bump_table_versions(cursor, *VERSIONED_TABLES)
     
     conn.commit()
     conn.close()
+    return f"✓ Rebuilt daily totals for {days} days"
+
+@tool
+def server_metrics() -> str:
+    """Per-tool metrics since the server started, in Prometheus text format.
     
-    result = "✓ Bulk routine setup complete!\n\n"
-    if added:
-        result += f"Added {len(added)} items:\n"
-        for item in added:
-            result += f"  • {item}\n"
-    if failed:
-        result += f"\n⚠️ Failed {len(failed)} items:\n"
-        for item in failed:
-            result += f"  • {item}\n"
-        result += "\nAdd missing foods with: add_food_to_database()"
+    Call counts, errors, latency histograms, SQL statement counts and
+    durations, rows read/written and slow queries for every tool, plus the
+    read cache's hits, misses and size.
+    """
+    if not METRICS_ENABLED:
+        return "⚠️ Metrics are disabled (HEALTH_MCP_METRICS=0)."
+    return METRICS.render() + READ_CACHE.render()
+
+@mcp.resource("metrics://server", mime_type="text/plain; version=0.0.4")
+def server_metrics_resource() -> str:
+    """Prometheus text exposition of the server's tool metrics."""
+    return server_metrics()
+
+@tool
+def get_cache_stats() -> str:
+    """Read cache statistics: hit rate per tool, cached entries and size."""
+    if READ_CACHE_ENTRIES <= 0:
+        return "⚠️ The read cache is disabled (HEALTH_MCP_CACHE_ENTRIES=0)."
+    entries, size, evictions, tools = READ_CACHE.stats()
+    result = "🗃️ Read cache:\n"
+    result += f"  Entries: {entries}/{READ_CACHE.max_entries} | Size: {size / 1024:.1f} KB"
+    result += f"/{READ_CACHE.max_bytes / 1024 / 1024:.0f} MB | Evictions: {evictions}\n\n"
+    if not tools:
+        return result + "No cached tool calls yet."
+    for tool_name, (hits, misses) in sorted(tools.items(), key=lambda t: -sum(t[1])):
+        result += f"• {tool_name}: {hits} hits, {misses} misses ({hits / (hits + misses):.0%} hit rate)\n"
+    return result
+
+@tool
+def get_slow_queries(limit: int = 20) -> str:
+    """Most recent SQL statements slower than HEALTH_MCP_SLOW_QUERY_MS (default 100 ms).
     
+    Args:
+        limit: Number of statements to show (default: 20, newest first)
+    """
+    queries = list(METRICS.slow_queries)[-max(limit, 1):][::-1]  # [-0:] would be everything
+    if not queries:
+        return f"✓ No queries slower than {SLOW_QUERY_SECONDS * 1000:g} ms recorded."
+    
+    result = f"🐢 Slow queries (≥ {SLOW_QUERY_SECONDS * 1000:g} ms), newest first:\n\n"
+    for at, tool_name, seconds, sql in queries:
+        stamp = datetime.fromtimestamp(at).strftime("%Y-%m-%d %H:%M:%S")
+        result += f"• {stamp} {tool_name}: {seconds * 1000:.0f} ms\n  {sql[:300]}\n"
     return result
 
 
+@tool
+def profile_tool(tool_name: str, calls: int = 1) -> str:
+    """Profile the next call(s) of a tool with cProfile (needs HEALTH_MCP_PROFILE_DIR).
+    
+    Args:
+        tool_name: Tool to profile (e.g., "recommend_from_routines")
+        calls: How many of its next calls to profile (default: 1)
+    """
+    if PROFILE_DIR is None:
+        return "⚠️ Profiling is off. Restart the server with HEALTH_MCP_PROFILE_DIR set to a folder."
+    if tool_name not in TOOL_NAMES:
+        return f"⚠️ Unknown tool '{tool_name}'."
+    with _profile_state_lock:
+        _profile_armed[tool_name] = _profile_armed.get(tool_name, 0) + max(calls, 1)
+    return f"✓ The next {max(calls, 1)} call(s) of {tool_name} will be profiled into {PROFILE_DIR}"
+
+@tool
+def get_profile_summary(tool_name: str = "", top: int = 15, sort: str = "cumulative") -> str:
+    """Summarize saved profiles: the top functions across all profiled calls.
+    
+    Args:
+        tool_name: Only this tool's profiles (default: all)
+        top: Number of functions to show (default: 15)
+        sort: "cumulative" (time including callees), "tottime" (own time) or "ncalls"
+    """
+    try:
+        summary = summarize_profiles(tool_name, top, sort)
+    except ValueError as e:
+        return f"⚠️ {e}"
+    if summary is None:
+        return f"No profiles found{' for ' + tool_name if tool_name else ''}. Use profile_tool() first."
+    files, text = summary
+    return f"🔬 {files} profiled call(s){' of ' + tool_name if tool_name else ''}:\n{text}"
+
+
+def _exit_on_signal(signum, frame):
+    """Commit queued writes, then die of the signal as usual.
+
+    The stdio transport's blocking stdin read keeps SystemExit/KeyboardInterrupt
+    from unwinding mcp.run(), so the cleanup can't wait for the finally below.
+    """
+    close_all_connections()
+    signal.signal(signum, signal.SIG_DFL)
+    os.kill(os.getpid(), signum)
+
+
 if __name__ == "__main__":
-    mcp.run()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, _exit_on_signal)
+    if BACKUP_INTERVAL_HOURS > 0:
+        BackupScheduler().start()
+    if MEAL_RETENTION_MONTHS > 0:
+        RollupScheduler().start()
+    try:
+        mcp.run()
+    finally:
+        _db_executor.shutdown(wait=True)
+        close_all_connections()
 
 